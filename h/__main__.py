@@ -1,4 +1,14 @@
-from h.cli import main
+import sys
+
+# The streamer load test runs the websocket server in this process. Like
+# gunicorn's gevent workers, it needs the standard library patched before
+# anything which uses it is imported.
+if "streamer-loadtest" in sys.argv[1:]:
+    from gevent import monkey
+
+    monkey.patch_all()
+
+from h.cli import main  # pylint:disable=wrong-import-position
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,9 @@
+import threading
 from collections import namedtuple
+from time import monotonic
 
 import newrelic.agent
+from h_pyramid_sentry import report_exception
 from pyramid.httpexceptions import HTTPFound
 from sqlalchemy.orm import subqueryload
 
@@ -10,11 +13,13 @@ from h.models import Annotation, Group
 from h.search import (
     AuthorityFilter,
     Search,
+    SharedAnnotationsFilter,
     TagsAggregation,
     TopLevelAnnotationsFilter,
     UsersAggregation,
     parser,
 )
+from h.util.cache import LRUCache
 
 
 class ActivityResults(
@@ -23,6 +28,79 @@ class ActivityResults(
     pass
 
 
+# The tag and user facets of a search change slowly and don't depend on which
+# page of results is being looked at, so we share them between page views and
+# refresh them in the background once they're `AGGREGATIONS_MAX_AGE` seconds
+# old. Search key -> (time fetched, aggregations). Entries the cache drops are
+# fetched again while the request waits.
+AGGREGATIONS_MAX_AGE = 60
+aggregation_cache = LRUCache(maxsize=1000, ttl=600)
+
+# Search keys whose aggregations are being refreshed in the background
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _aggregations_key(request, query):
+    """Get the key of the aggregations for `query` made by `request`."""
+    # The aggregations only count the annotations everyone who can read the
+    # same groups sees, so they can be shared between those users
+    readable_groups = request.find_service(name="group").groupids_readable_by(
+        request.user, query.getall("group") or None
+    )
+
+    return (
+        request.default_authority,
+        frozenset(readable_groups),
+        tuple(sorted(query.items())),
+    )
+
+
+def _aggregations(request, query):
+    """Get the aggregations for `query`, from the cache if we have them."""
+    key = _aggregations_key(request, query)
+    entry = aggregation_cache.get(key)
+
+    if entry is not None and (
+        monotonic() - entry[0] < AGGREGATIONS_MAX_AGE or key in _refreshing
+    ):
+        return entry[1]
+
+    search = Search(request, separate_wildcard_uri_keys=False)
+    search.append_modifier(AuthorityFilter(authority=request.default_authority))
+    search.append_modifier(TopLevelAnnotationsFilter())
+    search.append_modifier(SharedAnnotationsFilter())
+    for agg in aggregations_for(query):
+        search.append_aggregation(agg)
+    run = search.prepare_aggregations(query)
+
+    if entry is None:
+        aggregations = run()
+        aggregation_cache.set(key, (monotonic(), aggregations))
+        return aggregations
+
+    # Show the old aggregations rather than keep this request waiting
+    with _refreshing_lock:
+        if key not in _refreshing:
+            _refreshing.add(key)
+            threading.Thread(
+                target=_refresh_aggregations, args=(key, run), daemon=True
+            ).start()
+
+    return entry[1]
+
+
+def _refresh_aggregations(key, run):
+    try:
+        aggregation_cache.set(key, (monotonic(), run()))
+    except Exception as err:  # pylint:disable=broad-except
+        # We keep showing the old aggregations until the cache drops them
+        report_exception(err)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(key)
+
+
 @newrelic.agent.function_trace()
 def extract(request, parse=parser.parse):
     """
@@ -173,8 +251,9 @@ def _execute_search(request, query, page_size):
     search = Search(request, separate_wildcard_uri_keys=False)
     search.append_modifier(AuthorityFilter(authority=request.default_authority))
     search.append_modifier(TopLevelAnnotationsFilter())
-    for agg in aggregations_for(query):
-        search.append_aggregation(agg)
+
+    # The aggregations are the same for every page of results
+    aggregations = _aggregations(request, query)
 
     query = query.copy()
     page = request.params.get("page", 1)
@@ -191,7 +270,8 @@ def _execute_search(request, query, page_size):
     query["offset"] = (page - 1) * page_size
 
     search_result = search.run(query)
-    return search_result
+
+    return search_result._replace(aggregations=aggregations)
 
 
 @newrelic.agent.function_trace()
@@ -21,6 +21,7 @@ SUBCOMMANDS = (
     "h.cli.commands.normalize_uris.normalize_uris",
     "h.cli.commands.search.search",
     "h.cli.commands.shell.shell",
+    "h.cli.commands.streamer_loadtest.streamer_loadtest",
     "h.cli.commands.user.user",
     "h.cli.commands.create_annotations.create_annotations",
 )
@@ -1,15 +1,10 @@
-from collections import namedtuple
-
 import click
 
 from h import models
 from h.models.document import merge_documents
 from h.search import index
 from h.util import uri
-
-
-class Window(namedtuple("Window", ["start", "end"])):
-    pass
+from h.util.query import column_windows
 
 
 @click.command("normalize-uris")
@@ -25,43 +20,28 @@ def normalize_uris(ctx):
 
 
 def normalize_document_uris(request):
-    windows = _fetch_windows(request.db, models.DocumentURI.updated)
-    request.tm.commit()
-
-    for window in windows:
-        request.tm.begin()
+    for window in _windows(request, models.DocumentURI):
         _normalize_document_uris_window(request.db, window)
-        request.tm.commit()
 
 
 def normalize_document_meta(request):
-    windows = _fetch_windows(request.db, models.DocumentMeta.updated)
-    request.tm.commit()
-
-    for window in windows:
-        request.tm.begin()
+    for window in _windows(request, models.DocumentMeta):
         _normalize_document_meta_window(request.db, window)
-        request.tm.commit()
 
 
 def normalize_annotations(request):
-    windows = _fetch_windows(request.db, models.Annotation.updated)
-    request.tm.commit()
-
-    for window in windows:
-        request.tm.begin()
+    for window in _windows(request, models.Annotation):
         ids = _normalize_annotations_window(request.db, window)
         request.tm.commit()
 
         request.tm.begin()
         _reindex_annotations(request, ids)
-        request.tm.commit()
 
 
 def _normalize_document_uris_window(session, window):
     query = (
         session.query(models.DocumentURI)
-        .filter(models.DocumentURI.updated.between(window.start, window.end))
+        .filter(window)
         .order_by(models.DocumentURI.updated.asc())
     )
 
@@ -97,7 +77,7 @@ def _normalize_document_uris_window(session, window):
 def _normalize_document_meta_window(session, window):
     query = (
         session.query(models.DocumentMeta)
-        .filter(models.DocumentMeta.updated.between(window.start, window.end))
+        .filter(window)
         .order_by(models.DocumentMeta.updated.asc())
     )
 
@@ -123,7 +103,7 @@ def _normalize_document_meta_window(session, window):
 def _normalize_annotations_window(session, window):
     query = (
         session.query(models.Annotation)
-        .filter(models.Annotation.updated.between(window.start, window.end))
+        .filter(window)
         .order_by(models.Annotation.updated.asc())
     )
 
@@ -148,20 +128,24 @@ def _reindex_annotations(request, ids):
             break
 
 
-def _fetch_windows(session, column, chunksize=100):
-    updated = (
-        session.query(column)
-        .execution_options(stream_results=True)
-        .order_by(column.desc())
-        .all()
+def _windows(request, model, windowsize=100):
+    """
+    Generate WHERE clauses for windows of `model`, in order of when they were updated.
+
+    Each window is worked out and then handled in a transaction of its own,
+    which is committed once the caller is done with the window.
+    """
+    windows = column_windows(
+        request.db, (model.updated, model.id), windowsize=windowsize
     )
+    request.tm.commit()
 
-    count = len(updated)
-    windows = [
-        Window(
-            start=updated[min(x + chunksize, count) - 1].updated, end=updated[x].updated
-        )
-        for x in range(0, count, chunksize)
-    ]
+    while True:
+        request.tm.begin()
+        window = next(windows, None)
+        if window is None:
+            request.tm.commit()
+            return
 
-    return windows
+        yield window
+        request.tm.commit()
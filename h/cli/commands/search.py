@@ -12,24 +12,62 @@ def search():
 
 
 @search.command()
+@click.option(
+    "--workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of processes to index with",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Carry on with an unfinished reindex from its last checkpoint",
+)
+@click.option(
+    "--status", is_flag=True, help="Report the progress of a reindex and exit"
+)
 @click.pass_context
-def reindex(ctx):
+def reindex(ctx, workers, resume, status):
     """
     Reindex all annotations.
 
     Creates a new search index from the data in PostgreSQL and atomically
     updates the index alias. This requires that the index is aliased already,
     and will raise an error if it is not.
+
+    Progress is checkpointed as it goes, so if a reindex fails it can be
+    carried on with `--resume`.
     """
     os.environ["ELASTICSEARCH_CLIENT_TIMEOUT"] = "30"
 
     request = ctx.obj["bootstrap"]()
 
+    if status:
+        checkpoint = indexer.reindex_status(request)
+        if checkpoint is None:
+            click.echo("no reindex in progress")
+        else:
+            updated = checkpoint.start[0] if checkpoint.start else None
+            click.echo(
+                f"reindexing into {checkpoint.index}: "
+                f"about {checkpoint.indexed} annotations indexed, "
+                f"up to those updated at {updated}, "
+                f"{len(checkpoint.errored)} errored"
+            )
+        return
+
     es_client = request.es
 
     click.echo(f"reindexing into Elasticsearch {es_client.server_version} cluster")
 
-    indexer.reindex(request.db, es_client, request)
+    indexer.reindex(
+        request.db,
+        es_client,
+        request,
+        workers=workers,
+        bootstrap=ctx.obj["bootstrap"],
+        resume=resume,
+    )
 
 
 @search.command("update-settings")
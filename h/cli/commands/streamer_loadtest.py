@@ -0,0 +1,359 @@
+"""
+Measure how the websocket streamer performs with lots of connected clients.
+
+This starts the streamer app in-process on a local port, connects simulated
+websocket clients to it with a configurable mix of filters, and then injects
+annotation events through an in-memory stand-in for the realtime message
+queue. It reports how quickly the notifications reached the clients, and
+roughly how much memory each connection used. The clients run in the same
+process as the streamer, so the memory figure is an upper bound.
+
+It is only intended for use in development, against a development database.
+The standard library has to be patched by gevent before anything else is
+imported, which `python -m h` does when it's asked to run this command.
+"""
+import json
+import os
+import random
+import resource
+from collections import Counter, defaultdict
+from time import monotonic
+from unittest import mock
+
+import click
+import gevent
+import psycogreen.gevent
+from gevent import monkey
+from gevent.pool import Pool
+
+from h import models
+from h.streamer import create_app, messages
+from h.streamer.websocket import WebSocket
+from h.streamer.worker import WebSocketWSGIHandler, WSGIServer
+
+# The realtime topic annotation events are published to
+ANNOTATION_TOPIC = "annotation"
+
+# The kinds of filter a simulated client can subscribe with
+FILTER_KINDS = ("uri", "group", "none")
+
+# The order to delete what the load test created in, so nothing is deleted
+# while something else still refers to it
+DELETE_ORDER = (
+    models.Annotation,
+    models.DocumentMeta,
+    models.DocumentURI,
+    models.Document,
+)
+
+
+class InMemoryConsumer:
+    """
+    A stand-in for `h.realtime.Consumer` which doesn't need a message queue.
+
+    The streamer creates one of these for each topic it subscribes to, and
+    `publish()` delivers a message straight to the handler for its topic.
+    """
+
+    # Routing key -> handler of the consumers which are running
+    handlers = {}
+
+    def __init__(self, connection, routing_key, handler):
+        self.connection = connection
+        self.routing_key = routing_key
+        self.handler = handler
+
+    def run(self):
+        self.handlers[self.routing_key] = self.handler
+
+        # Like the real consumer, this never returns
+        while True:
+            gevent.sleep(60)
+
+    @classmethod
+    def publish(cls, routing_key, payload):
+        cls.handlers[routing_key](payload)
+
+
+def parse_filter_mix(value):
+    """
+    Parse a filter mix like "uri=80,group=20" into a dict of weights.
+
+    :raise click.BadParameter: if the mix isn't valid
+    """
+    mix = {}
+
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+
+        if kind not in FILTER_KINDS:
+            raise click.BadParameter(
+                f"unknown filter kind {kind!r}, "
+                f"expected one of: {', '.join(FILTER_KINDS)}"
+            )
+
+        try:
+            mix[kind] = float(weight)
+        except ValueError as err:
+            raise click.BadParameter(
+                f"invalid weight for {kind!r}: {weight!r}"
+            ) from err
+
+    if sum(mix.values()) <= 0:
+        raise click.BadParameter("at least one weight must be positive")
+
+    return mix
+
+
+def percentile(values, percent):
+    """Get the `percent` percentile of `values` (nearest rank)."""
+    if not values:
+        return None
+
+    values = sorted(values)
+    rank = max(int(round(percent / 100 * len(values))), 1)
+    return values[rank - 1]
+
+
+def make_filter(kind, uris):
+    """Get a random filter of the given kind, like the client would send."""
+    if kind == "uri":
+        clauses = [
+            {"field": "/uri", "operator": "one_of", "value": [random.choice(uris)]}
+        ]
+    elif kind == "group":
+        clauses = [{"field": "/group", "operator": "equals", "value": "__world__"}]
+    else:
+        # A page nobody is annotating
+        clauses = [
+            {
+                "field": "/uri",
+                "operator": "one_of",
+                "value": ["http://example.com/quiet"],
+            }
+        ]
+
+    return {
+        "match_policy": "include_any",
+        "clauses": clauses,
+        "actions": {"create": True, "update": True, "delete": True},
+    }
+
+
+def make_client_class():
+    # ws4py's gevent client is only importable once gevent has patched things
+    from ws4py.client.geventclient import (  # pylint:disable=import-outside-toplevel
+        WebSocketClient,
+    )
+
+    class LoadTestClient(WebSocketClient):
+        """A simulated websocket client which records delivery latencies."""
+
+        def __init__(self, url, published, latencies):
+            super().__init__(url)
+            self._published = published
+            self._latencies = latencies
+
+        def received_message(self, message):
+            received = monotonic()
+            payload = json.loads(message.data)
+
+            if payload.get("type") != "annotation-notification":
+                return
+
+            for annotation in payload["payload"]:
+                self._latencies.append(received - self._published[annotation["id"]])
+
+    return LoadTestClient
+
+
+class _AccessLog:
+    """An access log for the streamer's server which discards everything."""
+
+    def access(self, *args, **kwargs):
+        pass
+
+    def write(self, *args, **kwargs):
+        pass
+
+
+@click.command()
+@click.option("--connections", default=1000, help="Number of clients to connect")
+@click.option("--events", default=200, help="Number of annotation events to send")
+@click.option("--rate", default=50.0, help="Annotation events to send per second")
+@click.option("--uris", default=50, help="Number of distinct pages to annotate")
+@click.option(
+    "--filter-mix",
+    default="uri=90,group=5,none=5",
+    callback=lambda _ctx, _param, value: parse_filter_mix(value),
+    help=f"Weights of the kinds of filter clients use: {', '.join(FILTER_KINDS)}",
+)
+@click.option("--timeout", default=60.0, help="Seconds to wait for deliveries")
+@click.pass_context
+def streamer_loadtest(  # pylint:disable=too-many-arguments,too-many-locals
+    ctx, connections, events, rate, uris, filter_mix, timeout
+):
+    """Load test the websocket streamer with simulated clients."""
+    if not monkey.is_module_patched("socket"):
+        raise click.ClickException(
+            "the standard library isn't patched by gevent, "
+            "run this with `python -m h` (or bin/hypothesis)"
+        )
+
+    psycogreen.gevent.patch_psycopg()
+
+    # The test factories aren't needed by any other command
+    from tests.common import factories  # pylint:disable=import-outside-toplevel
+
+    request = ctx.obj["bootstrap"]()
+
+    uri_list = [f"http://example.com/loadtest/{i}" for i in range(uris)]
+    annotations = [
+        factories.Annotation.build(shared=True, target_uri=random.choice(uri_list))
+        for _ in range(events)
+    ]
+    request.db.add_all(annotations)
+    # This includes what the factories made for the annotations, like their
+    # documents, so it can all be deleted afterwards
+    created = list(request.db.new)
+    request.db.flush()
+    created = [(type(obj), obj.id) for obj in created]
+    annotation_ids = [annotation.id for annotation in annotations]
+    annotation_uris = {
+        annotation.id: annotation.target_uri for annotation in annotations
+    }
+    request.tm.commit()
+
+    os.environ["KILL_SWITCH_WEBSOCKET_METRICS"] = "1"
+
+    with mock.patch.object(messages, "Consumer", InMemoryConsumer):
+        app = create_app(None, **request.registry.settings)
+        server = WSGIServer(
+            ("127.0.0.1", 0),
+            app,
+            handler_class=WebSocketWSGIHandler,
+            spawn=Pool(connections + 10),
+        )
+        server.log = _AccessLog()
+        server.start()
+
+        try:
+            _run(
+                f"ws://127.0.0.1:{server.server_port}/ws",
+                make_client_class(),
+                WebSocket,
+                connections,
+                filter_mix,
+                uri_list,
+                annotation_ids,
+                annotation_uris,
+                rate,
+                timeout,
+            )
+        finally:
+            server.stop()
+
+            _delete(request.db, created)
+            request.tm.commit()
+
+
+def _delete(session, objects):
+    """Delete the `(model, id)` pairs in `objects` from the DB."""
+    ids = defaultdict(list)
+    for model, id_ in objects:
+        ids[model].append(id_)
+
+    for model in sorted(ids, key=DELETE_ORDER.index):
+        session.query(model).filter(model.id.in_(ids[model])).delete(
+            synchronize_session=False
+        )
+
+
+def _run(  # pylint:disable=too-many-arguments,too-many-locals
+    url,
+    client_class,
+    websocket_class,
+    connections,
+    filter_mix,
+    uris,
+    annotation_ids,
+    annotation_uris,
+    rate,
+    timeout,
+):
+    published = {}
+    latencies = []
+
+    # Connect the clients, remembering what each will receive
+    kinds = random.choices(
+        list(filter_mix), weights=list(filter_mix.values()), k=connections
+    )
+    filters = [make_filter(kind, uris) for kind in kinds]
+
+    rss_before = _max_rss()
+    clients = []
+
+    def connect(filter_):
+        client = client_class(url, published, latencies)
+        client.connect()
+        client.send(json.dumps({"filter": filter_}))
+        clients.append(client)
+
+    start = monotonic()
+    Pool(100).map(connect, filters)
+    _wait_for(
+        lambda: sum(1 for ws in websocket_class.instances if ws.filter_rows)
+        >= connections,
+        timeout,
+    )
+    connect_time = monotonic() - start
+    rss_per_connection = (_max_rss() - rss_before) / connections
+
+    # Work out how many notifications should be delivered
+    subscribers = Counter(
+        filter_["clauses"][0]["value"][0]
+        for filter_ in filters
+        if filter_["clauses"][0]["field"] == "/uri"
+    )
+    world_subscribers = sum(1 for kind in kinds if kind == "group")
+    expected = sum(
+        subscribers[annotation_uris[id_]] + world_subscribers for id_ in annotation_ids
+    )
+
+    # Send the events at the requested rate
+    start = monotonic()
+    for i, id_ in enumerate(annotation_ids):
+        gevent.sleep(max(start + i / rate - monotonic(), 0))
+        published[id_] = monotonic()
+        InMemoryConsumer.publish(
+            ANNOTATION_TOPIC,
+            {"annotation_id": id_, "action": "create", "src_client_id": "loadtest"},
+        )
+
+    _wait_for(lambda: len(latencies) >= expected, timeout)
+    elapsed = monotonic() - start
+
+    for client in clients:
+        client.close()
+
+    click.echo(f"Connections:         {connections} in {connect_time:.1f}s")
+    click.echo(f"Memory / connection: {rss_per_connection:.1f} KiB")
+    click.echo(f"Events:              {len(annotation_ids)} in {elapsed:.1f}s")
+    click.echo(f"Deliveries:          {len(latencies)} of {expected} expected")
+    click.echo(f"Throughput:          {len(latencies) / elapsed:.0f} deliveries/s")
+    for percent in (50, 99, 100):
+        latency = percentile(latencies, percent)
+        if latency is not None:
+            click.echo(f"Latency p{percent}:         {latency * 1000:.1f} ms")
+
+
+def _wait_for(condition, timeout):
+    deadline = monotonic() + timeout
+    while not condition() and monotonic() < deadline:
+        gevent.sleep(0.05)
+
+
+def _max_rss():
+    """Get the peak resident memory of this process in KiB (on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
@@ -121,6 +121,29 @@ def configure(environ=None, settings=None):  # pylint: disable=too-many-statemen
     )
 
     settings_manager.set("h.websocket_url", "WEBSOCKET_URL")
+    settings_manager.set(
+        "h.streamer.work_queue_consumers",
+        "WEBSOCKET_WORK_QUEUE_CONSUMERS",
+        type_=int,
+        default=4,
+    )
+    settings_manager.set(
+        "h.streamer.send_queue_size",
+        "WEBSOCKET_SEND_QUEUE_SIZE",
+        type_=int,
+        default=256,
+    )
+    settings_manager.set(
+        "h.streamer.slow_consumer_policy",
+        "WEBSOCKET_SLOW_CONSUMER_POLICY",
+        default="drop_oldest",
+    )
+    settings_manager.set(
+        "h.streamer.coalesce_window_ms",
+        "WEBSOCKET_COALESCE_WINDOW_MS",
+        type_=int,
+        default=0,
+    )
 
     # Reporting settings
     settings_manager.set("h.report.fdw_users", "REPORT_FDW_USERS", type_=aslist)
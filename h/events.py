@@ -5,3 +5,11 @@ class AnnotationEvent:
         self.request = request
         self.annotation_id = annotation_id
         self.action = action
+
+
+class DocumentURIsChangedEvent:
+    """An event representing a change in which URIs refer to the same document."""
+
+    def __init__(self, request, uris):
+        self.request = request
+        self.uris = uris
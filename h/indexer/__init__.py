@@ -1,3 +1,3 @@
-from h.indexer.reindexer import reindex
+from h.indexer.reindexer import reindex, reindex_status
 
-__all__ = ("reindex",)
+__all__ = ("reindex", "reindex_status")
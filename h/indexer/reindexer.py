@@ -1,4 +1,11 @@
+import json
 import logging
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import closing
+from datetime import datetime, timedelta
+from itertools import islice
 
 from h.search.config import (
     configure_index,
@@ -6,13 +13,107 @@ from h.search.config import (
     get_aliased_index,
     update_aliased_index,
 )
-from h.search.index import BatchIndexer
+from h.search.index import (
+    PG_WINDOW_SIZE,
+    BatchIndexer,
+    annotation_count_estimate,
+    annotation_windows,
+)
 
 log = logging.getLogger(__name__)
 
+# The setting which tells the app to index annotations into the new index too
+NEW_INDEX_SETTING = "reindex.new_index"
+
+# The setting which records how far the reindex has got
+CHECKPOINT_SETTING = "reindex.checkpoint"
+
+# The request each worker process indexes with, set up by `_start_worker()`
+_worker_request = None
+
+
+class Checkpoint:
+    """
+    How far a reindex has got, saved in the settings so it can be resumed.
+
+    Annotations are indexed in windows in order of `(Annotation.updated,
+    Annotation.id)`, which can finish out of order when there are several
+    workers. `start` is the `(updated, id)` value of the start of the first
+    window which hasn't finished, so everything before it has been indexed.
+    """
+
+    def __init__(self, index, start=None, errored=(), indexed=0):
+        """
+        Create a new checkpoint.
+
+        :param index: the name of the index being reindexed into
+        :param start: the `(updated, id)` value annotations before have been
+            indexed
+        :param errored: ids of annotations which failed to index
+        :param indexed: roughly how many annotations have been indexed
+        """
+        self.index = index
+        self.start = start
+        self.errored = set(errored)
+        self.indexed = indexed
+
+    @classmethod
+    def load(cls, settings):
+        """Get the checkpoint of the reindex in progress, or `None`."""
+        value = settings.get(CHECKPOINT_SETTING)
+        if value is None:
+            return None
+
+        data = json.loads(value)
+
+        start = None
+        if data["start"]:
+            updated, id_ = data["start"]
+            start = (datetime.fromisoformat(updated), id_)
+
+        return cls(
+            index=data["index"],
+            start=start,
+            errored=data["errored"],
+            indexed=data["indexed"],
+        )
+
+    def save(self, settings):
+        start = None
+        if self.start:
+            updated, id_ = self.start
+            start = [updated.isoformat(), id_]
+
+        settings.put(
+            CHECKPOINT_SETTING,
+            json.dumps(
+                {
+                    "index": self.index,
+                    "start": start,
+                    "errored": sorted(self.errored),
+                    "indexed": self.indexed,
+                }
+            ),
+        )
+
+
+def reindex(  # pylint:disable=too-many-arguments
+    session, es, request, workers=1, bootstrap=None, resume=False
+):
+    """
+    Reindex all annotations into a new index, and update the alias.
+
+    Progress is checkpointed in the settings as windows of annotations are
+    indexed. If the reindex fails the new index is left in place, and it
+    can be carried on with `resume=True`.
 
-def reindex(session, es, request):
-    """Reindex all annotations into a new index, and update the alias."""
+    :param workers: the number of processes to index with
+    :param bootstrap: a function returning a bootstrapped request, which
+        each worker process calls to get its own DB session and ES client.
+        This is required if there's more than one worker.
+    :param resume: carry on with the reindex in progress, rather than
+        starting a new one
+    """
 
     current_index = get_aliased_index(es)
     if current_index is None:
@@ -24,32 +125,183 @@ def reindex(session, es, request):
     nipsa_svc = request.find_service(name="nipsa")
     nipsa_svc.fetch_all_flagged_userids()
 
-    new_index = configure_index(es)
-    log.info("configured new index %s", new_index)
-    setting_name = "reindex.new_index"
+    previous = Checkpoint.load(settings)
+    if resume:
+        if previous is None:
+            raise RuntimeError("there is no reindex in progress to resume")
+
+        checkpoint = previous
+        log.info("resuming reindex into %s from %s", checkpoint.index, checkpoint.start)
+
+        if checkpoint.index == current_index:
+            # We got as far as switching over, and only the tidying up is left
+            log.info("new index %s is already current", current_index)
+            _finish(settings, request)
+            return
+    else:
+        if previous is not None:
+            log.warning("abandoning the unfinished reindex into %s", previous.index)
+
+        checkpoint = Checkpoint(index=configure_index(es))
+        log.info("configured new index %s", checkpoint.index)
+
+    new_index = checkpoint.index
+    settings.put(NEW_INDEX_SETTING, new_index)
+    checkpoint.save(settings)
+    request.tm.commit()
 
-    try:  # pylint:disable=too-many-try-statements
-        settings.put(setting_name, new_index)
-        request.tm.commit()
+    log.info("reindexing annotations into new index %s", new_index)
+    total = max(annotation_count_estimate(session) - checkpoint.indexed, 0)
+    log.info("indexing about %d annotations with %d workers", total, workers)
 
-        log.info("reindexing annotations into new index %s", new_index)
+    windows = annotation_windows(session, start=checkpoint.start)
+    progress = _Progress(total=total)
+    finished = {}
+    next_window = 0
+
+    with closing(
+        _index_windows(session, es, request, new_index, windows, workers, bootstrap)
+    ) as results:
+        for i, window, errored in results:
+            progress.update(PG_WINDOW_SIZE)
+            finished[i] = window
+            checkpoint.errored.update(errored)
+
+            while next_window in finished:
+                start, end = finished.pop(next_window)
+                next_window += 1
+                checkpoint.indexed += PG_WINDOW_SIZE
+
+                # The last window is done again if we resume after all of them
+                checkpoint.start = start if end is None else end
+
+            checkpoint.save(settings)
+            request.tm.commit()
+
+    errored = checkpoint.errored
+    if errored:
+        log.debug("failed to index %d annotations, retrying...", len(errored))
         indexer = BatchIndexer(
             session, es, request, target_index=new_index, op_type="create"
         )
-
-        errored = indexer.index()
+        errored = indexer.index(errored)
         if errored:
-            log.debug("failed to index %d annotations, retrying...", len(errored))
-            errored = indexer.index(errored)
-            if errored:
-                log.warning("failed to index %d annotations: %r", len(errored), errored)
+            log.warning("failed to index %d annotations: %r", len(errored), errored)
+
+    log.info("making new index %s current", new_index)
+    update_aliased_index(es, new_index)
 
-        log.info("making new index %s current", new_index)
-        update_aliased_index(es, new_index)
+    log.info("removing previous index %s", current_index)
+    delete_index(es, current_index)
 
-        log.info("removing previous index %s", current_index)
-        delete_index(es, current_index)
+    _finish(settings, request)
 
-    finally:
-        settings.delete(setting_name)
-        request.tm.commit()
+
+def reindex_status(request):
+    """Get the checkpoint of the reindex in progress, or `None`."""
+    return Checkpoint.load(request.find_service(name="settings"))
+
+
+def _finish(settings, request):
+    settings.delete(NEW_INDEX_SETTING)
+    settings.delete(CHECKPOINT_SETTING)
+    request.tm.commit()
+
+
+def _index_windows(  # pylint:disable=too-many-arguments
+    session, es, request, target_index, windows, workers, bootstrap
+):
+    """
+    Index windows of annotations, in this process or in worker processes.
+
+    `windows` is only read from as the workers need more windows to index.
+
+    :returns: an iterator of `(i, window, errored)` tuples for each window as
+        it finishes, where `i` is its position in `windows` and `errored` is
+        a set of the ids which failed
+    """
+    windows = enumerate(windows)
+
+    if workers <= 1:
+        indexer = BatchIndexer(
+            session, es, request, target_index=target_index, op_type="create"
+        )
+        for i, window in windows:
+            yield i, window, indexer.index(window=window)
+
+        return
+
+    # Spawned rather than forked, so no process shares the DB connections or
+    # sockets of another
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_start_worker,
+        initargs=(bootstrap,),
+    ) as executor:
+        futures = {}
+
+        try:
+            while True:
+                # Keep enough windows queued up for the workers to carry on
+                # with while we wait for the next one to finish
+                for i, window in islice(windows, workers * 2 - len(futures)):
+                    future = executor.submit(_index_window, target_index, window)
+                    futures[future] = i, window
+
+                if not futures:
+                    break
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield (*futures.pop(future), future.result())
+        except BaseException:
+            # Don't wait for the rest of the windows before giving up
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def _start_worker(bootstrap):
+    global _worker_request  # pylint:disable=global-statement
+
+    _worker_request = bootstrap()
+
+    # Preload userids of shadowbanned users, as in the main process
+    _worker_request.find_service(name="nipsa").fetch_all_flagged_userids()
+
+
+def _index_window(target_index, window):
+    indexer = BatchIndexer(
+        _worker_request.db,
+        _worker_request.es,
+        _worker_request,
+        target_index=target_index,
+        op_type="create",
+    )
+
+    return indexer.index(window=window)
+
+
+class _Progress:
+    """Log the overall progress of a reindex, with its rate and ETA."""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.start = time.time()
+
+    def update(self, count):
+        self.done = min(self.done + count, self.total)
+
+        elapsed = time.time() - self.start
+        rate = self.done / elapsed if elapsed else 0
+        eta = timedelta(seconds=round((self.total - self.done) / rate)) if rate else "?"
+
+        log.info(
+            "indexed %ik of %ik annotations, rate=%s/s, eta=%s",
+            self.done // 1000,
+            self.total // 1000,
+            round(rate),
+            eta,
+        )
@@ -0,0 +1,19 @@
+"""Add an index on annotation.updated and annotation.id."""
+from alembic import op
+
+revision = "3e1727613916"
+down_revision = "be612e693243"
+
+
+def upgrade():
+    op.execute("COMMIT")
+    op.create_index(
+        op.f("ix__annotation_updated_id"),
+        "annotation",
+        ["updated", "id"],
+        postgresql_concurrently=True,
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix__annotation_updated_id"), "annotation")
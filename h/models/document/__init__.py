@@ -1,5 +1,6 @@
 from h.models.document._document import (
     Document,
+    changed_documents,
     merge_documents,
     update_document_metadata,
 )
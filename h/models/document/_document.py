@@ -4,7 +4,7 @@ from urllib.parse import urlparse
 
 import sqlalchemy as sa
 
-from h.db import Base, mixins
+from h.db import Base, Session, mixins
 from h.models.annotation import Annotation
 from h.models.document._exceptions import ConcurrentUpdateError
 from h.models.document._meta import create_or_update_document_meta
@@ -162,6 +162,8 @@ def merge_documents(session, documents, updated=None):
     except sa.exc.IntegrityError as err:
         raise ConcurrentUpdateError("concurrent document merges") from err
 
+    changed_documents(session).add(master)
+
     return master
 
 
@@ -215,6 +217,7 @@ def update_document_metadata(  # pylint: disable=too-many-arguments
 
     document.updated = updated
 
+    uri_count = len(document.document_uris)
     for document_uri_dict in document_uri_dicts:
         create_or_update_document_uri(
             session=session,
@@ -224,6 +227,9 @@ def update_document_metadata(  # pylint: disable=too-many-arguments
             **document_uri_dict,
         )
 
+    if len(document.document_uris) != uri_count:
+        changed_documents(session).add(document)
+
     document.update_web_uri()
 
     for document_meta_dict in document_meta_dicts:
@@ -236,3 +242,30 @@ def update_document_metadata(  # pylint: disable=too-many-arguments
         )
 
     return document
+
+
+def changed_documents(session):
+    """
+    Get the documents whose set of equivalent URIs has changed in `session`.
+
+    This includes documents which have had URIs added to them, and documents
+    which others have been merged into. Callers which act on these changes
+    should clear the returned set once they have done so. Anything left in it
+    is forgotten when the transaction ends, so long running commands don't
+    keep every document they've merged.
+
+    :rtype: set of h.models.Document
+    """
+    return session.info.setdefault(_CHANGED_DOCUMENTS, set())
+
+
+# The key in `Session.info` of the documents whose URIs have changed
+_CHANGED_DOCUMENTS = "h.changed_documents"
+
+
+@sa.event.listens_for(Session, "after_transaction_end")
+def _forget_changed_documents(session, transaction):
+    # Whether it was committed or rolled back, the outermost transaction is
+    # over, and the changes in it have been acted on or abandoned
+    if transaction.parent is None:
+        session.info.pop(_CHANGED_DOCUMENTS, None)
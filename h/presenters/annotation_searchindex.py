@@ -10,7 +10,43 @@ class AnnotationSearchIndexPresenter:
         self.annotation = annotation
         self.request = request
 
+    @classmethod
+    def present_batch(cls, annotations, request):
+        """
+        Present several annotations at once.
+
+        This is the same as calling `asdict()` for each annotation, but looks
+        up which annotations are hidden and which users are NIPSA'd for all of
+        them together, rather than once for each annotation.
+
+        :rtype: list of dicts
+        """
+        annotations = list(annotations)
+
+        hidden_ids = request.find_service(name="annotation_moderation").all_hidden(
+            [id_ for annotation in annotations for id_ in cls._thread(annotation)]
+        )
+        nipsa_userids = request.find_service(name="nipsa").flagged_userids(
+            annotation.userid for annotation in annotations
+        )
+
+        return [
+            cls(annotation, request)._asdict(hidden_ids, nipsa_userids)
+            for annotation in annotations
+        ]
+
     def asdict(self):
+        hidden_ids = self.request.find_service(name="annotation_moderation").all_hidden(
+            self._thread(self.annotation)
+        )
+
+        nipsa_userids = set()
+        if self.request.find_service(name="nipsa").is_flagged(self.annotation.userid):
+            nipsa_userids.add(self.annotation.userid)
+
+        return self._asdict(hidden_ids, nipsa_userids)
+
+    def _asdict(self, hidden_ids, nipsa_userids):
         docpresenter = DocumentSearchIndexPresenter(self.annotation.document)
         userid_parts = split_user(self.annotation.userid)
 
@@ -39,24 +75,18 @@ class AnnotationSearchIndexPresenter:
         if self.annotation.references:
             result["references"] = self.annotation.references
 
-        self._add_hidden(result)
-        self._add_nipsa(result, self.annotation.userid)
-
-        return result
-
-    def _add_hidden(self, result):
         # Mark an annotation as hidden if it and all of it's children have been
         # moderated and hidden.
-        parents_and_replies = [self.annotation.id] + self.annotation.thread_ids
-
-        ann_mod_svc = self.request.find_service(name="annotation_moderation")
-        is_hidden = len(ann_mod_svc.all_hidden(parents_and_replies)) == len(
-            parents_and_replies
+        result["hidden"] = all(
+            id_ in hidden_ids for id_ in self._thread(self.annotation)
         )
 
-        result["hidden"] = is_hidden
-
-    def _add_nipsa(self, result, user_id):
-        nipsa_service = self.request.find_service(name="nipsa")
-        if nipsa_service.is_flagged(user_id):
+        if self.annotation.userid in nipsa_userids:
             result["nipsa"] = True
+
+        return result
+
+    @staticmethod
+    def _thread(annotation):
+        """Return the ids of the annotation and all of its replies."""
+        return [annotation.id] + annotation.thread_ids
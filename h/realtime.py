@@ -89,6 +89,14 @@ class Publisher:
         """
         self._publish("user", payload)
 
+    def publish_document(self, payload):
+        """
+        Publish a document message with the routing key 'document'.
+
+        :raise RealtimeMessageQueueError: When we cannot queue the message
+        """
+        self._publish("document", payload)
+
     def _publish(self, routing_key, payload):
         try:  # pylint: disable=too-many-try-statements
             with producer_pool[self.connection].acquire(
@@ -6,7 +6,7 @@ from dateutil.parser import parse
 from pyramid import i18n
 
 from h.schemas.base import JSONSchema, ValidationError
-from h.search.query import LIMIT_DEFAULT, LIMIT_MAX, OFFSET_MAX
+from h.search.query import LIMIT_DEFAULT, LIMIT_MAX, OFFSET_MAX, Sorter
 from h.search.util import wildcard_uri_is_valid
 from h.util import document_claims
 
@@ -24,6 +24,14 @@ def _validate_wildcard_uri(node, value):
             )
 
 
+def _validate_cursor(node, value):
+    """Raise if the cursor isn't one returned by a search."""
+    try:
+        Sorter.decode_cursor(value)
+    except ValueError as err:
+        raise colander.Invalid(node, "Invalid cursor") from err
+
+
 DOCUMENT_SCHEMA = {
     "type": "object",
     "properties": {
@@ -326,6 +334,16 @@ class SearchParamsSchema(colander.Schema):
                     epoch. This is used for iteration through large collections
                     of results.""",
     )
+    cursor = colander.SchemaNode(
+        colander.String(),
+        validator=_validate_cursor,
+        missing=colander.drop,
+        description="""Returns the page of results after the one which returned
+                    this cursor, as `next`. The cursor includes the sort order,
+                    so `sort`, `order`, `search_after` and `offset` are ignored.
+                    This is efficient however far through the results the page
+                    is.""",
+    )
     limit = colander.SchemaNode(
         colander.Integer(),
         validator=colander.Range(min=0, max=LIMIT_MAX),
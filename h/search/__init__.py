@@ -5,6 +5,7 @@ from h.search.query import (
     AuthorityFilter,
     DeletedFilter,
     Limiter,
+    SharedAnnotationsFilter,
     TagsAggregation,
     TopLevelAnnotationsFilter,
     UserFilter,
@@ -16,6 +17,7 @@ __all__ = (
     "TopLevelAnnotationsFilter",
     "DeletedFilter",
     "Limiter",
+    "SharedAnnotationsFilter",
     "UserFilter",
     "AuthorityFilter",
     "TagsAggregation",
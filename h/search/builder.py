@@ -0,0 +1,106 @@
+import elasticsearch_dsl
+from elasticsearch_dsl import Q
+
+
+class SearchBuilder:
+    """
+    Collects the clauses of a search and compiles them in one go.
+
+    This has the parts of the `elasticsearch_dsl.Search` interface which the
+    search modifiers use. Each call to `elasticsearch_dsl.Search.filter()`
+    and friends copies the whole search and merges the new clause into the
+    existing query, so a search with a dozen modifiers does that a dozen
+    times. This just records each clause, and `compile()` builds the
+    `elasticsearch_dsl.Search` once at the end.
+
+    Like `elasticsearch_dsl.Search` each method returns the builder, so it can
+    be passed to the modifiers in its place. Unlike it, calls change the
+    builder they are made on.
+    """
+
+    def __init__(self, using, index):
+        self._search = elasticsearch_dsl.Search(using=using, index=index)
+        self._must = []
+        self._filter = []
+        self._must_not = []
+        self._sort = None
+        self._extra = {}
+        self._slice = None
+
+    @property
+    def aggs(self):
+        """Get the aggregations of the search, to add buckets to."""
+        return self._search.aggs
+
+    def query(self, *args, **kwargs):
+        """Add a query which matching annotations must match."""
+        self._must.append(Q(*args, **kwargs))
+        return self
+
+    def filter(self, *args, **kwargs):
+        """Add a filter which matching annotations must match."""
+        self._filter.append(Q(*args, **kwargs))
+        return self
+
+    def exclude(self, *args, **kwargs):
+        """Add a filter which matching annotations must not match."""
+        self._must_not.append(Q(*args, **kwargs))
+        return self
+
+    def sort(self, *keys):
+        """Set the sort order, replacing any previous one."""
+        self._sort = keys
+        return self
+
+    def source(self, fields):
+        """Set which fields of each annotation to return."""
+        self._search = self._search.source(fields)
+        return self
+
+    def extra(self, **kwargs):
+        """Add extra keys to the request body."""
+        self._extra.update(kwargs)
+        return self
+
+    def __getitem__(self, slice_):
+        self._slice = slice_
+        return self
+
+    def compile(self):
+        """
+        Get the `elasticsearch_dsl.Search` with all the clauses added.
+
+        :rtype: elasticsearch_dsl.Search
+        """
+        search = self._search
+
+        clauses = {
+            occurrence: queries
+            for occurrence, queries in (
+                ("must", self._must),
+                ("filter", self._filter),
+                ("must_not", self._must_not),
+            )
+            if queries
+        }
+        if clauses:
+            search = search.query(Q("bool", **clauses))
+
+        if self._sort is not None:
+            search = search.sort(*self._sort)
+
+        if self._extra:
+            search = search.extra(**self._extra)
+
+        if self._slice is not None:
+            search = search[self._slice]
+
+        return search
+
+    def to_dict(self):
+        """Get the body of the search request."""
+        return self.compile().to_dict()
+
+    def execute(self):
+        """Compile and run the search."""
+        return self.compile().execute()
@@ -1,16 +1,18 @@
 import logging
 from collections import namedtuple
 
-import elasticsearch_dsl
 from webob.multidict import MultiDict
 
 from h.search import query
+from h.search.builder import SearchBuilder
 from h.util import metrics
 
 log = logging.getLogger(__name__)
 
 SearchResult = namedtuple(
-    "SearchResult", ["total", "annotation_ids", "reply_ids", "aggregations"]
+    "SearchResult",
+    ["total", "annotation_ids", "reply_ids", "aggregations", "cursor"],
+    defaults=[None],
 )
 
 
@@ -73,10 +75,30 @@ class Search:
         :rtype: SearchResult
         """
         metrics.record_search_query_params(params, self.separate_replies)
-        total, annotation_ids, aggregations = self._search_annotations(params)
+        total, annotation_ids, aggregations, cursor = self._search_annotations(params)
         reply_ids = self._search_replies(annotation_ids)
 
-        return SearchResult(total, annotation_ids, reply_ids, aggregations)
+        return SearchResult(total, annotation_ids, reply_ids, aggregations, cursor)
+
+    def prepare_aggregations(self, params):
+        """
+        Build a search for only the aggregations matching `params`.
+
+        Anything which needs the request or the DB, like expanding URIs, is
+        done straight away. The returned function only talks to
+        Elasticsearch, so it can be called later, from another thread.
+
+        :param params: the search parameters
+        :type params: webob.multidict.MultiDict
+
+        :returns: A function which runs the search and returns its parsed
+            aggregations
+        """
+        params = params.copy()
+        params["limit"] = 0
+        search = self._build(self._modifiers, self._aggregations, params)
+
+        return lambda: self._parse_aggregation_results(search.execute().aggregations)
 
     def clear(self):
         """Clear search modifiers, aggregators, and matchers."""
@@ -96,17 +118,19 @@ class Search:
 
     def _search(self, modifiers, aggregations, params):
         """Apply the modifiers, aggregations, and executes the search."""
+        return self._build(modifiers, aggregations, params).execute()
+
+    def _build(self, modifiers, aggregations, params):
+        """Apply the modifiers and aggregations to a new search."""
         # Don't return any fields, just the metadata so set _source=False.
-        search = elasticsearch_dsl.Search(
-            using=self.es.conn, index=self.es.index
-        ).source(False)
+        search = SearchBuilder(using=self.es.conn, index=self.es.index).source(False)
 
         for agg in aggregations:
             agg(search, params)
         for qual in modifiers:
             search = qual(search, params)
 
-        return search.execute()
+        return search.compile()
 
     def _search_annotations(self, params):
         # If separate_replies is True, don't return any replies to annotations.
@@ -114,17 +138,29 @@ class Search:
         if self.separate_replies:
             modifiers = [query.TopLevelAnnotationsFilter()] + modifiers
 
-        response = self._search(modifiers, self._aggregations, params)
+        search = self._build(modifiers, self._aggregations, params)
+        response = search.execute()
 
         total = self._get_total_hits(response)
         annotation_ids = [hit["_id"] for hit in response["hits"]["hits"]]
         aggregations = self._parse_aggregation_results(response.aggregations)
-        return (total, annotation_ids, aggregations)
+        cursor = query.Sorter.next_cursor(search, response)
+        return (total, annotation_ids, aggregations, cursor)
 
     def _search_replies(self, annotation_ids):
-        if not self.separate_replies:
+        # Most pages have no annotations, and then there can't be any replies
+        # so there's no need for a second round trip to Elasticsearch.
+        if not self.separate_replies or not annotation_ids:
             return []
 
+        # FIXME: This is a second round trip to Elasticsearch for every page
+        # with annotations on it. It can't be sent with the first search in an
+        # `_msearch`, as it needs the ids that search returns. Fetching the
+        # replies with their annotations (with `inner_hits`) needs a join
+        # field in the index mapping. Every write would then have to be routed
+        # to its thread's shard, so it needs a reindex into a new index
+        # before the query can change.
+
         # The only difference between a search for annotations and a search for
         # replies to annotations is the RepliesMatcher and the params passed to
         # the modifiers.
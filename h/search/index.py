@@ -2,6 +2,7 @@
 
 import logging
 import time
+from itertools import islice
 
 import sqlalchemy as sa
 from elasticsearch import helpers as es_helpers
@@ -9,11 +10,17 @@ from packaging.version import Version
 from sqlalchemy.orm import subqueryload
 
 from h import models, presenters
-from h.util.query import column_windows
+from h.util.query import column_window_bounds, column_windows, window_clause
 
 log = logging.getLogger(__name__)
 
 PG_WINDOW_SIZE = 2500
+ES_CHUNK_SIZE = 2500
+
+# Annotations are windowed in the order they were updated in. The id makes
+# each window exactly the size asked for, even when lots of annotations have
+# the same updated time.
+_WINDOW_COLUMNS = (models.Annotation.updated, models.Annotation.id)
 
 
 class BatchIndexer:
@@ -33,7 +40,7 @@ class BatchIndexer:
         else:
             self._target_index = target_index
 
-    def index(self, annotation_ids=None, windowsize=PG_WINDOW_SIZE):
+    def index(self, annotation_ids=None, windowsize=PG_WINDOW_SIZE, window=None):
         """
         Reindex annotations.
 
@@ -41,26 +48,35 @@ class BatchIndexer:
         :type annotation_ids: collection
         :param windowsize: the number of annotations to index in between progress log statements
         :type windowsize: integer
+        :param window: a `(start, end)` range of `Annotation.updated` to
+            reindex, as returned by `annotation_windows()`, instead of all
+            annotations
+        :type window: tuple
 
         :returns: a set of errored ids
         :rtype: set
         """
-        if annotation_ids is None:
-            annotations = _all_annotations(session=self.session, windowsize=windowsize)
-        else:
+        if annotation_ids is not None:
             annotations = _filtered_annotations(
                 session=self.session, ids=annotation_ids
             )
+        elif window is not None:
+            # Whoever split the annotations up into windows reports progress
+            annotations = _windowed_annotations(session=self.session, window=window)
+        else:
+            annotations = _all_annotations(session=self.session, windowsize=windowsize)
 
-        # Report indexing status as we go
-        annotations = _log_status(annotations, log_every=windowsize)
+        if window is None:
+            # Report indexing status as we go
+            annotations = _log_status(annotations, log_every=windowsize)
 
         indexing = es_helpers.streaming_bulk(
             self.es_client.conn,
-            annotations,
-            chunk_size=2500,
+            self._actions(annotations),
+            chunk_size=ES_CHUNK_SIZE,
             raise_on_error=False,
-            expand_action_callback=self._prepare,
+            # The actions are already expanded by `_actions()`
+            expand_action_callback=lambda action: action,
         )
         errored = set()
         for ok, item in indexing:
@@ -74,7 +90,18 @@ class BatchIndexer:
                 errored.add(status["_id"])
         return errored
 
-    def _prepare(self, annotation):
+    def _actions(self, annotations):
+        # Present the annotations a chunk at a time, so the presenter can look
+        # up what it needs for the whole chunk at once
+        annotations = iter(annotations)
+        while chunk := list(islice(annotations, ES_CHUNK_SIZE)):
+            bodies = presenters.AnnotationSearchIndexPresenter.present_batch(
+                chunk, self.request
+            )
+            for annotation, body in zip(chunk, bodies):
+                yield {self.op_type: self._operation(annotation)}, body
+
+    def _operation(self, annotation):
         operation = {
             "_index": self._target_index,
             "_id": annotation.id,
@@ -82,11 +109,43 @@ class BatchIndexer:
         if self.es_client.server_version < Version("7.0.0"):
             operation["_type"] = self.es_client.mapping_type
 
-        data = presenters.AnnotationSearchIndexPresenter(
-            annotation, self.request
-        ).asdict()
+        return operation
+
 
-        return {self.op_type: operation}, data
+def annotation_windows(session, windowsize=PG_WINDOW_SIZE, start=None):
+    """
+    Split the annotations to index up into windows.
+
+    Each window can be reindexed separately with `BatchIndexer.index()`.
+    The windows are worked out as they are needed.
+
+    :param windowsize: the number of annotations in each window
+    :param start: only include annotations from this `(updated, id)` value on
+    :returns: an iterator of `(start, end)` tuples of `(updated, id)` values
+    """
+    where = _annotation_filter()
+    if start is not None:
+        where = sa.and_(where, window_clause(_WINDOW_COLUMNS, start, None))
+
+    return column_window_bounds(
+        session=session, column=_WINDOW_COLUMNS, windowsize=windowsize, where=where
+    )
+
+
+def annotation_count_estimate(session):
+    """
+    Estimate how many annotations there are, without counting them.
+
+    This is the number of rows in the annotation table according to
+    Postgres' statistics, so it can be out of date and includes deleted
+    annotations.
+    """
+    count = session.execute(
+        sa.text("SELECT reltuples FROM pg_class WHERE relname = 'annotation'")
+    ).scalar()
+
+    # The statistics say -1 (or nothing) if they've never been gathered
+    return max(int(count or 0), 0)
 
 
 def _all_annotations(session, windowsize=2000):
@@ -96,7 +155,7 @@ def _all_annotations(session, windowsize=2000):
     # document data.
     windows = column_windows(
         session=session,
-        column=models.Annotation.updated,  # implicit ASC
+        column=_WINDOW_COLUMNS,
         windowsize=windowsize,
         where=_annotation_filter(),
     )
@@ -106,6 +165,12 @@ def _all_annotations(session, windowsize=2000):
         yield from query.filter(window)
 
 
+def _windowed_annotations(session, window):
+    yield from _eager_loaded_annotations(session).filter(
+        _annotation_filter(), window_clause(_WINDOW_COLUMNS, *window)
+    )
+
+
 def _filtered_annotations(session, ids):
     annotations = (
         _eager_loaded_annotations(session)
@@ -5,15 +5,10 @@ The query parser which converts our subset of the Apache Lucene syntax and
 transforms it into a MultiDict structure that h.search understands.
 """
 
-from collections import namedtuple
-from functools import lru_cache
+import re
 
-import pyparsing as pp
 from webob.multidict import MultiDict
 
-# Enable memoizing of the parsing logic
-pp.ParserElement.enable_packrat()
-
 # Named fields we support when querying (e.g. `user:luke`)
 named_fields = ["user", "tag", "group", "uri", "url"]
 
@@ -45,7 +40,18 @@ whitespace = {
     "\u3000",  # ideographic space
 }
 
-Match = namedtuple("Match", ["key", "value"])
+# Whitespace which is skipped between terms (and before the ":" of a field).
+# Any other whitespace outside of quotes ends the query.
+_SKIPPED_WHITESPACE = re.compile(r"[ \n\t\r]*")
+
+# A run of non-whitespace characters
+_WORD = re.compile("[^" + re.escape("".join(sorted(whitespace))) + "]+")
+
+# The opening quote and contents of a quoted term. The closing quote must
+# come straight after. A quote can be included by doubling it or escaping it
+# with a backslash.
+_DOUBLE_QUOTED = re.compile(r'"(?:[^"\n\r\\]|(?:"")|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*')
+_SINGLE_QUOTED = re.compile(r"'(?:[^'\n\r\\]|(?:'')|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*")
 
 
 def parse(query):
@@ -65,12 +71,18 @@ def parse(query):
     Supported keys for fields are ``user``, ``group``, ``tag``, ``uri``.
     Any other search terms will get the key ``any``.
     """
-    parse_results = _make_parser().parse_string(query)
+    # Tabs in values are expanded to spaces, as they were when we used
+    # pyparsing to parse queries
+    query = query.expandtabs()
+
+    terms = []
+    position = 0
+
+    while (term := _parse_term(query, position)) is not None:
+        key, value, position = term
+        terms.append((key, value))
 
-    # The parser returns all matched strings, even the field names, we use a
-    # parse action to turn matches into a key/value pair (Match), but we need
-    # to filter out any other matches that the parser returns.
-    return MultiDict([m for m in parse_results if isinstance(m, Match)])
+    return MultiDict(terms)
 
 
 def unparse(query):
@@ -92,38 +104,52 @@ def unparse(query):
     return " ".join(terms)
 
 
-@lru_cache(maxsize=None)
-def _make_parser():
-    word = pp.CharsNotIn("".join(whitespace))
-    word.skipWhitespace = True
-
-    value = pp.MatchFirst(
-        [
-            pp.dbl_quoted_string.copy().set_parse_action(pp.remove_quotes),
-            pp.sgl_quoted_string.copy().set_parse_action(pp.remove_quotes),
-            pp.Empty() + pp.CharsNotIn("".join(whitespace)),
-        ]
-    )
+def _parse_term(query, position):
+    """
+    Parse the term starting at `position`.
 
-    expressions = []
+    :return: A tuple of the term's key, its value and the position after it,
+        or `None` if there are no more terms
+    """
+    start = _SKIPPED_WHITESPACE.match(query, position).end()
 
     for field in named_fields:
-        exp = pp.Suppress(
-            pp.CaselessLiteral(field) + ":"
-        ) + value.copy().set_parse_action(_decorate_match(field))
-        expressions.append(exp)
+        end = start + len(field)
+
+        if query[start:end].upper() == field.upper():
+            colon = _SKIPPED_WHITESPACE.match(query, end).end()
+
+            if query.startswith(":", colon):
+                value = _parse_value(query, colon + 1)
+                if value is not None:
+                    return (field, *value)
+
+    # Anything which isn't a named field, including `bogus:value`
+    value = _parse_value(query, start)
+    if value is not None:
+        return ("any", *value)
 
-    any_ = value.copy().set_parse_action(_decorate_match("any"))
-    expressions.append(any_)
+    return None
 
-    return pp.ZeroOrMore(pp.MatchFirst(expressions))
 
+def _parse_value(query, position):
+    """
+    Parse a quoted or unquoted value starting at `position`.
+
+    :return: A tuple of the value and the position after it, or `None`
+    """
+    start = _SKIPPED_WHITESPACE.match(query, position).end()
+
+    for pattern, quote in ((_DOUBLE_QUOTED, '"'), (_SINGLE_QUOTED, "'")):
+        match = pattern.match(query, start)
+        if match and query.startswith(quote, match.end()):
+            return query[start + 1 : match.end()], match.end() + 1
 
-def _decorate_match(key):
-    def parse_action_impl(term):
-        return Match(key, term[0])
+    match = _WORD.match(query, start)
+    if match:
+        return match.group(), match.end()
 
-    return parse_action_impl
+    return None
 
 
 def _escape_term(term):
@@ -1,3 +1,5 @@
+import base64
+import json
 from datetime import datetime as dt
 
 from dateutil import tz
@@ -14,6 +16,8 @@ LIMIT_DEFAULT = 20
 LIMIT_MAX = 200
 OFFSET_MAX = 9800
 DEFAULT_DATE = dt(1970, 1, 1, 0, 0, 0, 0).replace(tzinfo=tz.tzutc())
+# The fields annotations can be sorted by in the index.
+SORT_FIELDS = ("created", "updated", "group", "id", "user_raw")
 
 
 def popall(multidict, key):
@@ -82,21 +86,42 @@ class Limiter:
 
 class Sorter:
     """
-    Sorts and returns annotations after search_after.
+    Sorts and returns annotations after search_after or a cursor.
 
     Sorts annotations by sort (the key to sort by)
     and the order (the order in which to sort by).
 
     Returns annotations after search_after. search_after
     must be the value of the annotation's sort field.
+
+    Unless search_after is given, annotations with the same sort value are
+    ordered by id, so every annotation has a unique place in the results. The
+    values of the last annotation on a page can then be passed back as a
+    `cursor` (see `Sorter.next_cursor()`) to get the next page. Unlike `offset`,
+    this costs the same however deep into the results the page is.
     """
 
     def __call__(self, search, params):
         sort_by = params.pop("sort", "updated")
+        order = params.pop("order", "desc")
         # Sorting must be done on non-analyzed fields.
         if sort_by == "user":
             sort_by = "user_raw"
 
+        cursor = params.pop("cursor", None)
+        if cursor:
+            try:
+                sort, search_after = self.decode_cursor(cursor)
+            except ValueError:
+                pass
+            else:
+                # The cursor already says where the page starts.
+                params.pop("offset", None)
+                params.pop("search_after", None)
+                return search.extra(search_after=search_after).sort(
+                    *[self._sort_key(*field_order) for field_order in sort]
+                )
+
         # Since search_after depends on the field that the annotations are
         # being sorted by, it is set here rather than in a separate class.
         search_after = params.pop("search_after", None)
@@ -105,23 +130,101 @@ class Sorter:
                 search_after = self._parse_date(search_after)
 
         if search_after:
-            search = search.extra(search_after=[search_after])
-
-        return search.sort(
-            {
-                sort_by: {
-                    "order": params.pop("order", "desc"),
-                    # `unmapped_type` causes unknown fields specified as arguments to
-                    # `sort` behave as if all documents contained empty values of the
-                    # given type. Without this, specifying eg. `sort=foobar` throws
-                    # an exception.
-                    #
-                    # We use the field type `boolean` to assist with migration because
-                    # that exists in both ES 1 and ES 6.
-                    "unmapped_type": "boolean",
-                }
-            }
+            return search.extra(search_after=[search_after]).sort(
+                self._sort_key(sort_by, order)
+            )
+
+        sort = [self._sort_key(sort_by, order)]
+        if sort_by != "id":
+            sort.append(self._sort_key("id", order))
+
+        return search.sort(*sort)
+
+    @classmethod
+    def next_cursor(cls, search, response):
+        """
+        Get a cursor for the page after `response`, if there could be one.
+
+        :param search: the search which got `response`
+        :type search: elasticsearch_dsl.Search
+        :param response: the response to the search
+        :rtype: str or None
+        """
+        body = search.to_dict()
+        sort = [
+            (field, options["order"])
+            for key in body.get("sort", [])
+            for field, options in key.items()
+        ]
+        hits = response["hits"]["hits"]
+
+        # Without a unique final sort field the next page could skip or repeat
+        # annotations, and a page which isn't full is the last one.
+        if (
+            not hits
+            or len(hits) < body.get("size", 10)
+            or not sort
+            or sort[-1][0] != "id"
+        ):
+            return None
+
+        return cls.encode_cursor(sort, list(hits[-1]["sort"]))
+
+    @staticmethod
+    def encode_cursor(sort, search_after):
+        """Encode the sort and the sort values of an annotation as a cursor."""
+        payload = json.dumps(
+            {"sort": sort, "after": search_after}, separators=(",", ":")
         )
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        Decode a cursor from `encode_cursor()`.
+
+        :returns: a list of (field, order) pairs, and the sort values to
+            search after
+        :raise ValueError: if `cursor` isn't a valid cursor
+        """
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            sort = [(field, order) for field, order in payload["sort"]]
+            search_after = payload["after"]
+        except (KeyError, TypeError, ValueError) as err:
+            raise ValueError("Invalid cursor") from err
+
+        if (
+            not sort
+            or sort[-1][0] != "id"
+            or not isinstance(search_after, list)
+            or len(search_after) != len(sort)
+            or any(field not in SORT_FIELDS for field, _ in sort)
+            or any(order not in ("asc", "desc") for _, order in sort)
+            or any(
+                not isinstance(value, (str, int, float, type(None)))
+                for value in search_after
+            )
+        ):
+            raise ValueError("Invalid cursor")
+
+        return sort, search_after
+
+    @staticmethod
+    def _sort_key(field, order):
+        return {
+            field: {
+                "order": order,
+                # `unmapped_type` causes unknown fields specified as arguments to
+                # `sort` behave as if all documents contained empty values of the
+                # given type. Without this, specifying eg. `sort=foobar` throws
+                # an exception.
+                #
+                # We use the field type `boolean` to assist with migration because
+                # that exists in both ES 1 and ES 6.
+                "unmapped_type": "boolean",
+            }
+        }
 
     @staticmethod
     def _parse_date(str_value):
@@ -268,11 +371,15 @@ class UriCombinedWildcardFilter:
             uris = [u for u in uris if "*" not in u and "_" not in u]
 
         # Only add valid uri's to the search list.
+        wildcard_uris = [u for u in wildcard_uris if wildcard_uri_is_valid(u)]
+
+        # Look up the equivalents of all the URIs at once
+        expanded = storage.expand_uris(self.request.db, uris + wildcard_uris)
+
         wildcard_uris = self._normalize_uris(
-            [u for u in wildcard_uris if wildcard_uri_is_valid(u)],
-            normalize_method=self._wildcard_uri_normalized,
+            wildcard_uris, expanded, normalize_method=self._wildcard_uri_normalized
         )
-        uris = self._normalize_uris(uris)
+        uris = self._normalize_uris(uris, expanded)
 
         queries = []
         if wildcard_uris:
@@ -281,12 +388,11 @@ class UriCombinedWildcardFilter:
             queries.append(Q("terms", **{"target.scope": uris}))
         return search.query("bool", should=queries)
 
-    def _normalize_uris(self, query_uris, normalize_method=uri.normalize):
+    @staticmethod
+    def _normalize_uris(query_uris, expanded, normalize_method=uri.normalize):
         uris = set()
         for query_uri in query_uris:
-            expanded = storage.expand_uri(self.request.db, query_uri)
-
-            uris.update([normalize_method(uri) for uri in expanded])
+            uris.update([normalize_method(uri) for uri in expanded[query_uri]])
         return list(uris)
 
     @staticmethod
@@ -360,6 +466,21 @@ class HiddenFilter:
         return search.filter(Q("bool", should=should_clauses))
 
 
+class SharedAnnotationsFilter:
+    """
+    Match only the annotations everyone who can read their group sees.
+
+    Unlike `AuthFilter` and `HiddenFilter` this makes no exceptions for the
+    current user's own annotations, so the results are the same for everyone
+    who can read the same groups.
+    """
+
+    def __call__(self, search, _):
+        return search.filter("term", shared=True).filter(
+            Q("bool", must_not=[Q("term", nipsa=True), Q("term", hidden=True)])
+        )
+
+
 class AnyMatcher:
     """Match the contents of a selection of fields against the `any` parameter."""
 
@@ -394,9 +515,9 @@ class RepliesMatcher:
         self.annotation_ids = ids
 
     def __call__(self, search, _):
-        return search.query(
-            Q("bool", must=[Q("terms", references=self.annotation_ids)])
-        )
+        # Replies are sorted by date, not by relevance, so this is a filter.
+        # Elasticsearch doesn't score the matches, and can cache them.
+        return search.filter("terms", references=self.annotation_ids)
 
 
 class TagsAggregation:
@@ -1,27 +1,9 @@
 """Data classes used to represent authenticated users."""
 
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import FrozenSet, Optional
 
-from h.models import AuthClient, Group, User
-
-
-@dataclass
-class LongLivedGroup:
-    """
-    A Group object which isn't connected to SQLAlchemy.
-
-    This is used in a `LongLivedUser` for `Identity.from_models()`
-    """
-
-    id: int
-    pubid: str
-
-    @classmethod
-    def from_model(cls, group: Group):
-        """Create a long lived model from a DB model object."""
-
-        return LongLivedGroup(id=group.id, pubid=group.pubid)
+from h.models import AuthClient, User
 
 
 @dataclass
@@ -32,10 +14,15 @@ class LongLivedUser:
     This is used in `Identity.from_models()`
     """
 
+    # Websocket connections keep one of these for as long as they are open,
+    # so we keep them small. Of the user's groups we only need to know which
+    # ones they are a member of.
+    __slots__ = ("id", "userid", "authority", "group_ids", "staff", "admin")
+
     id: int
     userid: str
     authority: str
-    groups: List[LongLivedGroup]
+    group_ids: FrozenSet[int]
     staff: bool
     admin: bool
 
@@ -49,7 +36,7 @@ class LongLivedUser:
             authority=user.authority,
             admin=user.admin,
             staff=user.staff,
-            groups=[LongLivedGroup.from_model(group) for group in user.groups],
+            group_ids=frozenset(group.id for group in user.groups),
         )
 
 
@@ -61,6 +48,8 @@ class LongLivedAuthClient:
     This is used in `Identity.from_models()`
     """
 
+    __slots__ = ("id", "authority")
+
     id: str
     authority: str
 
@@ -147,11 +147,7 @@ def group_created_by_user(identity, context):
 
 @requires(authenticated_user, group_found)
 def group_has_user_as_member(identity, context):
-    # With detached groups like we have with the websocket, this doesn't work
-    # as SQLAlchemy does not consider them equal:
-    # return context.group in identity.user.groups
-
-    return any(user_group.id == context.group.id for user_group in identity.user.groups)
+    return context.group.id in identity.user.group_ids
 
 
 @requires(authenticated_user, group_found)
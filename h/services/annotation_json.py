@@ -9,8 +9,18 @@ from h.security import Identity, identity_permits
 from h.security.permissions import Permission
 from h.session import user_info
 from h.traversal import AnnotationContext
+from h.util.cache import LRUCache
 from h.util.datetime import utc_iso8601
 
+# `AnnotationJSONService.present()` gives the same answer to every user, so
+# searches can share it and only add each user's flags and moderation on top.
+# Entries are keyed by annotation id and hold the annotation's `updated` time
+# with its JSON. They are ignored once `updated` changes, and dropped on
+# annotation events in this process. Other changes which show up in the JSON,
+# like the author's display name or the document's title, can take up to the
+# TTL to appear.
+presented_annotations = LRUCache(maxsize=10000, ttl=60)
+
 
 class AnnotationJSONService:
     """A service for generating API compatible JSON for annotations."""
@@ -86,18 +96,23 @@ class AnnotationJSONService:
         :return: A dict suitable for JSON serialisation
         """
 
+        return self._present_for_user(
+            annotation,
+            user,
+            user_is_moderator=self._is_moderator(
+                Identity.from_models(user=user), annotation
+            ),
+        )
+
+    def _present_for_user(self, annotation, user, user_is_moderator, model=None):
         # Get the basic version which isn't user specific
-        model = self.present(annotation)
+        if model is None:
+            model = self.present(annotation)
 
         # The flagged value depends on whether this particular user has flagged
         model["flagged"] = self._flag_service.flagged(user=user, annotation=annotation)
 
         # Only moderators see the full flag count
-        user_is_moderator = identity_permits(
-            identity=Identity.from_models(user=user),
-            context=AnnotationContext(annotation),
-            permission=Permission.Annotation.MODERATE,
-        )
         if user_is_moderator:
             model["moderation"] = {
                 "flagCount": self._flag_service.flag_count(annotation)
@@ -129,20 +144,68 @@ class AnnotationJSONService:
         :return: A list of dicts suitable for JSON serialisation.
         """
 
-        # This primes the cache for `flagged()` and `flag_count()`
-        self._flag_service.all_flagged(user, annotation_ids)
-        self._flag_service.flag_counts(annotation_ids)
-
         annotations = storage.fetch_ordered_annotations(
             self._session,
             annotation_ids,
             query_processor=self._eager_load_related_items,
         )
 
+        # The user is the same for every annotation, so only work out their
+        # identity once
+        identity = Identity.from_models(user=user)
+        moderated_ids = {
+            annotation.id
+            for annotation in annotations
+            if self._is_moderator(identity, annotation)
+        }
+
+        # This primes the cache for `flagged()` and `flag_count()`. Only
+        # moderators see flag counts, so most users don't need them at all.
+        self._flag_service.all_flagged(user, annotation_ids)
+        if moderated_ids:
+            self._flag_service.flag_counts(
+                [id_ for id_ in annotation_ids if id_ in moderated_ids]
+            )
+
+        # The parts which are the same for everyone are shared between users
+        models = {}
+        for annotation in annotations:
+            updated, model = presented_annotations.get(annotation.id, (None, None))
+            if model is not None and updated == annotation.updated:
+                # Users only ever get top level keys changed, so a shallow
+                # copy keeps the cached version intact
+                models[annotation.id] = dict(model)
+
         # Optimise the user service `fetch()` call
-        self._user_service.fetch_all([annotation.userid for annotation in annotations])
+        missing = [
+            annotation for annotation in annotations if annotation.id not in models
+        ]
+        if missing:
+            self._user_service.fetch_all([annotation.userid for annotation in missing])
+
+        for annotation in missing:
+            models[annotation.id] = self.present(annotation)
+            presented_annotations.set(
+                annotation.id, (annotation.updated, dict(models[annotation.id]))
+            )
+
+        return [
+            self._present_for_user(
+                annotation,
+                user,
+                user_is_moderator=annotation.id in moderated_ids,
+                model=models[annotation.id],
+            )
+            for annotation in annotations
+        ]
 
-        return [self.present_for_user(annotation, user) for annotation in annotations]
+    @staticmethod
+    def _is_moderator(identity, annotation):
+        return identity_permits(
+            identity=identity,
+            context=AnnotationContext(annotation),
+            permission=Permission.Annotation.MODERATE,
+        )
 
     @staticmethod
     def _eager_load_related_items(query):
@@ -1,4 +1,5 @@
 from h.models import Annotation
+from h.services.group import world_readable_groups
 
 
 class DeletePublicGroupError(Exception):
@@ -19,6 +20,7 @@ class DeleteGroupService:
 
         self._delete_annotations(group)
         self.request.db.delete(group)
+        world_readable_groups.invalidate_after_commit(self.request.db)
 
     def _delete_annotations(self, group):
         if group.pubid == "__world__":
@@ -79,7 +79,7 @@ class FlagService:
         for annotation_id in annotation_ids:
             self._flagged_cache[(user.id, annotation_id)] = annotation_id in flagged_ids
 
-        return {f.annotation_id for f in query}
+        return flagged_ids
 
     def flag_count(self, annotation: Annotation):
         """
@@ -1,10 +1,104 @@
+from threading import Lock
+from time import monotonic
+
 import sqlalchemy as sa
 
+from h.db import Session
 from h.models import Group, User
 from h.models.group import ReadableBy
 from h.util import group as group_util
 
 
+class WorldReadableGroupCache:
+    """
+    A process wide cache of the pubids of world readable groups.
+
+    Every search works out which groups the user can read, and for logged out
+    users the answer is the same list of world readable groups every time.
+    This keeps that list for `ttl` seconds so most searches don't need to ask
+    the DB for it.
+
+    Entries are only invalidated in the process which changed the group, so
+    other processes can see a stale list for up to `ttl` seconds.
+    """
+
+    def __init__(self, ttl):
+        """
+        Create a new cache.
+
+        :param ttl: Seconds after which the cached list expires
+        """
+        self.ttl = ttl
+        self.generation = 0
+        self._pubids = None
+        self._expires_at = 0
+        self._lock = Lock()
+
+    def get(self, session):
+        """
+        Get the pubids of all world readable groups.
+
+        :param session: the SQLAlchemy session to query with on a cache miss
+        :rtype: frozenset
+        """
+        pubids, expires_at = self._pubids, self._expires_at
+
+        if pubids is not None and monotonic() < expires_at:
+            return pubids
+
+        generation = self.generation
+        pubids = frozenset(
+            record.pubid
+            for record in session.query(Group.pubid).filter(
+                Group.readable_by == ReadableBy.world
+            )
+        )
+
+        with self._lock:
+            # Don't store a list which was read before an invalidation
+            if generation == self.generation:
+                self._pubids = pubids
+                self._expires_at = monotonic() + self.ttl
+
+        return pubids
+
+    def invalidate(self):
+        """Forget the cached list, after groups have been added or changed."""
+        with self._lock:
+            self.generation += 1
+            self._pubids = None
+
+    def invalidate_after_commit(self, session):
+        """
+        Forget the cached list once the session's transaction is committed.
+
+        Until then other requests still read the old list from the DB, and
+        would cache it again if it was forgotten straight away. If the
+        transaction is rolled back the cache is left alone.
+        """
+        session.info.setdefault(_INVALIDATE_AFTER_COMMIT, set()).add(self)
+
+
+world_readable_groups = WorldReadableGroupCache(ttl=60)
+
+# The key in `Session.info` of the caches to invalidate after the commit
+_INVALIDATE_AFTER_COMMIT = "h.services.group.invalidate_after_commit"
+
+
+@sa.event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for cache in session.info.get(_INVALIDATE_AFTER_COMMIT, ()):
+        cache.invalidate()
+
+
+@sa.event.listens_for(Session, "after_transaction_end")
+def _forget_invalidations(session, transaction):
+    # Whether it was committed or rolled back, the outermost transaction is
+    # over so there's nothing left to invalidate
+    if transaction.parent is None:
+        session.info.pop(_INVALIDATE_AFTER_COMMIT, None)
+
+
 class GroupService:
     def __init__(self, session, user_fetcher):
         """
@@ -17,6 +111,9 @@ class GroupService:
         self.session = session
         self.user_fetcher = user_fetcher
 
+        # Answers from `groupids_readable_by()` for the rest of this request
+        self._readable_by_cache = {}
+
     def fetch(self, pubid_or_groupid):
         """
         Fetch a group using either a groupid or a pubid.
@@ -83,26 +180,40 @@ class GroupService:
         world-readable groups.
 
         If `group_ids` is specified, only the subset of groups from that list is
-        returned. This is more efficient if the caller wants to know which
-        groups from a specific list are readable by the user.
+        returned, in the same order.
+
+        World readable groups come from a process wide cache which can be up
+        to a minute out of date in other processes, and the answer is kept for
+        the rest of the request, as searches ask for it more than once.
 
         :type user: `h.models.user.User`
         """
-        readable = Group.readable_by == ReadableBy.world
+        key = (
+            world_readable_groups.generation,
+            user.id if user is not None else None,
+            tuple(group_ids) if group_ids else None,
+        )
+        if key not in self._readable_by_cache:
+            self._readable_by_cache[key] = self._groupids_readable_by(user, group_ids)
+
+        return list(self._readable_by_cache[key])
+
+    def _groupids_readable_by(self, user, group_ids):
+        readable = world_readable_groups.get(self.session)
 
         if user is not None:
-            readable_member = sa.and_(
-                Group.readable_by == ReadableBy.members,
-                Group.members.any(User.id == user.id),
+            readable = readable.union(
+                record.pubid
+                for record in self.session.query(Group.pubid).filter(
+                    Group.readable_by == ReadableBy.members,
+                    Group.members.any(User.id == user.id),
+                )
             )
-            readable = sa.or_(readable, readable_member)
 
         if group_ids:
-            readable = sa.and_(Group.pubid.in_(group_ids), readable)
+            return [pubid for pubid in dict.fromkeys(group_ids) if pubid in readable]
 
-        return [
-            record.pubid for record in self.session.query(Group.pubid).filter(readable)
-        ]
+        return sorted(readable)
 
     def groupids_created_by(self, user):
         """
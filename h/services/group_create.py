@@ -7,6 +7,7 @@ from h.models.group import (
     PRIVATE_GROUP_TYPE_FLAGS,
     RESTRICTED_GROUP_TYPE_FLAGS,
 )
+from h.services.group import world_readable_groups
 
 
 class GroupCreateService:
@@ -131,6 +132,7 @@ class GroupCreateService:
             **kwargs,
         )
         self.db.add(group)
+        world_readable_groups.invalidate_after_commit(self.db)
 
         if add_creator_as_member:
             group.members.append(group.creator)
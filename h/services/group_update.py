@@ -1,6 +1,7 @@
 from sqlalchemy.exc import SQLAlchemyError
 
 from h.services.exceptions import ConflictError, ValidationError
+from h.services.group import world_readable_groups
 
 
 class GroupUpdateService:
@@ -33,6 +34,7 @@ class GroupUpdateService:
 
         try:
             self.session.flush()
+            world_readable_groups.invalidate_after_commit(self.session)
 
         except SQLAlchemyError as err:
             # Handle DB integrity issues with duplicate ``authority_provided_id``
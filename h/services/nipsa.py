@@ -42,6 +42,28 @@ class NipsaService:
         user = self.session.query(User).filter_by(userid=userid).one_or_none()
         return user and user.nipsa
 
+    def flagged_userids(self, userids):
+        """
+        Return which of the given userids are flagged as "NIPSA".
+
+        This looks up all of the users in one query, unless the cache is
+        populated.
+
+        :rtype: set of unicode strings
+        """
+        userids = set(userids)
+
+        if self._flagged_userids is not None:
+            return userids & self._flagged_userids
+
+        if not userids:
+            return set()
+
+        query = self.session.query(User).filter(
+            User.nipsa.is_(True), User.userid.in_(userids)
+        )
+        return {u.userid for u in query}
+
     def flag(self, user):
         """
         Add a NIPSA flag for a user.
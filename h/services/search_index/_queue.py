@@ -28,6 +28,7 @@ class Queue:
         SYNCED_TAG_TOTAL = "Synced/{tag}/Total"
         SYNCED_TOTAL = "Synced/Total"
         COMPLETED_UP_TO_DATE = "Completed/{tag}/Up_to_date_in_Elastic"
+        COMPLETED_SYNCED = "Completed/{tag}/Synced_to_Elastic"
         COMPLETED_DELETED = "Completed/{tag}/Deleted_from_db"
         COMPLETED_FORCED = "Completed/{tag}/Forced"
         COMPLETED_TAG_TOTAL = "Completed/{tag}/Total"
@@ -138,8 +139,11 @@ class Queue:
           remove the job from the queue
 
         * If the annotation is missing from Elastic or different in Elastic
-          than in the DB then re-sync the annotation into Elastic. Leave the
-          job on the queue to be re-checked and removed the next time the
+          than in the DB then re-sync the annotation into Elastic
+
+        * Re-synced annotations are then looked up in Elastic, and if they're
+          the same as in the DB now the job is removed from the queue. If not
+          the job is left on the queue to be tried again the next time the
           method runs.
         """
         jobs = self._get_jobs_from_queue(limit)
@@ -154,12 +158,8 @@ class Queue:
             for job in jobs
             if not job.kwargs.get("force", False)
         }
-        if annotation_ids:
-            annotations_from_db = self._get_annotations_from_db(annotation_ids)
-            annotations_from_es = self._get_annotations_from_es(annotation_ids)
-        else:
-            annotations_from_db = {}
-            annotations_from_es = {}
+        annotations_from_db = self._get_annotations_from_db(annotation_ids)
+        annotations_from_es = self._get_annotations_from_es(annotation_ids)
 
         # Completed jobs that can be removed from the queue.
         job_complete = []
@@ -169,6 +169,10 @@ class Queue:
         # than in the DB.
         annotation_ids_to_sync = set()
 
+        # Jobs which can be removed from the queue once their annotation has
+        # been synced.
+        job_synced = []
+
         for job in jobs:
             annotation_id = URLSafeUUID.hex_to_url_safe(job.kwargs["annotation_id"])
             annotation_from_db = annotations_from_db.get(annotation_id)
@@ -194,6 +198,7 @@ class Queue:
                 counts[Queue.Result.COMPLETED_TOTAL].add(job.id)
             elif not annotation_from_es:
                 annotation_ids_to_sync.add(annotation_id)
+                job_synced.append(job)
                 counts[Queue.Result.SYNCED_MISSING.format(tag=job.tag)].add(
                     annotation_id
                 )
@@ -203,6 +208,7 @@ class Queue:
                 counts[Queue.Result.SYNCED_TOTAL].add(annotation_id)
             elif not self._equal(annotation_from_es, annotation_from_db):
                 annotation_ids_to_sync.add(annotation_id)
+                job_synced.append(job)
                 counts[Queue.Result.SYNCED_DIFFERENT.format(tag=job.tag)].add(
                     annotation_id
                 )
@@ -218,12 +224,33 @@ class Queue:
                 counts[Queue.Result.COMPLETED_TAG_TOTAL.format(tag=job.tag)].add(job.id)
                 counts[Queue.Result.COMPLETED_TOTAL].add(job.id)
 
-        for job in job_complete:
-            self._db.delete(job)
-
         if annotation_ids_to_sync:
             self._batch_indexer.index(list(annotation_ids_to_sync))
 
+        # Check the annotations made it into Elastic, rather than leaving
+        # their jobs for the next run to check
+        annotations_from_es = self._get_annotations_from_es(
+            {
+                URLSafeUUID.hex_to_url_safe(job.kwargs["annotation_id"])
+                for job in job_synced
+            }
+        )
+
+        for job in job_synced:
+            annotation_id = URLSafeUUID.hex_to_url_safe(job.kwargs["annotation_id"])
+            annotation_from_es = annotations_from_es.get(annotation_id)
+
+            if annotation_from_es and self._equal(
+                annotation_from_es, annotations_from_db[annotation_id]
+            ):
+                job_complete.append(job)
+                counts[Queue.Result.COMPLETED_SYNCED.format(tag=job.tag)].add(job.id)
+                counts[Queue.Result.COMPLETED_TAG_TOTAL.format(tag=job.tag)].add(job.id)
+                counts[Queue.Result.COMPLETED_TOTAL].add(job.id)
+
+        for job in job_complete:
+            self._db.delete(job)
+
         return {key: len(value) for key, value in counts.items()}
 
     def _get_jobs_from_queue(self, limit):
@@ -251,6 +278,9 @@ class Queue:
         return query
 
     def _get_annotations_from_db(self, annotation_ids):
+        if not annotation_ids:
+            return {}
+
         return {
             annotation.id: annotation
             for annotation in self._db.query(
@@ -261,21 +291,25 @@ class Queue:
         }
 
     def _get_annotations_from_es(self, annotation_ids):
-        hits = self._es.conn.search(
-            body={
-                "_source": ["updated", "user"],
-                "query": {"ids": {"values": list(annotation_ids)}},
-                "size": len(annotation_ids),
-            },
+        if not annotation_ids:
+            return {}
+
+        # Unlike a search this is real-time, so it sees annotations which
+        # were only just indexed
+        docs = self._es.conn.mget(
+            body={"ids": list(annotation_ids)},
             index=self._es.index,
-        )["hits"]["hits"]
+            doc_type=self._es.mapping_type,
+            _source=["updated", "user"],
+        )["docs"]
+        docs = [doc for doc in docs if doc.get("found")]
 
-        for hit in hits:
-            updated = hit["_source"].get("updated")
+        for doc in docs:
+            updated = doc["_source"].get("updated")
             updated = isoparse(updated).replace(tzinfo=None) if updated else None
-            hit["_source"]["updated"] = updated
+            doc["_source"]["updated"] = updated
 
-        return {hit["_id"]: hit["_source"] for hit in hits}
+        return {doc["_id"]: doc["_source"] for doc in docs}
 
     @staticmethod
     def _equal(annotation_from_es, annotation_from_db):
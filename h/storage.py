@@ -18,10 +18,12 @@ assumed to be validated.
 from datetime import datetime
 
 from pyramid import i18n
+from sqlalchemy.orm import aliased
 
 from h import models, schemas
 from h.db import types
-from h.models.document import update_document_metadata
+from h.events import DocumentURIsChangedEvent
+from h.models.document import changed_documents, update_document_metadata
 from h.security import Permission
 from h.traversal.group import GroupContext
 from h.util.group_scope import url_in_scope
@@ -137,6 +139,7 @@ def create_annotation(request, data):
         created=annotation.created,
         updated=annotation.updated,
     )
+    _notify_changed_documents(request)
 
     request.db.add(annotation)
     request.db.flush()
@@ -202,6 +205,7 @@ def update_annotation(
             document.get("document_uri_dicts", {}),
             updated=annotation.updated,
         )
+        _notify_changed_documents(request)
 
     # The search index service by default does not reindex if the existing ES
     # entry's timestamp matches the DB timestamp. If we're not changing this
@@ -251,6 +255,74 @@ def expand_uri(session, uri, normalized=False):
         ).filter(models.DocumentURI.document_id == document_id)
     )
 
+    return _expand_uri(uri, normalized_uri, type_uris, normalized)
+
+
+def expand_uris(session, uris, normalized=False):
+    """
+    Return all URIs which refer to the same underlying document as each URI.
+
+    This is equivalent to calling :py:func:`expand_uri` for each of `uris`, but
+    looks up the documents for all of them in a single query.
+
+    :param session: Database session
+    :param uris: URIs associated with the documents
+    :param normalized: Return normalized URIs instead of the raw values
+
+    :returns: a dict of each of `uris` to a list of its equivalent URIs
+    """
+    normalized_uris = {uri: normalize_uri(uri) for uri in uris}
+    if not normalized_uris:
+        return {}
+
+    source = aliased(models.DocumentURI)
+
+    rows = (
+        session.query(
+            source.uri_normalized,
+            models.DocumentURI.document_id,
+            models.DocumentURI.type,
+            models.DocumentURI.uri,
+            models.DocumentURI.uri_normalized,
+        )
+        .join(source, source.document_id == models.DocumentURI.document_id)
+        .filter(source.uri_normalized.in_(set(normalized_uris.values())))
+        # A document can have the same URI more than once (from different
+        # claimants) so make sure we only get each of its URIs once
+        .distinct(
+            source.uri_normalized,
+            models.DocumentURI.document_id,
+            models.DocumentURI.id,
+        )
+        .order_by(
+            source.uri_normalized,
+            models.DocumentURI.document_id,
+            models.DocumentURI.id,
+        )
+    )
+
+    # Like `expand_uri` we only use the URIs of one document for each URI,
+    # even if it has been claimed by more than one
+    type_uris_by_uri = {}
+    document_ids = {}
+    for source_uri, document_id, doc_type, plain_uri, uri_normalized in rows:
+        if document_ids.setdefault(source_uri, document_id) == document_id:
+            type_uris_by_uri.setdefault(source_uri, []).append(
+                (doc_type, plain_uri, uri_normalized)
+            )
+
+    return {
+        uri: _expand_uri(
+            uri,
+            normalized_uri,
+            type_uris_by_uri.get(normalized_uri, []),
+            normalized,
+        )
+        for uri, normalized_uri in normalized_uris.items()
+    }
+
+
+def _expand_uri(uri, normalized_uri, type_uris, normalized):
     if not type_uris:
         return [normalized_uri if normalized else uri]
 
@@ -267,6 +339,25 @@ def expand_uri(session, uri, normalized=False):
     return [plain_uri for _, plain_uri, _ in type_uris]
 
 
+def _notify_changed_documents(request):
+    """Let other processes know about any changes to equivalent URIs."""
+    documents = changed_documents(request.db)
+    if not documents:
+        return
+
+    request.notify_after_commit(
+        DocumentURIsChangedEvent(
+            request,
+            uris={
+                document_uri.uri_normalized
+                for document in documents
+                for document_uri in document.document_uris
+            },
+        )
+    )
+    documents.clear()
+
+
 def _validate_group_scope(group, target_uri):
     # If no scopes are present, or if the group is configured to allow
     # annotations outside of its scope, there's nothing to do here
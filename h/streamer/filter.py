@@ -1,4 +1,7 @@
-from h import storage
+import sys
+from collections.abc import Hashable
+
+from h.streamer.uri_cache import URICache
 from h.util.uri import normalize as normalize_uri
 
 FILTER_SCHEMA = {
@@ -25,59 +28,133 @@ FILTER_SCHEMA = {
 }
 
 
+class SubscriptionIndex:
+    """
+    An inverted index from filter clauses to the sockets subscribed to them.
+
+    Entries are keyed by `(field, value)` pairs as produced by
+    `SocketFilter.set_filter()` and hold sets of sockets, so finding the
+    sockets interested in an annotation is a handful of dictionary lookups
+    rather than a scan over every connected socket.
+
+    Most `/id` and `/uri` keys belong to a single socket, so the sets are
+    plain ones, which are much smaller than weak sets. Sockets must be
+    removed with `remove()` when they close.
+    """
+
+    def __init__(self):
+        self._subscriptions = {}
+
+    def add(self, socket, rows):
+        """Subscribe `socket` to each of the `(field, value)` pairs in `rows`."""
+        for row in rows:
+            self._subscriptions.setdefault(row, set()).add(socket)
+
+    def remove(self, socket, rows):
+        """Unsubscribe `socket` from each of the `(field, value)` pairs in `rows`."""
+        for row in rows:
+            sockets = self._subscriptions.get(row)
+            if sockets is None:
+                continue
+
+            sockets.discard(socket)
+            if not sockets:
+                del self._subscriptions[row]
+
+    def lookup(self, values):
+        """
+        Get the sockets subscribed to any of the given values.
+
+        :param values: Dict of field to an iterable of values for that field
+        :return: A set of sockets
+        """
+        # We copy the sockets out into a new set here, as the sets in the
+        # index can change size while the caller is iterating over the results
+        matching = set()
+        for field, field_values in values.items():
+            for value in field_values:
+                if sockets := self._subscriptions.get((field, value)):
+                    matching.update(sockets)
+
+        return matching
+
+    def clear(self):
+        self._subscriptions.clear()
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+
 class SocketFilter:
     KNOWN_FIELDS = {"/id", "/group", "/uri", "/references"}
 
+    # All filters applied with `set_filter()`, allowing us to find the sockets
+    # which are interested in an annotation without checking them all
+    index = SubscriptionIndex()
+
+    # The URIs equivalent to recently annotated URIs. Entries are invalidated
+    # when we hear that documents have changed (see `h.streamer.messages`)
+    uri_cache = URICache(maxsize=10000, ttl=300)
+
     @classmethod
-    def matching(cls, sockets, annotation, session):
+    def matching(cls, annotation, session, expanded_uris=None):
         """
         Find sockets with matching filters for the given annotation.
 
         For this to work, the sockets must have first had `set_filter()` called
         on them.
 
-        :param sockets: Iterable of sockets to check
         :param annotation: Annotation to match
         :param session: DB session
+        :param expanded_uris: Normalized URIs equivalent to the annotation's
+            target URI, if they have already been looked up
 
         :return: A generator of matching socket objects
         """
+        if expanded_uris is None:
+            # Expand the URI to ensure we match any variants of it. This should
+            # match the normalization when searching (see `h.search.query`)
+            expanded_uris = cls.uri_cache.expand_uris(session, [annotation.target_uri])[
+                annotation.target_uri
+            ]
 
         values = {
             "/id": [annotation.id],
             "/group": [annotation.groupid],
-            # Expand the URI to ensure we match any variants of it. This should
-            # match the normalization when searching (see `h.search.query`)
-            "/uri": set(
-                storage.expand_uri(session, annotation.target_uri, normalized=True)
-            ),
+            "/uri": set(expanded_uris),
             "/references": set(annotation.references),
         }
 
-        for socket in sockets:
-            # Some sockets might not yet have the filter applied (or had a non
-            # parsable filter etc.)
-            if not hasattr(socket, "filter_rows"):
-                continue
-
-            # Iterate over the filter_rows added by `set_filter()`
-            for field, value in socket.filter_rows:
-                try:  # pylint: disable=too-many-try-statements
-                    if value in values[field]:
-                        yield socket
-                        break
-                except KeyError:
-                    continue
+        yield from cls.index.lookup(values)
 
     @classmethod
     def set_filter(cls, socket, filter_):
         """
         Add filtering information to a socket for use with `matching()`.
 
+        Any filter previously set on the socket is replaced.
+
         :param socket: Socket to add filtering information too
         :param filter_: Filter JSON to process
         """
+        cls.remove_filter(socket)
+
         socket.filter_rows = tuple(cls._rows_for(filter_))
+        cls.index.add(socket, socket.filter_rows)
+
+    @classmethod
+    def remove_filter(cls, socket):
+        """
+        Remove any filtering information from a socket.
+
+        This should be called when a socket is closed so it is no longer
+        returned by `matching()`.
+
+        :param socket: Socket to remove filtering information from
+        """
+        if filter_rows := getattr(socket, "filter_rows", None):
+            cls.index.remove(socket, filter_rows)
+            socket.filter_rows = ()
 
     @classmethod
     def _rows_for(cls, filter_):
@@ -93,7 +170,17 @@ class SocketFilter:
             values = set(values) if isinstance(values, list) else [values]
 
             for value in values:
+                # Values are used as keys in the index, so we can't match
+                # against things like objects
+                if not isinstance(value, Hashable):
+                    continue
+
                 if field == "/uri":
                     value = normalize_uri(value)
 
+                # Lots of sockets subscribe to the same pages and groups, so
+                # share one copy of each value between them
+                if isinstance(value, str):
+                    value = sys.intern(value)
+
                 yield field, value
@@ -3,14 +3,16 @@ from collections import namedtuple
 from itertools import chain
 
 from gevent.queue import Full
+from sqlalchemy.orm import subqueryload
 
 from h import realtime, storage
+from h.db.types import InvalidUUID, URLSafeUUID
+from h.models import Annotation
 from h.realtime import Consumer
-from h.security import Permission, identity_permits
 from h.streamer import websocket
 from h.streamer.contexts import request_context
 from h.streamer.filter import SocketFilter
-from h.traversal import AnnotationContext
+from h.streamer.permissions import ReadRealtimeUpdates
 
 log = logging.getLogger(__name__)
 
@@ -46,22 +48,23 @@ def process_messages(settings, routing_key, work_queue, raise_error=True):
         raise RuntimeError("Realtime consumer quit unexpectedly!")
 
 
-def handle_message(message, registry, session, topic_handlers):
+def handle_messages(messages_, registry, session, topic_handlers):
     """
-    Deserialize and process a message from the reader.
-
-    For each message, `handler` is called with the deserialized message and a
-    single :py:class:`h.streamer.WebSocket` instance, and should return the
-    message to be sent to the client on that socket. The handler can return
-    `None`, to signify that no message should be sent, or a JSON-serializable
-    object. It is assumed that there is a 1:1 request-reply mapping between
-    incoming messages and messages to be sent out over the websockets.
+    Deserialize and process a batch of messages from the reader.
+
+    All of the messages must be from the same topic. The handler for the topic
+    is called once with the list of message payloads and a list of the current
+    :py:class:`h.streamer.WebSocket` instances, so that it can load what it
+    needs for the whole batch at once. It is responsible for sending any
+    replies to the sockets.
     """
+    topic = messages_[0].topic
+
     try:
-        handler = topic_handlers[message.topic]
+        handler = topic_handlers[topic]
     except KeyError as err:
         raise RuntimeError(
-            f"Don't know how to handle message from topic: {message.topic}"
+            f"Don't know how to handle message from topic: {topic}"
         ) from err
 
     # N.B. We iterate over a non-weak list of instances because there's nothing
@@ -73,7 +76,12 @@ def handle_message(message, registry, session, topic_handlers):
     # dependency of some of the authorization logic used to look up annotation
     # and group permissions.
     with request_context(registry) as request:
-        handler(message.payload, sockets, request, session)
+        handler([message.payload for message in messages_], sockets, request, session)
+
+
+def handle_user_events(messages_, sockets, request, session):
+    for message in messages_:
+        handle_user_event(message, sockets, request, session)
 
 
 def handle_user_event(message, sockets, _request, _session):
@@ -88,25 +96,105 @@ def handle_user_event(message, sockets, _request, _session):
             continue
 
         if reply is None:
-            reply = {
-                "type": "session-change",
-                "action": message["type"],
-                "model": message["session_model"],
-            }
+            reply = websocket.PreparedMessage(
+                {
+                    "type": "session-change",
+                    "action": message["type"],
+                    "model": message["session_model"],
+                }
+            )
 
-        socket.send_json(reply)
+        socket.send_prepared(reply)
 
 
-def handle_annotation_event(message, sockets, request, session):
-    id_ = message["annotation_id"]
-    annotation = storage.fetch_annotation(session, id_)
+def handle_document_events(messages_, _sockets, _request, _session):
+    # The URIs which refer to the same document have changed, so forget any
+    # equivalences we might have cached for them
+    SocketFilter.uri_cache.invalidate(
+        {uri for message in messages_ for uri in message["uris"]}
+    )
 
-    if annotation is None:
-        log.warning("received annotation event for missing annotation: %s", id_)
-        return
 
-    # Find connected clients which are interested in this annotation.
-    matching_sockets = SocketFilter.matching(sockets, annotation, session)
+def handle_annotation_events(messages_, _sockets, request, session):
+    """
+    Handle a batch of annotation events.
+
+    Rather than each event fetching its own annotation, document, user and
+    equivalent URIs, these are all loaded up front for the whole batch. A
+    problem with one event doesn't stop the others in the batch being sent.
+    """
+    annotations = {
+        annotation.id: annotation
+        for annotation in storage.fetch_ordered_annotations(
+            session,
+            _valid_annotation_ids(messages_),
+            query_processor=_eager_load_related_items,
+        )
+    }
+
+    # Prime the user service's cache with the users we will present
+    request.find_service(name="user").fetch_all(
+        {annotation.userid for annotation in annotations.values()}
+    )
+
+    expanded_uris = SocketFilter.uri_cache.expand_uris(
+        session, {annotation.target_uri for annotation in annotations.values()}
+    )
+
+    for message in messages_:
+        id_ = message["annotation_id"]
+        annotation = annotations.get(id_)
+
+        if annotation is None:
+            log.warning("received annotation event for missing annotation: %s", id_)
+            continue
+
+        try:
+            _handle_annotation_event(
+                message,
+                annotation,
+                request,
+                session,
+                expanded_uris[annotation.target_uri],
+            )
+        except Exception:  # pylint:disable=broad-except
+            log.exception("failed to handle annotation event for %s", id_)
+
+
+def _valid_annotation_ids(messages_):
+    # Leave out any ids which aren't valid, as they would fail the whole query
+    ids = []
+    for message in messages_:
+        id_ = message["annotation_id"]
+        if id_ in ids:
+            continue
+
+        try:
+            URLSafeUUID.url_safe_to_hex(id_)
+        except InvalidUUID:
+            continue
+
+        ids.append(id_)
+
+    return ids
+
+
+def _eager_load_related_items(query):
+    # Ensure that matching, checking permissions for and presenting the
+    # annotations doesn't trigger any more queries
+    return query.options(
+        subqueryload(Annotation.document),
+        subqueryload(Annotation.group),
+        subqueryload(Annotation.moderation),
+    )
+
+
+def _handle_annotation_event(message, annotation, request, session, expanded_uris):
+    # Find connected clients which are interested in this annotation. We don't
+    # check every socket here, as the filter keeps an index of them for us.
+    matching_sockets = SocketFilter.matching(
+        annotation, session, expanded_uris=expanded_uris
+    )
 
     try:
         # Check to see if the generator has any items
@@ -120,10 +208,15 @@ def handle_annotation_event(message, sockets, request, session):
         (first_socket,), matching_sockets
     )
 
-    reply = _generate_annotation_event(request, message, annotation)
+    # Serialize the reply once, rather than once for each socket
+    reply = websocket.PreparedMessage(
+        _generate_annotation_event(request, message, annotation)
+    )
 
     annotator_nipsad = request.find_service(name="nipsa").is_flagged(annotation.userid)
-    annotation_context = AnnotationContext(annotation)
+
+    # Work out who can read the annotation once, rather than for each socket
+    read_permission = ReadRealtimeUpdates(annotation)
 
     for socket in matching_sockets:
         # Don't send notifications back to the person who sent them
@@ -139,14 +232,10 @@ def handle_annotation_event(message, sockets, request, session):
             continue
 
         # Check whether client is authorized to read this annotation.
-        if not identity_permits(
-            socket.identity,
-            annotation_context,
-            Permission.Annotation.READ_REALTIME_UPDATES,
-        ):
+        if not read_permission.permits(socket.identity):
             continue
 
-        socket.send_json(reply)
+        socket.send_prepared(reply)
 
 
 def _generate_annotation_event(request, message, annotation):
@@ -5,6 +5,7 @@ import importlib_resources
 import newrelic.agent
 
 from h.streamer import db
+from h.streamer.filter import SocketFilter
 from h.streamer.websocket import WebSocket
 from h.streamer.worker import WSGIServer
 
@@ -28,7 +29,32 @@ def websocket_metrics(queue):
     yield f"{PREFIX}/Connections/Authenticated", connections_active - connections_anonymous
     yield f"{PREFIX}/Connections/Anonymous", connections_anonymous
 
+    # How far behind the slowest client is, and what we've done about it
+    send_queue_depths = [ws.send_queue_depth for ws in WebSocket.instances]
+    yield f"{PREFIX}/SendQueue/MaxDepth", max(send_queue_depths, default=0)
+    yield f"{PREFIX}/SendQueue/TotalDepth", sum(send_queue_depths)
+
+    slow_consumer_stats = WebSocket.slow_consumer_stats
+    yield f"{PREFIX}/SendQueue/Dropped", slow_consumer_stats["dropped"]
+    yield f"{PREFIX}/SendQueue/Coalesced", slow_consumer_stats["coalesced"]
+    yield f"{PREFIX}/SendQueue/Disconnected", slow_consumer_stats["disconnected"]
+    slow_consumer_stats.clear()
+
     yield f"{PREFIX}/WorkQueueSize", queue.qsize()
+    yield f"{PREFIX}/WorkQueue/MaxShardSize", queue.max_shard_size()
+    yield f"{PREFIX}/WorkQueue/Consumers", queue.shard_count
+
+    # These are all since the last time we reported, with times in ms
+    stats = queue.take_stats()
+    yield f"{PREFIX}/WorkQueue/Processed", stats.processed
+    yield f"{PREFIX}/WorkQueue/Dropped", stats.dropped
+    yield f"{PREFIX}/WorkQueue/WaitTime/Mean", stats.mean_wait * 1000
+    yield f"{PREFIX}/WorkQueue/WaitTime/Max", stats.max_wait * 1000
+
+    uri_cache_stats = SocketFilter.uri_cache.take_stats()
+    yield f"{PREFIX}/URICache/Hits", uri_cache_stats.hits
+    yield f"{PREFIX}/URICache/Misses", uri_cache_stats.misses
+    yield f"{PREFIX}/URICache/Size", uri_cache_stats.size
 
     # There really only should be one server per instance
     for server in WSGIServer.instances:
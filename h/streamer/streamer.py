@@ -7,24 +7,51 @@ from pyramid.events import ApplicationCreated, subscriber
 
 from h.streamer import db, messages, websocket
 from h.streamer.metrics import metrics_process
+from h.streamer.work_queue import WorkQueue
 
 log = logging.getLogger(__name__)
 
+
+def shard_key(message):
+    """
+    Get the key used to decide which work queue consumer handles a message.
+
+    Messages which must be handled in order share a key: everything from a
+    single client websocket, and every event for a single annotation or user.
+    """
+    if isinstance(message, websocket.Message):
+        return message.socket
+
+    if isinstance(message, messages.Message):
+        payload = message.payload
+        return payload.get("annotation_id") or payload.get("userid")
+
+    return None
+
+
 # Queue of messages to process, from both client websockets and message queues
 # to which the streamer is subscribed.
 #
 # The maxsize ensures that memory used by this queue is bounded. Producers
 # writing to the queue must consider their behaviour when the queue is full,
-# using .put(...) with a timeout or .put_nowait(...) as appropriate.
-WORK_QUEUE = gevent.queue.Queue(maxsize=4096)
+# using .put(...) with a timeout.
+WORK_QUEUE = WorkQueue(maxsize=4096, key=shard_key)
+
+# Consumers take up to this many messages from the work queue at a time,
+# waiting at most this many seconds for a batch to fill. This lets bursts of
+# realtime events load what they need from the DB together.
+WORK_QUEUE_BATCH_SIZE = 100
+WORK_QUEUE_BATCH_WAIT = 0.005
 
 # Message queues that the streamer processes messages from
 ANNOTATION_TOPIC = "annotation"
 USER_TOPIC = "user"
+DOCUMENT_TOPIC = "document"
 
 TOPIC_HANDLERS = {
-    ANNOTATION_TOPIC: messages.handle_annotation_event,
-    USER_TOPIC: messages.handle_user_event,
+    ANNOTATION_TOPIC: messages.handle_annotation_events,
+    USER_TOPIC: messages.handle_user_events,
+    DOCUMENT_TOPIC: messages.handle_document_events,
 }
 
 
@@ -44,13 +71,27 @@ def start(event):
     registry = event.app.registry
     settings = registry.settings
 
+    WORK_QUEUE.set_shard_count(settings["h.streamer.work_queue_consumers"])
+
     greenlets = [
         # Start greenlets to process messages from RabbitMQ
         gevent.spawn(messages.process_messages, settings, ANNOTATION_TOPIC, WORK_QUEUE),
         gevent.spawn(messages.process_messages, settings, USER_TOPIC, WORK_QUEUE),
-        # And one to process the queued work
-        gevent.spawn(process_work_queue, registry, WORK_QUEUE),
+        gevent.spawn(messages.process_messages, settings, DOCUMENT_TOPIC, WORK_QUEUE),
     ]
+    # And a pool of them to process the queued work, one for each shard
+    greenlets.extend(
+        gevent.spawn(
+            process_work_queue,
+            registry,
+            WORK_QUEUE.consume(
+                shard,
+                max_batch_size=WORK_QUEUE_BATCH_SIZE,
+                max_batch_wait=WORK_QUEUE_BATCH_WAIT,
+            ),
+        )
+        for shard in range(WORK_QUEUE.shard_count)
+    )
 
     if not os.environ.get("KILL_SWITCH_WEBSOCKET_METRICS"):
         greenlets.append(
@@ -64,24 +105,52 @@ def start(event):
 
 def process_work_queue(registry, queue):
     """
-    Process each message from the queue in turn, handling exceptions.
+    Process each batch of messages from the queue in turn, handling exceptions.
+
+    This is the core of the streamer: we pull batches of messages off the work
+    queue, dispatching them as appropriate. Consecutive realtime messages from
+    the same topic are handled together, and websocket messages one at a time.
+    The handling of each of these runs of messages is wrapped in code that
+    ensures the database session is appropriately committed and closed between
+    them.
 
-    This is the core of the streamer: we pull messages off the work queue,
-    dispatching them as appropriate. The handling of each message is wrapped in
-    code that ensures the database session is appropriately committed and
-    closed between messages.
+    Several of these run at once, each with their own DB session, and each
+    consuming a different shard of the work queue.
     """
 
     session = db.get_session(registry.settings)
 
-    for msg in queue:
-        with db.read_only_transaction(session):
-            if isinstance(msg, messages.Message):
-                messages.handle_message(msg, registry, session, TOPIC_HANDLERS)
-            elif isinstance(msg, websocket.Message):
-                websocket.handle_message(msg, session)
-            else:
-                raise UnknownMessageType(repr(msg))
+    for batch in queue:
+        for run in _split_into_runs(batch):
+            with db.read_only_transaction(session):
+                if isinstance(run[0], messages.Message):
+                    messages.handle_messages(run, registry, session, TOPIC_HANDLERS)
+                elif isinstance(run[0], websocket.Message):
+                    websocket.handle_message(run[0], session)
+                else:
+                    raise UnknownMessageType(repr(run[0]))
+
+
+def _split_into_runs(batch):
+    """Split a batch into runs of realtime messages with the same topic."""
+    run = []
+
+    for msg in batch:
+        if run and not (
+            isinstance(msg, messages.Message) and msg.topic == run[0].topic
+        ):
+            yield run
+            run = []
+
+        run.append(msg)
+
+        # Anything other than a realtime message is handled on its own
+        if not isinstance(msg, messages.Message):
+            yield run
+            run = []
+
+    if run:
+        yield run
 
 
 def supervise(greenlets):
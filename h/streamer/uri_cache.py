@@ -0,0 +1,97 @@
+from collections import namedtuple
+
+from h import storage
+from h.util.cache import LRUCache
+
+# Statistics about the cache since they were last taken
+URICacheStats = namedtuple("URICacheStats", ["hits", "misses", "size"])
+
+
+class URICache:
+    """
+    A bounded cache of URIs to the normalized URIs equivalent to them.
+
+    The least recently used URIs are evicted when the cache is full, and
+    entries expire after a fixed time, in case we miss being told about changes
+    with `invalidate()`.
+    """
+
+    def __init__(self, maxsize, ttl):
+        """
+        Initialize a new URICache.
+
+        :param maxsize: Maximum number of URIs to hold
+        :param ttl: Seconds after which entries expire
+        """
+        # URI -> equivalent normalized URIs
+        self._entries = LRUCache(maxsize=maxsize, ttl=ttl)
+
+        self._hits = 0
+        self._misses = 0
+
+    def expand_uris(self, session, uris):
+        """
+        Get the normalized URIs equivalent to each URI.
+
+        This is the same as `storage.expand_uris(..., normalized=True)`, but
+        only the URIs which aren't cached are looked up in the DB.
+
+        :param session: DB session
+        :param uris: URIs to expand
+        :return: A dict of each URI to a list of equivalent normalized URIs
+        """
+        expanded, missing = {}, []
+
+        for uri in uris:
+            equivalent_uris = self._entries.get(uri)
+
+            if equivalent_uris is not None:
+                expanded[uri] = equivalent_uris
+                self._hits += 1
+            else:
+                missing.append(uri)
+                self._misses += 1
+
+        if missing:
+            for uri, equivalent_uris in storage.expand_uris(
+                session, missing, normalized=True
+            ).items():
+                self._entries.set(uri, equivalent_uris)
+                expanded[uri] = equivalent_uris
+
+        return expanded
+
+    def invalidate(self, uris):
+        """
+        Remove any entries which might be affected by changes to `uris`.
+
+        :param uris: Normalized URIs whose equivalents have changed
+        """
+        uris = set(uris)
+
+        # A URI's normalized form is always one of its equivalents, so this
+        # catches entries for the URIs themselves as well
+        stale = [
+            uri
+            for uri, equivalent_uris in self._entries.items()
+            if not uris.isdisjoint(equivalent_uris)
+        ]
+        for uri in stale:
+            self._entries.invalidate(uri)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def take_stats(self):
+        """
+        Get statistics about the cache and reset the hit and miss counts.
+
+        :rtype: URICacheStats
+        """
+        stats = URICacheStats(hits=self._hits, misses=self._misses, size=len(self))
+        self._hits = self._misses = 0
+
+        return stats
@@ -7,11 +7,16 @@ from h.streamer import streamer, websocket
 
 @view_config(route_name="ws")
 def websocket_view(request):
+    settings = request.registry.settings
+
     # Provide environment which the WebSocket handler can use...
     request.environ.update(
         {
             "h.ws.streamer_work_queue": streamer.WORK_QUEUE,
             "h.ws.identity": request.identity,
+            "h.ws.send_queue_size": settings["h.streamer.send_queue_size"],
+            "h.ws.slow_consumer_policy": settings["h.streamer.slow_consumer_policy"],
+            "h.ws.coalesce_window": settings["h.streamer.coalesce_window_ms"] / 1000,
         }
     )
 
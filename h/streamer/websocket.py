@@ -2,13 +2,17 @@ import copy
 import json
 import logging
 import weakref
-from collections import namedtuple
+from collections import Counter, deque, namedtuple
+from enum import Enum
 
+import gevent
 import jsonschema
 from gevent.queue import Full
+from ws4py.messaging import TextMessage
 from ws4py.websocket import WebSocket as _WebSocket
 
 from h.streamer.filter import FILTER_SCHEMA, SocketFilter
+from h.util.cache import LRUCache
 
 log = logging.getLogger(__name__)
 
@@ -36,15 +40,56 @@ class Message(namedtuple("Message", ["socket", "payload"])):
         self.socket.send_json(data)
 
 
+class PreparedMessage(TextMessage):
+    """
+    A JSON message which is serialized and framed once.
+
+    The same instance can be sent to any number of sockets without encoding
+    the payload again for each of them.
+    """
+
+    def __init__(self, payload):
+        super().__init__(json.dumps(payload))
+        self.payload = payload
+
+        # Frames sent by the server are never masked, so they are the same
+        # for every socket
+        self._frame = super().single(mask=False)
+
+    def single(self, mask=False):
+        if mask:
+            return super().single(mask=mask)
+
+        return self._frame
+
+
+class SlowConsumerPolicy(Enum):
+    """What to do when a client's send queue is full."""
+
+    DROP_OLDEST = "drop_oldest"
+    """Drop the oldest queued message to make room for the new one."""
+
+    COALESCE = "coalesce"
+    """Send queued annotation notifications together, dropping if that's not enough."""
+
+    DISCONNECT = "disconnect"
+    """Close the connection, so the client can reconnect and catch up."""
+
+
 class WebSocket(_WebSocket):
     # All instances of WebSocket, allowing us to iterate over open websockets
     instances = weakref.WeakSet()
 
+    # Counts of what we've done with messages for clients which couldn't keep
+    # up, across all sockets, since they were last reported in the metrics
+    slow_consumer_stats = Counter()
+
     # Instance attributes
     client_id = None
     filter = None
     query = None
     identity = None
+    messages_dropped = 0
 
     def __init__(self, sock, protocols=None, extensions=None, environ=None):
         super().__init__(
@@ -59,6 +104,31 @@ class WebSocket(_WebSocket):
 
         self._work_queue = environ["h.ws.streamer_work_queue"]
 
+        # Messages for the client are sent from their own greenlet, so a
+        # slow client only holds up its own messages. The queue and greenlet
+        # only exist while there's something to send, as most connections are
+        # idle most of the time. When coalescing, runs of annotation
+        # notifications which can be sent as one are queued as lists.
+        self._send_queue = None
+        self._send_queue_size = environ.get("h.ws.send_queue_size", 256)
+        self._slow_consumer_policy = SlowConsumerPolicy(
+            environ.get("h.ws.slow_consumer_policy", "drop_oldest")
+        )
+        # Seconds to wait for more annotation notifications to combine with
+        # one we are about to send
+        self._coalesce_window = environ.get("h.ws.coalesce_window", 0)
+        # Whether queued annotation notifications are sent together
+        self._coalesce = bool(
+            self._coalesce_window
+            or self._slow_consumer_policy == SlowConsumerPolicy.COALESCE
+        )
+        self._sender = None
+        self._disconnecting = False
+
+        # We've taken what we need from the environ, so don't keep the rest
+        # of the request alive for as long as the connection is open
+        self.environ = None
+
     def __new__(cls, *_args, **_kwargs):
         instance = super(WebSocket, cls).__new__(cls)
         cls.instances.add(instance)
@@ -84,9 +154,187 @@ class WebSocket(_WebSocket):
         except KeyError:
             pass
 
+        SocketFilter.remove_filter(self)
+
+        self._disconnecting = True
+        if self._sender is not None:
+            self._sender.kill(block=False)
+
+    def unhandled_error(self, error):
+        # Reading fails once we've dropped the connection to a slow client,
+        # which isn't worth reporting
+        if not self._disconnecting:
+            super().unhandled_error(error)
+
+    @property
+    def send_queue_depth(self):
+        """Get the number of messages waiting to be sent to the client."""
+        return len(self._send_queue) if self._send_queue else 0
+
     def send_json(self, payload):
-        if not self.terminated:
-            self.send(json.dumps(payload))
+        self._enqueue(json.dumps(payload))
+
+    def send_prepared(self, message):
+        """Send a `PreparedMessage`, which can be shared between sockets."""
+        self._enqueue(message)
+
+    def _enqueue(self, message):
+        if self.terminated or self._disconnecting:
+            return
+
+        if self._send_queue is None:
+            self._send_queue = deque()
+
+        if self._coalesce and _is_annotation_notification(message):
+            if self._add_to_last_run(message):
+                return
+
+            # Start a run of notifications which can be sent together
+            message = [message]
+
+        if self._send_queue_full() and not self._make_room():
+            return
+
+        self._send_queue.append(message)
+
+        if self._sender is None:
+            self._sender = gevent.spawn(self._send_queued)
+
+    def _send_queue_full(self):
+        return len(self._send_queue) >= self._send_queue_size
+
+    def _add_to_last_run(self, message):
+        """
+        Add an annotation notification to the last queued run, if it fits.
+
+        This is called for every message we send to the client, so it only
+        appends to a list. The sender combines the run when it's reached.
+
+        :return: True if the message was added
+        """
+        last = self._send_queue[-1] if self._send_queue else None
+
+        if not isinstance(last, list) or (
+            last[0].payload["options"] != message.payload["options"]
+        ):
+            return False
+
+        last.append(message)
+        self.slow_consumer_stats["coalesced"] += 1
+        return True
+
+    def _make_room(self):
+        """
+        Apply the slow consumer policy to a full send queue.
+
+        Queued annotation notifications are already combined as they arrive
+        when coalescing, so this falls back to dropping for that policy too.
+
+        :return: True if there is now room for another message
+        """
+        if self._slow_consumer_policy == SlowConsumerPolicy.DISCONNECT:
+            self._disconnect()
+            return False
+
+        self._count_dropped(_message_count(self._send_queue.popleft()))
+        return True
+
+    def _disconnect(self):
+        """Drop the connection to a client which isn't keeping up."""
+        self._disconnecting = True
+        self._count_dropped(sum(_message_count(item) for item in self._send_queue))
+        self._send_queue = None
+        self.slow_consumer_stats["disconnected"] += 1
+
+        # The sender is most likely stuck writing to the client, so a close
+        # frame queued behind it would never go. Stop it, and drop the
+        # connection like ws4py does when a heartbeat fails. The greenlet
+        # reading from the socket then notices, and terminates the socket.
+        if self._sender is not None:
+            self._sender.kill(block=False)
+            self._sender = None
+
+        self.server_terminated = True
+        self.close_connection()
+
+    def _count_dropped(self, count):
+        self.messages_dropped += count
+        self.slow_consumer_stats["dropped"] += count
+
+    def _send_queued(self):
+        while self._send_queue and not self.terminated:
+            if self._coalesce_window and isinstance(self._send_queue[0], list):
+                # Give any more notifications a moment to arrive, so they can
+                # be sent together with these
+                gevent.sleep(self._coalesce_window)
+
+            message = self._send_queue.popleft()
+            if isinstance(message, list):
+                message = _combine(message)
+
+            try:
+                self.send(message)
+            except Exception:  # pylint:disable=broad-except
+                # The connection has gone away underneath us, and will be
+                # cleaned up as closed shortly
+                log.debug("Failed to send to websocket client", exc_info=True)
+                self._disconnecting = True
+                return
+
+        # Everything has been sent, so let go of the queue and this greenlet
+        # until there's something else to send
+        self._send_queue = None
+        self._sender = None
+
+
+# The most recently combined runs of notifications. Sockets which are sent
+# the same notifications usually queue the same runs, so they can share the
+# combined message, and its frame, rather than each encoding their own.
+# Message ids -> (run, combined message). The run is kept so that its ids
+# can't be reused while the entry exists.
+_combined = LRUCache(maxsize=1000)
+
+
+def _combine(run):
+    """
+    Combine a run of annotation notifications with the same action.
+
+    The clients accept a list of annotations in each notification, so several
+    notifications can be sent as one, without changing their order.
+    """
+    if len(run) == 1:
+        return run[0]
+
+    key = tuple(id(message) for message in run)
+    if entry := _combined.get(key):
+        return entry[1]
+
+    combined = PreparedMessage(
+        dict(
+            run[0].payload,
+            payload=[
+                annotation
+                for message in run
+                for annotation in message.payload["payload"]
+            ],
+        )
+    )
+
+    _combined.set(key, (tuple(run), combined))
+
+    return combined
+
+
+def _message_count(item):
+    """Get the number of messages in an item of a send queue."""
+    return len(item) if isinstance(item, list) else 1
+
+
+def _is_annotation_notification(message):
+    return (
+        isinstance(message, PreparedMessage)
+        and message.payload.get("type") == "annotation-notification"
+    )
 
 
 def handle_message(message, session=None):
@@ -0,0 +1,149 @@
+from collections import namedtuple
+from time import monotonic
+
+from gevent.queue import Empty, Full, Queue
+
+# Statistics about the work queue since they were last taken
+WorkQueueStats = namedtuple(
+    "WorkQueueStats", ["processed", "dropped", "mean_wait", "max_wait"]
+)
+
+
+class WorkQueue:
+    """
+    A bounded queue of work split into shards, each drained by one consumer.
+
+    Messages with the same key (as returned by the `key` function) are always
+    put on the same shard, so they are processed in the order they arrived.
+    Messages with different keys can be processed concurrently by different
+    consumers.
+
+    Producers writing to the queue must consider their behaviour when the
+    queue is full, using `put(...)` with a timeout. Messages which can't be
+    queued raise `gevent.queue.Full` and are counted as dropped.
+    """
+
+    def __init__(self, maxsize, key=id, shards=1):
+        """
+        Initialize a new WorkQueue.
+
+        :param maxsize: Maximum number of messages held across all shards
+        :param key: Function returning the key to shard a message by
+        :param shards: Number of shards (and so consumers) to split work into
+        """
+        self.maxsize = maxsize
+        self._key = key
+        self._shards = []
+        self.set_shard_count(shards)
+
+        self._processed = 0
+        self._dropped = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    @property
+    def shard_count(self):
+        return len(self._shards)
+
+    def set_shard_count(self, count):
+        """
+        Change the number of shards the work is split into.
+
+        This discards any queued messages, so it must be called before the
+        queue is put into use.
+        """
+        if count < 1:
+            raise ValueError("A work queue must have at least one shard")
+
+        self._shards = [
+            Queue(maxsize=max(1, self.maxsize // count)) for _ in range(count)
+        ]
+
+    def put(self, message, timeout=None):
+        """
+        Put a message on the shard for its key.
+
+        :raise gevent.queue.Full: If the message could not be queued within
+            `timeout` seconds
+        """
+        shard = self._shards[hash(self._key(message)) % len(self._shards)]
+
+        try:
+            shard.put((monotonic(), message), timeout=timeout)
+        except Full:
+            self._dropped += 1
+            raise
+
+    def consume(self, shard, max_batch_size=1, max_batch_wait=0.0):
+        """
+        Generate batches of messages from a shard.
+
+        This blocks until at least one message is available, and then waits up
+        to `max_batch_wait` seconds for more to fill out the batch. Any
+        messages already queued are added without waiting.
+
+        :param shard: The index of the shard to consume
+        :param max_batch_size: The maximum number of messages in each batch
+        :param max_batch_wait: Seconds to wait for further messages in a batch
+        """
+        queue = self._shards[shard]
+
+        while True:
+            batch = [self._get(queue)]
+            deadline = monotonic() + max_batch_wait
+
+            while len(batch) < max_batch_size:
+                timeout = deadline - monotonic()
+                try:
+                    batch.append(
+                        self._get(queue, timeout=timeout)
+                        if timeout > 0
+                        else self._get(queue, block=False)
+                    )
+                except Empty:
+                    break
+
+            yield batch
+
+    def _get(self, queue, block=True, timeout=None):
+        enqueued_at, message = queue.get(block=block, timeout=timeout)
+        wait = monotonic() - enqueued_at
+
+        self._processed += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+
+        return message
+
+    def qsize(self):
+        """Get the total number of messages queued across all shards."""
+        return sum(shard.qsize() for shard in self._shards)
+
+    def max_shard_size(self):
+        """Get the number of messages queued on the most backed up shard."""
+        return max(shard.qsize() for shard in self._shards)
+
+    def take_stats(self):
+        """
+        Get statistics about the queue and reset them.
+
+        Wait times are the time in seconds messages spent on the queue before
+        being picked up by a consumer.
+
+        :rtype: WorkQueueStats
+        """
+        stats = WorkQueueStats(
+            processed=self._processed,
+            dropped=self._dropped,
+            mean_wait=self._total_wait / self._processed if self._processed else 0,
+            max_wait=self._max_wait,
+        )
+        self._reset_stats()
+
+        return stats
+
+    def _reset_stats(self):
+        self._processed = 0
+        self._dropped = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
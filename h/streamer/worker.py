@@ -87,6 +87,16 @@ class WebSocketWSGIHandler(PyWSGIHandler):
             self.rfile.close()
 
             ws = self.environ.pop("ws4py.websocket", None)
+
+            # The connection can stay open for a long time, and after the
+            # handshake the environ is only used for the access log. So we
+            # let go of everything else the request attached to it.
+            self.environ = {
+                key: value
+                for key, value in self.environ.items()
+                if isinstance(value, str)
+            }
+
             if ws:
                 ws_greenlet = self.server.pool.track(ws)
                 ws_greenlet.join()
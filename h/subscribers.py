@@ -3,9 +3,10 @@ from kombu.exceptions import OperationalError
 from pyramid.events import BeforeRender, subscriber
 
 from h import __version__, emails, storage
-from h.events import AnnotationEvent
+from h.events import AnnotationEvent, DocumentURIsChangedEvent
 from h.exceptions import RealtimeMessageQueueError
 from h.notification import reply
+from h.services.annotation_json import presented_annotations
 from h.tasks import mailer
 
 
@@ -64,6 +65,22 @@ def publish_annotation_event(event):
         report_exception(err)
 
 
+@subscriber(AnnotationEvent)
+def forget_presented_annotation(event):
+    """Stop sharing this process's old JSON for a changed annotation."""
+    presented_annotations.invalidate(event.annotation_id)
+
+
+@subscriber(DocumentURIsChangedEvent)
+def publish_document_uris_changed_event(event):
+    """Publish a change to the URIs of a document to the message queue."""
+    try:
+        event.request.realtime.publish_document({"uris": sorted(event.uris)})
+
+    except RealtimeMessageQueueError as err:
+        report_exception(err)
+
+
 @subscriber(AnnotationEvent)
 def send_reply_notifications(event):
     """Queue any reply notification emails triggered by an annotation event."""
@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+
+class LRUCache:
+    """
+    A bounded, in-process cache of recently used values.
+
+    The least recently used keys are evicted when the cache is full. If a
+    `ttl` is given, entries also expire that many seconds after they were set.
+
+    It's safe to use from more than one thread at once.
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        """
+        Initialize a new LRUCache.
+
+        :param maxsize: Maximum number of keys to hold
+        :param ttl: Seconds after which entries expire, or `None` to keep
+            entries until they are evicted
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        # Key -> (expiry time or None, value)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the value for `key`, or `default` if it isn't cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return default
+
+            if self._expired(entry):
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        """Cache `value` for `key`, evicting the oldest keys if full."""
+        expires = None if self.ttl is None else monotonic() + self.ttl
+
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Remove `key` from the cache if it's there."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def items(self):
+        """Return a list of the `(key, value)` pairs which haven't expired."""
+        with self._lock:
+            return [
+                (key, entry[1])
+                for key, entry in self._entries.items()
+                if not self._expired(entry)
+            ]
+
+    def clear(self):
+        """Remove everything from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _expired(entry):
+        return entry[0] is not None and entry[0] <= monotonic()
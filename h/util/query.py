@@ -7,55 +7,92 @@ def column_windows(session, column, windowsize=2000, where=None):
     Return a series of WHERE clauses against a given column that break it into windows.
 
     :param session: the SQLAlchemy session object
-    :param column: the SQLAlchemy column object with which to generate windows
+    :param column: the SQLAlchemy column object with which to generate windows,
+        or a tuple of columns
     :param windowsize: how many rows to include in each window
     :param where: an optional SQLAlchemy expression to filter the base query
 
     Returns an iterable of SQLAlchemy expressions which can be used in a
-    .filter(...) clause.
+    .filter(...) clause. Each window is worked out as it's needed.
     """
+    for start, end in column_window_bounds(session, column, windowsize, where):
+        yield window_clause(column, start, end)
 
-    # This function is adapted from a recipe supplied by the SQLAlchemy
-    # maintainers:
-    #
-    #   https://bitbucket.org/zzzeek/sqlalchemy/wiki/UsageRecipes/WindowedRangeQuery
-    #
-    # In overview: we generate a list of all the possible values of `column`
-    # on the server, and then turn that list into a subquery with
-    # Query#from_self(). We then use the row number of the inner query to
-    # select every `windowsize`'th row. The resulting values are then
-    # translated into an iterable of SQLAlchemy expressions suitable for use
-    # in Query#filter(...).
 
-    def interval_for_range(start_id, end_id):
-        if end_id:
-            return sa.and_(column >= start_id, column < end_id)
+def column_window_bounds(session, column, windowsize=2000, where=None):
+    """
+    Generate the bounds of a series of windows which break a column up.
+
+    This is the same as `column_windows()` but returns the values of
+    `column` the windows start and end at instead, so they can be sent
+    elsewhere (e.g. to another process) before being turned into WHERE
+    clauses with `window_clause()`.
+
+    The windows are found by paging through `column` in order, so they are
+    worked out one at a time as they're needed, and with an index on
+    `column` each one only reads `windowsize` rows of it. Rows with the same
+    value of `column` always end up in the same window, so to get windows of
+    exactly `windowsize` rows pass a tuple of columns which is unique, like
+    `(Annotation.updated, Annotation.id)`. The comparisons are on the whole
+    tuple, so for a tuple of columns the index needs all of them, in the
+    same order.
 
-        return column >= start_id
+    :param session: the SQLAlchemy session object
+    :param column: the SQLAlchemy column object with which to generate windows,
+        or a tuple of columns
+    :param windowsize: how many rows to include in each window
+    :param where: an optional SQLAlchemy expression to filter the base query
 
-    query = session.query(
-        column, sa.func.row_number().over(order_by=column).label("rownum")
-    )
+    Returns an iterator of `(start, end)` tuples, where `start` and `end` are
+    values of `column` (tuples of values for a tuple of columns). Each window
+    includes `start` and excludes `end`. The `end` of the last window is
+    `None`.
+    """
+    columns = column if isinstance(column, tuple) else (column,)
+    key = _key(column)
 
+    query = session.query(*columns).order_by(*columns)
     if where is not None:
         query = query.filter(where)
 
-    query = query.from_self(column)
-
-    # Select every "windowsize'th" row from the inner query.
-    if windowsize > 1:
-        query = query.filter(
-            sa.text(
-                "rownum %% %d=1" % windowsize  # pylint:disable=consider-using-f-string
-            )
-        )
-
-    intervals = [id for id, in query]
-
-    while intervals:
-        start = intervals.pop(0)
-        if intervals:
-            end = intervals[0]
-        else:
-            end = None
-        yield interval_for_range(start, end)
+    def value(row):
+        return tuple(row) if isinstance(column, tuple) else row[0]
+
+    row = query.first()
+    while row is not None:
+        start = value(row)
+
+        # The row `windowsize` rows on starts the next window
+        row = query.filter(key >= start).offset(windowsize).first()
+        if row is not None and value(row) == start:
+            # More than `windowsize` rows have the same value, which can only
+            # be split between windows by another column. Put them all in
+            # this window instead.
+            row = query.filter(key > start).first()
+
+        yield start, value(row) if row is not None else None
+
+
+def window_clause(column, start, end):
+    """
+    Return a WHERE clause selecting one window of a column.
+
+    :param column: the SQLAlchemy column object the window is on, or a
+        tuple of columns
+    :param start: the value the window starts at (inclusive)
+    :param end: the value the window ends at (exclusive), or `None` for no end
+    """
+    key = _key(column)
+
+    if end is not None:
+        return sa.and_(key >= start, key < end)
+
+    return key >= start
+
+
+def _key(column):
+    """Return the expression to order and compare rows of a window by."""
+    if isinstance(column, tuple):
+        return sa.tuple_(*column)
+
+    return column
@@ -62,6 +62,9 @@ def search(request):
             annotation_ids=result.reply_ids, user=request.user
         )
 
+    if result.cursor:
+        out["next"] = result.cursor
+
     return out
 
 
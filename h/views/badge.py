@@ -4,6 +4,7 @@ from pyramid import httpexceptions
 from webob.multidict import MultiDict
 
 from h import search
+from h.util.cache import LRUCache
 from h.util.uri import normalize
 from h.util.view import json_view
 
@@ -70,6 +71,42 @@ class Blocklist:
         return cls._PATTERN.match(url)
 
 
+# How long the badge's count for a page may be out of date, in seconds
+COUNT_MAX_AGE = 30
+
+# Everyone who isn't logged in sees the same count for a page, so we share it
+# between their requests. Keyed by normalized URI.
+public_counts = LRUCache(maxsize=10000, ttl=COUNT_MAX_AGE)
+
+
+def _count(request, uri):
+    """Return the number of annotations on `uri` the user can see."""
+    # Logged out users all see the same count, so we share it between them
+    if request.authenticated_userid is None:
+        key = normalize(uri)
+        count = public_counts.get(key)
+        if count is None:
+            count = _search_count(request, uri)
+            public_counts.set(key, count)
+
+        return count
+
+    return _search_count(request, uri)
+
+
+def _search_count(request, uri):
+    if not _has_uri_ever_been_annotated(request.db, uri):
+        # Do a cheap check to see if this URI has ever been annotated. If not,
+        # and most haven't, then we can skip the costs of a search request. In
+        # addition to the Elasticsearch query, the search request involves
+        # several DB queries to expand URIs and enumerate group IDs readable
+        # by the current user.
+        return 0
+
+    query = MultiDict({"uri": uri, "limit": 0})
+    return search.Search(request).run(query).total
+
+
 @json_view(route_name="badge")
 def badge(request):
     """
@@ -103,17 +140,15 @@ def badge(request):
         # much we can do about this, but browsers will still individually
         # respect the caching headers.
 
-    elif not _has_uri_ever_been_annotated(request.db, uri):
-        # Do a cheap check to see if this URI has ever been annotated. If not,
-        # and most haven't, then we can skip the costs of a blocklist lookup or
-        # search request. In addition to the Elasticsearch query, the search request
-        # involves several DB queries to expand URIs and enumerate group IDs
-        # readable by the current user.
-        count = 0
-
     else:
-        query = MultiDict({"uri": uri, "limit": 0})
-        result = search.Search(request).run(query)
-        count = result.total
+        # The badge is only a hint, so it's fine for it to be a little out of
+        # date. The count includes the user's own private and group
+        # annotations, so only their browser may reuse it.
+        cache_control = request.response.cache_control
+        cache_control.prevent_auto = True
+        cache_control.private = True
+        cache_control.max_age = COUNT_MAX_AGE
+
+        count = _count(request, uri)
 
     return {"total": count}
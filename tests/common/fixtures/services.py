@@ -170,6 +170,7 @@ def moderation_service(mock_service):
 def nipsa_service(mock_service):
     nipsa_service = mock_service(NipsaService, name="nipsa")
     nipsa_service.is_flagged.return_value = False
+    nipsa_service.flagged_userids.return_value = set()
 
     return nipsa_service
 
@@ -5,7 +5,9 @@ import pytest
 from webtest import TestApp
 
 from h import db
+from h.activity.query import aggregation_cache
 from h.app import create_app
+from h.services.group import world_readable_groups
 from tests.common import factories as factories_common
 from tests.common.fixtures.elasticsearch import (  # pylint: disable=unused-import
     ELASTICSEARCH_INDEX,
@@ -50,6 +52,8 @@ def reset_app(app):
     yield
 
     app.reset()
+    world_readable_groups.invalidate()
+    aggregation_cache.clear()
 
 
 @pytest.fixture
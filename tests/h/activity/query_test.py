@@ -5,7 +5,18 @@ from h_matchers import Any
 from pyramid.httpexceptions import HTTPFound
 from webob.multidict import MultiDict
 
-from h.activity.query import check_url, execute, extract, fetch_annotations
+from h.activity.query import (
+    AGGREGATIONS_MAX_AGE,
+    _aggregations_key,
+    _refresh_aggregations,
+    _refreshing,
+    aggregation_cache,
+    check_url,
+    execute,
+    extract,
+    fetch_annotations,
+)
+from h.search.core import SearchResult
 
 
 class TestExtract:
@@ -196,6 +207,7 @@ class TestCheckURL:
     "presenters",
     "AuthorityFilter",
     "Search",
+    "SharedAnnotationsFilter",
     "TagsAggregation",
     "TopLevelAnnotationsFilter",
     "UsersAggregation",
@@ -207,16 +219,14 @@ class TestExecute:
     def test_it_creates_a_search_query(self, pyramid_request, Search):
         execute(pyramid_request, MultiDict(), self.PAGE_SIZE)
 
-        Search.assert_called_once_with(
-            pyramid_request, separate_wildcard_uri_keys=False
-        )
+        Search.assert_called_with(pyramid_request, separate_wildcard_uri_keys=False)
 
     def test_it_only_returns_top_level_annotations(
         self, pyramid_request, search, TopLevelAnnotationsFilter
     ):
         execute(pyramid_request, MultiDict(), self.PAGE_SIZE)
 
-        TopLevelAnnotationsFilter.assert_called_once_with()
+        TopLevelAnnotationsFilter.assert_called_with()
         search.append_modifier.assert_any_call(TopLevelAnnotationsFilter.return_value)
 
     def test_it_only_shows_annotations_from_default_authority(
@@ -224,7 +234,7 @@ class TestExecute:
     ):
         execute(pyramid_request, MultiDict(), self.PAGE_SIZE)
 
-        AuthorityFilter.assert_called_once_with(pyramid_request.default_authority)
+        AuthorityFilter.assert_called_with(pyramid_request.default_authority)
         search.append_modifier.assert_any_call(AuthorityFilter.return_value)
 
     def test_it_adds_a_tags_aggregation_to_the_search_query(
@@ -341,8 +351,9 @@ class TestExecute:
     def test_it_returns_the_search_result_if_there_are_no_matches(
         self, pyramid_request, search
     ):
-        search.run.return_value.total = 0
-        search.run.return_value.annotation_ids = []
+        search.run.return_value = SearchResult(
+            total=0, annotation_ids=[], reply_ids=[], aggregations={}
+        )
 
         result = execute(pyramid_request, MultiDict(), self.PAGE_SIZE)
 
@@ -460,6 +471,122 @@ class TestExecute:
 
         assert result.aggregations == mock.sentinel.aggregations
 
+    def test_it_only_aggregates_annotations_everyone_in_the_groups_can_see(
+        self, pyramid_request, search, SharedAnnotationsFilter
+    ):
+        execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+
+        search.append_modifier.assert_any_call(SharedAnnotationsFilter.return_value)
+        search.prepare_aggregations.assert_called_once_with(MultiDict(tag="foo"))
+
+    def test_it_reuses_the_aggregations_for_the_same_search(
+        self, pyramid_request, search
+    ):
+        execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+        search.prepare_aggregations.reset_mock()
+
+        result = execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+
+        search.prepare_aggregations.assert_not_called()
+        assert result.aggregations == mock.sentinel.aggregations
+
+    def test_it_doesnt_reuse_the_aggregations_for_other_searches(
+        self, pyramid_request, search
+    ):
+        execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+        search.prepare_aggregations.reset_mock()
+
+        execute(pyramid_request, MultiDict(tag="bar"), self.PAGE_SIZE)
+
+        search.prepare_aggregations.assert_called_once()
+
+    def test_it_shares_the_aggregations_between_users_who_read_the_same_groups(
+        self, pyramid_request, factories, search
+    ):
+        execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+        search.prepare_aggregations.reset_mock()
+        pyramid_request.user = factories.User()
+
+        execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+
+        search.prepare_aggregations.assert_not_called()
+
+    def test_it_doesnt_share_the_aggregations_with_users_who_read_other_groups(
+        self, pyramid_request, group_service, search
+    ):
+        execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+        search.prepare_aggregations.reset_mock()
+        group_service.groupids_readable_by.return_value = ["__world__", "private"]
+
+        execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+
+        search.prepare_aggregations.assert_called_once()
+
+    def test_it_refreshes_old_aggregations_in_the_background(
+        self, pyramid_request, search, monotonic, threading
+    ):
+        execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+        monotonic.return_value += AGGREGATIONS_MAX_AGE
+        run = search.prepare_aggregations.return_value
+        run.reset_mock()
+        run.return_value = mock.sentinel.new_aggregations
+
+        result = execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+
+        assert result.aggregations == mock.sentinel.aggregations
+        run.assert_not_called()
+        threading.Thread.assert_called_once_with(
+            target=_refresh_aggregations, args=(Any(), run), daemon=True
+        )
+        threading.Thread.return_value.start.assert_called_once_with()
+
+        _refresh_aggregations(*threading.Thread.call_args[1]["args"])
+        result = execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+
+        assert result.aggregations == mock.sentinel.new_aggregations
+
+    def test_it_only_refreshes_the_aggregations_once_at_a_time(
+        self, pyramid_request, monotonic, threading
+    ):
+        execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+        monotonic.return_value += AGGREGATIONS_MAX_AGE
+
+        execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+        execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+
+        threading.Thread.assert_called_once()
+
+    def test_it_keeps_the_old_aggregations_if_refreshing_them_fails(
+        self, pyramid_request, search, monotonic, threading, report_exception
+    ):
+        execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+        monotonic.return_value += AGGREGATIONS_MAX_AGE
+        execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+        error = ValueError()
+        search.prepare_aggregations.return_value.side_effect = error
+
+        _refresh_aggregations(*threading.Thread.call_args[1]["args"])
+        result = execute(pyramid_request, MultiDict(tag="foo"), self.PAGE_SIZE)
+
+        report_exception.assert_called_once_with(error)
+        assert result.aggregations == mock.sentinel.aggregations
+        # A later request can try again
+        assert threading.Thread.call_count == 2
+
+    @pytest.fixture
+    def monotonic(self, patch):
+        monotonic = patch("h.activity.query.monotonic")
+        monotonic.return_value = 1000
+        return monotonic
+
+    @pytest.fixture
+    def threading(self, patch):
+        return patch("h.activity.query.threading")
+
+    @pytest.fixture
+    def report_exception(self, patch):
+        return patch("h.activity.query.report_exception")
+
     @pytest.fixture
     def fetch_annotations(self, patch):
         return patch("h.activity.query.fetch_annotations")
@@ -567,15 +694,23 @@ class TestExecute:
 
     @pytest.fixture
     def search(self, annotations):
-        search = mock.Mock(spec_set=["append_modifier", "append_aggregation", "run"])
-        search.run.return_value = mock.Mock(
-            spec_set=["total", "aggregations", "annotation_ids"]
+        search = mock.Mock(
+            spec_set=[
+                "append_modifier",
+                "append_aggregation",
+                "prepare_aggregations",
+                "run",
+            ]
+        )
+        search.run.return_value = SearchResult(
+            total=20,
+            annotation_ids=[annotation.id for annotation in annotations],
+            reply_ids=[],
+            aggregations={},
+        )
+        search.prepare_aggregations.return_value.return_value = (
+            mock.sentinel.aggregations
         )
-        search.run.return_value.total = 20
-        search.run.return_value.aggregations = mock.sentinel.aggregations
-        search.run.return_value.annotation_ids = [
-            annotation.id for annotation in annotations
-        ]
         return search
 
     @pytest.fixture
@@ -598,6 +733,15 @@ class TestExecute:
     def UsersAggregation(self, patch):
         return patch("h.activity.query.UsersAggregation")
 
+    @pytest.fixture
+    def SharedAnnotationsFilter(self, patch):
+        return patch("h.activity.query.SharedAnnotationsFilter")
+
+    @pytest.fixture(autouse=True)
+    def group_service(self, group_service):
+        group_service.groupids_readable_by.return_value = ["__world__"]
+        return group_service
+
     @pytest.fixture
     def links(self, patch):
         return patch("h.activity.query.links")
@@ -607,6 +751,16 @@ class TestExecute:
         return pyramid_request
 
 
+class TestAggregationsKey:
+    @pytest.mark.usefixtures("group_service")
+    def test_it_depends_on_the_query_not_its_order(self, pyramid_request):
+        assert _aggregations_key(
+            pyramid_request, MultiDict([("tag", "a"), ("user", "b")])
+        ) == _aggregations_key(
+            pyramid_request, MultiDict([("user", "b"), ("tag", "a")])
+        )
+
+
 class TestFetchAnnotations:
     def test_it_returns_annotations_by_ids(self, db_session, factories):
         annotations = factories.Annotation.create_batch(3)
@@ -617,6 +771,14 @@ class TestFetchAnnotations:
         assert annotations == result
 
 
+@pytest.fixture(autouse=True)
+def with_no_cached_aggregations():
+    aggregation_cache.clear()
+    yield
+    aggregation_cache.clear()
+    _refreshing.clear()
+
+
 @pytest.fixture
 def pyramid_request(pyramid_request):
     class DummyRoute:
@@ -190,6 +190,18 @@ def test_it_skips_reindexing_unaltered_annotations(req, index, factories, db_ses
     indexer.index.assert_called_once_with({annotation_2.id})
 
 
+def test_windows_are_each_handled_in_a_transaction(req, factories, db_session):
+    factories.Annotation.create_batch(3)
+    db_session.flush()
+
+    counts = []
+    for window in normalize_uris._windows(req, models.Annotation, windowsize=2):
+        counts.append(db_session.query(models.Annotation).filter(window).count())
+        assert req.tm.begin.call_count == req.tm.commit.call_count == len(counts)
+
+    assert counts == [2, 1]
+
+
 @pytest.fixture
 def req(pyramid_request):
     pyramid_request.tm = mock.MagicMock()
@@ -1,9 +1,11 @@
 import os
+from datetime import datetime
 from unittest import mock
 
 import pytest
 
 from h.cli.commands import search
+from h.indexer.reindexer import Checkpoint
 
 
 class TestReindexCommand:
@@ -17,13 +19,73 @@ class TestReindexCommand:
 
         assert not result.exit_code
         reindex.assert_called_once_with(
-            pyramid_request.db, pyramid_request.es, pyramid_request
+            pyramid_request.db,
+            pyramid_request.es,
+            pyramid_request,
+            workers=1,
+            bootstrap=cliconfig["bootstrap"],
+            resume=False,
         )
 
+    def test_it_passes_the_number_of_workers(self, cli, cliconfig, reindex):
+        result = cli.invoke(search.reindex, ["--workers", "4"], obj=cliconfig)
+
+        assert not result.exit_code
+        _, kwargs = reindex.call_args
+        assert kwargs["workers"] == 4
+
+    def test_it_rejects_fewer_than_one_worker(self, cli, cliconfig, reindex):
+        result = cli.invoke(search.reindex, ["--workers", "0"], obj=cliconfig)
+
+        assert result.exit_code
+        reindex.assert_not_called()
+
+    def test_it_resumes(self, cli, cliconfig, reindex):
+        result = cli.invoke(search.reindex, ["--resume"], obj=cliconfig)
+
+        assert not result.exit_code
+        _, kwargs = reindex.call_args
+        assert kwargs["resume"]
+
+    def test_it_reports_the_status(self, cli, cliconfig, reindex, reindex_status):
+        reindex_status.return_value = Checkpoint(
+            index="new_index",
+            start=(datetime(2023, 1, 1), "id_1"),
+            errored=["abc123"],
+            indexed=2500,
+        )
+
+        result = cli.invoke(search.reindex, ["--status"], obj=cliconfig)
+
+        assert not result.exit_code
+        assert result.output == (
+            "reindexing into new_index: about 2500 annotations indexed, "
+            "up to those updated at 2023-01-01 00:00:00, 1 errored\n"
+        )
+        reindex.assert_not_called()
+
+    def test_it_reports_when_there_is_no_reindex(
+        self, cli, cliconfig, reindex, reindex_status
+    ):
+        reindex_status.return_value = None
+
+        result = cli.invoke(search.reindex, ["--status"], obj=cliconfig)
+
+        assert not result.exit_code
+        assert result.output == "no reindex in progress\n"
+        reindex.assert_not_called()
+
+    @pytest.fixture
+    def indexer(self, patch):
+        return patch("h.cli.commands.search.indexer")
+
+    @pytest.fixture
+    def reindex(self, indexer):
+        return indexer.reindex
+
     @pytest.fixture
-    def reindex(self, patch):
-        index = patch("h.cli.commands.search.indexer")
-        return index.reindex
+    def reindex_status(self, indexer):
+        return indexer.reindex_status
 
 
 class TestUpdateSettingsCommand:
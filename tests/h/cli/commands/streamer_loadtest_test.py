@@ -0,0 +1,163 @@
+import os
+from unittest import mock
+
+import click
+import gevent
+import pytest
+
+from h.cli.commands import streamer_loadtest
+
+
+class TestStreamerLoadtest:
+    def test_it_runs_the_load_test_against_an_in_process_streamer(
+        self, cli, cliconfig, pyramid_request, create_app, WSGIServer, _run
+    ):
+        result = cli.invoke(
+            streamer_loadtest.streamer_loadtest,
+            ["--connections", "3", "--events", "2"],
+            obj=cliconfig,
+        )
+
+        assert not result.exit_code, result.output
+        create_app.assert_called_once_with(None, **pyramid_request.registry.settings)
+        WSGIServer.assert_called_once_with(
+            ("127.0.0.1", 0),
+            create_app.return_value,
+            handler_class=streamer_loadtest.WebSocketWSGIHandler,
+            spawn=mock.ANY,
+        )
+        server = WSGIServer.return_value
+        server.start.assert_called_once_with()
+        _run.assert_called_once()
+        args = _run.call_args[0]
+        assert args[0] == f"ws://127.0.0.1:{server.server_port}/ws"
+        assert args[3] == 3
+        assert len(args[6]) == 2
+        server.stop.assert_called_once_with()
+
+    @pytest.mark.parametrize("fail", (False, True))
+    def test_it_deletes_everything_it_created(
+        self, cli, cliconfig, db_session, _run, fail
+    ):
+        if fail:
+            _run.side_effect = ValueError
+        before = self._counts(db_session)
+
+        cli.invoke(
+            streamer_loadtest.streamer_loadtest, ["--events", "3"], obj=cliconfig
+        )
+
+        # The run really did create things
+        assert _run.call_args[0][6]
+        assert self._counts(db_session) == before
+
+    def test_it_requires_a_patched_standard_library(self, cli, cliconfig, monkey, _run):
+        monkey.is_module_patched.return_value = False
+
+        result = cli.invoke(streamer_loadtest.streamer_loadtest, [], obj=cliconfig)
+
+        assert result.exit_code
+        assert "python -m h" in result.output
+        _run.assert_not_called()
+
+    @staticmethod
+    def _counts(session):
+        return [
+            session.query(model).count() for model in streamer_loadtest.DELETE_ORDER
+        ]
+
+    @pytest.fixture
+    def cliconfig(self, pyramid_request):
+        pyramid_request.tm = mock.Mock()
+        return {"bootstrap": mock.Mock(return_value=pyramid_request)}
+
+    @pytest.fixture(autouse=True)
+    def monkey(self, patch):
+        monkey = patch("h.cli.commands.streamer_loadtest.monkey")
+        monkey.is_module_patched.return_value = True
+        return monkey
+
+    @pytest.fixture(autouse=True)
+    def psycogreen(self, patch):
+        return patch("h.cli.commands.streamer_loadtest.psycogreen")
+
+    @pytest.fixture(autouse=True)
+    def create_app(self, patch):
+        return patch("h.cli.commands.streamer_loadtest.create_app")
+
+    @pytest.fixture(autouse=True)
+    def WSGIServer(self, patch):
+        return patch("h.cli.commands.streamer_loadtest.WSGIServer")
+
+    @pytest.fixture(autouse=True)
+    def _run(self, patch):
+        return patch("h.cli.commands.streamer_loadtest._run")
+
+    @pytest.fixture(autouse=True)
+    def environ(self):
+        # Don't leave the metrics switched off for other tests
+        with mock.patch.dict(os.environ):
+            yield
+
+
+class TestInMemoryConsumer:
+    def test_publish_calls_the_handler_for_the_topic(self):
+        handler = mock.Mock()
+        consumer = streamer_loadtest.InMemoryConsumer(
+            mock.sentinel.connection, "annotation", handler
+        )
+        # `run()` never returns, so we only let it start
+        greenlet = gevent.spawn(consumer.run)
+        gevent.sleep(0)
+
+        streamer_loadtest.InMemoryConsumer.publish("annotation", {"some": "payload"})
+
+        handler.assert_called_once_with({"some": "payload"})
+        greenlet.kill()
+
+    @pytest.fixture(autouse=True)
+    def with_no_handlers(self):
+        streamer_loadtest.InMemoryConsumer.handlers.clear()
+
+
+class TestParseFilterMix:
+    def test_it(self):
+        assert streamer_loadtest.parse_filter_mix("uri=80, group=20") == {
+            "uri": 80,
+            "group": 20,
+        }
+
+    @pytest.mark.parametrize("value", ("user=100", "uri=lots", "uri=0,group=0", "uri"))
+    def test_it_rejects_invalid_mixes(self, value):
+        with pytest.raises(click.BadParameter):
+            streamer_loadtest.parse_filter_mix(value)
+
+
+class TestPercentile:
+    @pytest.mark.parametrize(
+        "percent,expected", ((50, 50), (99, 99), (100, 100), (0, 1))
+    )
+    def test_it(self, percent, expected):
+        values = list(range(100, 0, -1))
+
+        assert streamer_loadtest.percentile(values, percent) == expected
+
+    def test_it_returns_None_without_values(self):
+        assert streamer_loadtest.percentile([], 50) is None
+
+
+class TestMakeFilter:
+    @pytest.mark.parametrize(
+        "kind,field,value",
+        (
+            ("uri", "/uri", ["http://example.com/a"]),
+            ("group", "/group", "__world__"),
+            ("none", "/uri", ["http://example.com/quiet"]),
+        ),
+    )
+    def test_it(self, kind, field, value):
+        filter_ = streamer_loadtest.make_filter(kind, ["http://example.com/a"])
+
+        assert filter_["clauses"] == [
+            {"field": field, "operator": mock.ANY, "value": value}
+        ]
@@ -13,6 +13,7 @@ from webob.multidict import MultiDict
 
 from h import db
 from h.models import Organization
+from h.services.group import world_readable_groups
 from h.settings import database_url
 from tests.common import factories as common_factories
 from tests.common.fixtures.elasticsearch import *  # pylint:disable=wildcard-import,unused-wildcard-import
@@ -90,6 +91,12 @@ def db_engine():
     return engine
 
 
+@pytest.fixture(autouse=True)
+def with_no_cached_world_readable_groups():
+    # Each test has its own groups, so don't let one test see another's
+    world_readable_groups.invalidate()
+
+
 @pytest.fixture
 def default_organization(db_session):
     # This looks a bit odd, but as part of our DB initialization we always add
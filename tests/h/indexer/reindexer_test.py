@@ -1,8 +1,20 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from unittest import mock
 
 import pytest
+from h_matchers import Any
 
-from h.indexer.reindexer import reindex
+from h.indexer.reindexer import Checkpoint, reindex, reindex_status
+from h.services.settings import SettingsService
+
+WINDOWS = [
+    ((datetime(2023, 1, 1), "id_1"), (datetime(2023, 2, 1), "id_2")),
+    ((datetime(2023, 2, 1), "id_2"), (datetime(2023, 3, 1), "id_3")),
+    ((datetime(2023, 3, 1), "id_3"), None),
+]
 
 
 @pytest.mark.usefixtures(
@@ -23,24 +35,26 @@ class TestReindex:
         _, kwargs = BatchIndexer.call_args
         assert kwargs["op_type"] == "create"
 
-    def test_indexes_annotations(self, pyramid_request, mock_es_client, batchindexer):
-        """Should call .index() on the batch indexer instance."""
+    def test_indexes_annotations(
+        self, pyramid_request, mock_es_client, batchindexer, annotation_windows
+    ):
+        """Should call .index() on the batch indexer for each window."""
         reindex(mock.sentinel.session, mock_es_client, pyramid_request)
 
-        batchindexer.index.assert_called_once_with()
+        annotation_windows.assert_called_once_with(mock.sentinel.session, start=None)
+        assert batchindexer.index.call_args_list == [
+            mock.call(window=window) for window in WINDOWS
+        ]
 
     def test_retries_failed_annotations(
         self, pyramid_request, mock_es_client, batchindexer
     ):
         """Should call .index() a second time with any failed annotation IDs."""
-        batchindexer.index.return_value = ["abc123", "def456"]
+        batchindexer.index.side_effect = [{"abc123"}, set(), {"def456"}, set()]
 
         reindex(mock.sentinel.session, mock_es_client, pyramid_request)
 
-        assert batchindexer.index.mock_calls == [
-            mock.call(),
-            mock.call(["abc123", "def456"]),
-        ]
+        batchindexer.index.assert_called_with({"abc123", "def456"})
 
     def test_creates_new_index(self, pyramid_request, mock_es_client, configure_index):
         """Creates a new target index."""
@@ -97,26 +111,118 @@ class TestReindex:
 
         reindex(mock.sentinel.session, mock_es_client, pyramid_request)
 
-        settings_service.put.assert_called_once_with(
-            "reindex.new_index", "hypothesis-abcd1234"
-        )
+        settings_service.put.assert_any_call("reindex.new_index", "hypothesis-abcd1234")
 
-    def test_deletes_index_name_setting(
+    def test_deletes_settings_when_finished(
         self, pyramid_request, mock_es_client, settings_service
     ):
         reindex(mock.sentinel.session, mock_es_client, pyramid_request)
 
-        settings_service.delete.assert_called_once_with("reindex.new_index")
+        settings_service.delete.assert_any_call("reindex.new_index")
+        settings_service.delete.assert_any_call("reindex.checkpoint")
+        assert not settings_service.settings
 
-    def test_deletes_index_name_setting_when_exception_raised(
+    def test_checkpoints_each_window(
+        self, pyramid_request, mock_es_client, batchindexer, settings_service
+    ):
+        checkpoints = []
+
+        def index(annotation_ids=None, window=None):
+            if window is None:
+                return set()
+
+            checkpoints.append(Checkpoint.load(settings_service))
+            return {f"failed_{window[0][0].month}"}
+
+        batchindexer.index.side_effect = index
+
+        reindex(mock.sentinel.session, mock_es_client, pyramid_request)
+
+        assert [
+            (checkpoint.start, checkpoint.errored, checkpoint.indexed)
+            for checkpoint in checkpoints
+        ] == [
+            (None, set(), 0),
+            (WINDOWS[1][0], {"failed_1"}, 2500),
+            (WINDOWS[2][0], {"failed_1", "failed_2"}, 5000),
+        ]
+
+    def test_leaves_the_reindex_in_progress_if_it_fails(
         self, pyramid_request, mock_es_client, settings_service, batchindexer
     ):
-        batchindexer.index.side_effect = RuntimeError("boom!")
+        batchindexer.index.side_effect = [set(), RuntimeError("boom!")]
 
         with pytest.raises(RuntimeError):
             reindex(mock.sentinel.session, mock_es_client, pyramid_request)
 
-        settings_service.delete.assert_called_once_with("reindex.new_index")
+        assert settings_service.get("reindex.new_index") == "new_index"
+        checkpoint = Checkpoint.load(settings_service)
+        assert checkpoint.index == "new_index"
+        assert checkpoint.start == WINDOWS[1][0]
+
+    def test_resumes_from_the_checkpoint(
+        self,
+        pyramid_request,
+        mock_es_client,
+        settings_service,
+        configure_index,
+        annotation_windows,
+        BatchIndexer,
+        batchindexer,
+        update_aliased_index,
+    ):
+        Checkpoint(
+            index="new_index", start=WINDOWS[1][0], errored=["abc123"], indexed=2500
+        ).save(settings_service)
+        annotation_windows.return_value = WINDOWS[1:]
+
+        reindex(mock.sentinel.session, mock_es_client, pyramid_request, resume=True)
+
+        configure_index.assert_not_called()
+        annotation_windows.assert_called_once_with(
+            mock.sentinel.session, start=WINDOWS[1][0]
+        )
+        _, kwargs = BatchIndexer.call_args
+        assert kwargs["target_index"] == "new_index"
+        assert batchindexer.index.call_args_list == [
+            mock.call(window=WINDOWS[1]),
+            mock.call(window=WINDOWS[2]),
+            mock.call({"abc123"}),
+        ]
+        update_aliased_index.assert_called_once_with(mock_es_client, "new_index")
+
+    def test_resuming_only_tidies_up_if_the_new_index_is_current(
+        self,
+        pyramid_request,
+        mock_es_client,
+        settings_service,
+        get_aliased_index,
+        batchindexer,
+        delete_index,
+    ):
+        Checkpoint(index="new_index").save(settings_service)
+        get_aliased_index.return_value = "new_index"
+
+        reindex(mock.sentinel.session, mock_es_client, pyramid_request, resume=True)
+
+        batchindexer.index.assert_not_called()
+        delete_index.assert_not_called()
+        assert not settings_service.settings
+
+    def test_resuming_raises_if_there_is_no_reindex_in_progress(
+        self, pyramid_request, mock_es_client
+    ):
+        with pytest.raises(RuntimeError):
+            reindex(mock.sentinel.session, mock_es_client, pyramid_request, resume=True)
+
+    def test_it_starts_again_without_resume(
+        self, pyramid_request, mock_es_client, settings_service, annotation_windows
+    ):
+        Checkpoint(index="old_new_index", start=WINDOWS[1][0]).save(settings_service)
+
+        reindex(mock.sentinel.session, mock_es_client, pyramid_request)
+
+        annotation_windows.assert_called_once_with(mock.sentinel.session, start=None)
 
     def test_deletes_old_index(
         self, pyramid_request, mock_es_client, delete_index, get_aliased_index
@@ -133,13 +239,169 @@ class TestReindex:
         reindex(mock.sentinel.session, mock_es_client, pyramid_request)
         nipsa_service.fetch_all_flagged_userids.assert_called_once_with()
 
+    def test_it_indexes_windows_in_worker_processes(
+        self,
+        pyramid_request,
+        mock_es_client,
+        configure_index,
+        BatchIndexer,
+        batchindexer,
+        bootstrap,
+        ProcessPoolExecutor,
+    ):
+        configure_index.return_value = "hypothesis-abcd1234"
+
+        reindex(
+            mock.sentinel.session,
+            mock_es_client,
+            pyramid_request,
+            workers=2,
+            bootstrap=bootstrap,
+        )
+
+        ProcessPoolExecutor.assert_called_once_with(
+            max_workers=2, mp_context=Any(), initializer=Any(), initargs=(bootstrap,)
+        )
+        worker_request = bootstrap.return_value
+        worker_request.find_service.assert_called_with(name="nipsa")
+        worker_request.find_service.return_value.fetch_all_flagged_userids.assert_called_with()
+        BatchIndexer.assert_called_with(
+            worker_request.db,
+            worker_request.es,
+            worker_request,
+            target_index="hypothesis-abcd1234",
+            op_type="create",
+        )
+        assert (
+            batchindexer.index.call_args_list
+            == Any.list.containing(
+                [mock.call(window=window) for window in WINDOWS]
+            ).only()
+        )
+
+    def test_it_retries_annotations_which_failed_in_worker_processes(
+        self, pyramid_request, mock_es_client, batchindexer, bootstrap
+    ):
+        def index(annotation_ids=None, window=None):
+            # Fail in every window, but not when retrying
+            return {f"failed_{window[0][0].month}"} if window else set()
+
+        batchindexer.index.side_effect = index
+
+        reindex(
+            mock.sentinel.session,
+            mock_es_client,
+            pyramid_request,
+            workers=2,
+            bootstrap=bootstrap,
+        )
+
+        batchindexer.index.assert_called_with({"failed_1", "failed_2", "failed_3"})
+
+    def test_it_stops_if_a_worker_process_fails(
+        self,
+        pyramid_request,
+        mock_es_client,
+        batchindexer,
+        bootstrap,
+        update_aliased_index,
+    ):
+        batchindexer.index.side_effect = RuntimeError("boom!")
+
+        with pytest.raises(RuntimeError):
+            reindex(
+                mock.sentinel.session,
+                mock_es_client,
+                pyramid_request,
+                workers=2,
+                bootstrap=bootstrap,
+            )
+
+        update_aliased_index.assert_not_called()
+
+    def test_it_reads_windows_as_they_are_needed(
+        self,
+        pyramid_request,
+        mock_es_client,
+        annotation_windows,
+        batchindexer,
+        bootstrap,
+    ):
+        read = []
+        read_before_indexing = []
+
+        def windows():
+            for window in WINDOWS * 3:
+                read.append(window)
+                yield window
+
+        def index(annotation_ids=None, window=None):
+            read_before_indexing.append(len(read))
+            return set()
+
+        annotation_windows.return_value = windows()
+        batchindexer.index.side_effect = index
+
+        reindex(
+            mock.sentinel.session,
+            mock_es_client,
+            pyramid_request,
+            workers=2,
+            bootstrap=bootstrap,
+        )
+
+        # Only enough windows for the two workers are read before they start
+        assert read_before_indexing[0] <= 4
+        assert len(read) == len(read_before_indexing) == 9
+
+    def test_it_logs_the_progress(self, pyramid_request, mock_es_client, caplog):
+        with caplog.at_level(logging.INFO):
+            reindex(mock.sentinel.session, mock_es_client, pyramid_request)
+
+        assert "indexing about 7500 annotations with 1 workers" in caplog.text
+        assert "indexed 7k of 7k annotations, rate=" in caplog.text
+        assert "eta=0:00:00" in caplog.text
+
+    def test_it_estimates_the_progress_of_a_resumed_reindex(
+        self, pyramid_request, mock_es_client, settings_service, caplog
+    ):
+        Checkpoint(index="new_index", indexed=5000).save(settings_service)
+
+        with caplog.at_level(logging.INFO):
+            reindex(mock.sentinel.session, mock_es_client, pyramid_request, resume=True)
+
+        assert "indexing about 2500 annotations" in caplog.text
+
+    @pytest.fixture(autouse=True)
+    def annotation_count_estimate(self, patch):
+        return patch("h.indexer.reindexer.annotation_count_estimate", return_value=7500)
+
+    @pytest.fixture
+    def bootstrap(self):
+        return mock.Mock()
+
+    @pytest.fixture(autouse=True)
+    def annotation_windows(self, patch):
+        return patch("h.indexer.reindexer.annotation_windows", return_value=WINDOWS)
+
+    @pytest.fixture(autouse=True)
+    def ProcessPoolExecutor(self, patch):
+        # Run the workers in threads of this process, so they see our mocks
+        def executor(max_workers, mp_context, initializer, initargs):
+            assert mp_context.get_start_method() == "spawn"
+            return ThreadPoolExecutor(
+                max_workers, initializer=initializer, initargs=initargs
+            )
+
+        return patch("h.indexer.reindexer.ProcessPoolExecutor", side_effect=executor)
+
     @pytest.fixture
     def BatchIndexer(self, patch):
         return patch("h.indexer.reindexer.BatchIndexer")
 
     @pytest.fixture
     def configure_index(self, patch):
-        return patch("h.indexer.reindexer.configure_index")
+        return patch("h.indexer.reindexer.configure_index", return_value="new_index")
 
     @pytest.fixture
     def get_aliased_index(self, patch):
@@ -158,16 +420,68 @@ class TestReindex:
     @pytest.fixture
     def batchindexer(self, BatchIndexer):
         indexer = BatchIndexer.return_value
-        indexer.index.return_value = []
+        indexer.index.return_value = set()
         return indexer
 
-    @pytest.fixture
-    def settings_service(self, pyramid_config):
-        service = mock.Mock()
-        pyramid_config.register_service(service, name="settings")
-        return service
-
     @pytest.fixture
     def pyramid_request(self, pyramid_request):
         pyramid_request.tm = mock.Mock()
         return pyramid_request
+
+
+class TestReindexStatus:
+    def test_it(self, pyramid_request, settings_service):
+        Checkpoint(index="new_index", indexed=2500).save(settings_service)
+
+        checkpoint = reindex_status(pyramid_request)
+
+        assert checkpoint.index == "new_index"
+        assert checkpoint.indexed == 2500
+
+    @pytest.mark.usefixtures("settings_service")
+    def test_it_returns_None_without_a_reindex_in_progress(self, pyramid_request):
+        assert reindex_status(pyramid_request) is None
+
+
+class TestCheckpoint:
+    def test_it_round_trips_through_the_settings(self, settings_service):
+        Checkpoint(
+            index="new_index",
+            start=(datetime(2023, 1, 1, 12, 30, 1, 5), "id_1"),
+            errored=["b", "a"],
+            indexed=5000,
+        ).save(settings_service)
+
+        checkpoint = Checkpoint.load(settings_service)
+
+        assert json.loads(settings_service.get("reindex.checkpoint")) == {
+            "index": "new_index",
+            "start": ["2023-01-01T12:30:01.000005", "id_1"],
+            "errored": ["a", "b"],
+            "indexed": 5000,
+        }
+        assert checkpoint.index == "new_index"
+        assert checkpoint.start == (datetime(2023, 1, 1, 12, 30, 1, 5), "id_1")
+        assert checkpoint.errored == {"a", "b"}
+        assert checkpoint.indexed == 5000
+
+    def test_it_round_trips_without_a_start(self, settings_service):
+        Checkpoint(index="new_index").save(settings_service)
+
+        assert Checkpoint.load(settings_service).start is None
+
+    def test_load_returns_None_without_a_checkpoint(self, settings_service):
+        assert Checkpoint.load(settings_service) is None
+
+
+@pytest.fixture
+def settings_service(pyramid_config):
+    # A settings service which keeps the settings in a dict
+    service = mock.create_autospec(SettingsService, instance=True)
+    service.settings = {}
+    service.get.side_effect = service.settings.get
+    service.put.side_effect = service.settings.__setitem__
+    service.delete.side_effect = lambda key: service.settings.pop(key, None)
+
+    pyramid_config.register_service(service, name="settings")
+    return service
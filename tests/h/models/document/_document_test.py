@@ -7,8 +7,10 @@ import pytest
 import sqlalchemy as sa
 
 from h import models
+from h.db import Session
 from h.models.document._document import (
     Document,
+    changed_documents,
     merge_documents,
     update_document_metadata,
 )
@@ -226,6 +228,11 @@ class TestMergeDocuments:
 
             assert count == expected_count
 
+    def test_it_records_the_first_doc_as_changed(self, db_session, duplicate_docs):
+        merge_documents(db_session, duplicate_docs)
+
+        assert changed_documents(db_session) == {duplicate_docs[0]}
+
     def test_it_raises_retryable_error_when_flush_fails(
         self, db_session, duplicate_docs, monkeypatch
     ):
@@ -337,6 +344,60 @@ class TestUpdateDocumentMetadata:
             storage_fn=create_or_update_document_uri,
         )
 
+    def test_it_records_the_document_as_changed_if_uris_are_added(
+        self,
+        Document,
+        create_or_update_document_uri,
+        doc_uri_dicts,
+        caller,
+        db_session,
+    ):
+        document = Document.find_or_create_by_uris.return_value.first.return_value
+        document.document_uris = []
+        create_or_update_document_uri.side_effect = (
+            lambda document, **_: document.document_uris.append(sentinel.uri)
+        )
+
+        caller(session=db_session, document_uri_dicts=doc_uri_dicts)
+
+        assert changed_documents(db_session) == {document}
+
+    def test_it_doesnt_record_the_document_as_changed_if_no_uris_are_added(
+        self, Document, doc_uri_dicts, caller, db_session
+    ):
+        document = Document.find_or_create_by_uris.return_value.first.return_value
+        document.document_uris = [sentinel.uri]
+
+        caller(session=db_session, document_uri_dicts=doc_uri_dicts)
+
+        assert not changed_documents(db_session)
+
+    @pytest.mark.parametrize("end", ("commit", "rollback"))
+    def test_changed_documents_are_forgotten_when_the_transaction_ends(
+        self,
+        Document,
+        create_or_update_document_uri,
+        doc_uri_dicts,
+        caller,
+        db_engine,
+        end,
+    ):
+        # A session which really ends its transaction, unlike `db_session`
+        session = Session(bind=db_engine)
+        document = Document.find_or_create_by_uris.return_value.first.return_value
+        document.document_uris = []
+        create_or_update_document_uri.side_effect = (
+            lambda document, **_: document.document_uris.append(sentinel.uri)
+        )
+        caller(session=session, document_uri_dicts=doc_uri_dicts)
+        # The mocks don't touch the DB, but a real update would
+        session.execute("SELECT 1")
+
+        getattr(session, end)()
+
+        assert not changed_documents(session)
+        session.close()
+
     def test_it_updates_document_web_uri(self, Document, caller):
         Document.find_or_create_by_uris.return_value.count.return_value = 1
 
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from h.presenters.annotation_searchindex import AnnotationSearchIndexPresenter
+from h.services.annotation_moderation import AnnotationModerationService
+from h.services.nipsa import NipsaService
+
+
+@pytest.mark.skip("Only of use during development")
+class TestAnnotationSearchIndexPresenterSpeed:  # pragma: no cover
+    @pytest.mark.parametrize("batch", (False, True))
+    def test_speed(self, db_engine, annotations, pyramid_request, batch):
+        queries = []
+        event.listen(
+            db_engine, "before_cursor_execute", lambda *_args: queries.append(1)
+        )
+
+        start = datetime.utcnow()
+        if batch:
+            AnnotationSearchIndexPresenter.present_batch(annotations, pyramid_request)
+        else:
+            for annotation in annotations:
+                AnnotationSearchIndexPresenter(annotation, pyramid_request).asdict()
+        diff = datetime.utcnow() - start
+
+        millis = diff.seconds * 1000 + diff.microseconds / 1000
+        print(
+            f"batch={batch}: {len(queries)} queries, "
+            f"{millis / len(annotations) * 1000:.1f} μs/annotation"
+        )
+
+    @pytest.fixture
+    def annotations(self, db_session, factories):
+        users = factories.User.create_batch(10)
+        users[0].nipsa = True
+
+        annotations = []
+        for i in range(500):
+            annotation = factories.Annotation(userid=users[i % len(users)].userid)
+            factories.Annotation(references=[annotation.id])
+            annotations.append(annotation)
+        db_session.flush()
+
+        # Load everything `BatchIndexer` would eager load, so only the
+        # presenter's own queries are counted
+        for annotation in annotations:
+            _ = annotation.thread_ids, annotation.document
+
+        return annotations
+
+    @pytest.fixture(autouse=True)
+    def services(self, db_session, pyramid_config):
+        pyramid_config.register_service(
+            AnnotationModerationService(db_session), name="annotation_moderation"
+        )
+        pyramid_config.register_service(
+            NipsaService(db_session, get_search_index=None), name="nipsa"
+        )
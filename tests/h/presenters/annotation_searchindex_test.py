@@ -93,6 +93,61 @@ class TestAnnotationSearchIndexPresenter:
         else:
             assert "nipsa" not in annotation_dict
 
+    def test_present_batch(self, factories, pyramid_request):
+        annotations = factories.Annotation.build_batch(3)
+
+        results = AnnotationSearchIndexPresenter.present_batch(
+            annotations, pyramid_request
+        )
+
+        assert results == [
+            AnnotationSearchIndexPresenter(annotation, pyramid_request).asdict()
+            for annotation in annotations
+        ]
+
+    def test_present_batch_looks_up_hidden_annotations_once(
+        self, pyramid_request, moderation_service
+    ):
+        hidden, hidden_reply, visible = [
+            mock.MagicMock(userid="acct:luke@hypothes.is", thread_ids=thread_ids)
+            for thread_ids in (["reply-1"], ["reply-2"], [])
+        ]
+        moderation_service.all_hidden.return_value = {
+            hidden.id,
+            "reply-1",
+            hidden_reply.id,
+        }
+
+        results = AnnotationSearchIndexPresenter.present_batch(
+            [hidden, hidden_reply, visible], pyramid_request
+        )
+
+        moderation_service.all_hidden.assert_called_once_with(
+            [hidden.id, "reply-1", hidden_reply.id, "reply-2", visible.id]
+        )
+        assert [result["hidden"] for result in results] == [True, False, False]
+
+    def test_present_batch_looks_up_nipsa_users_once(
+        self, factories, pyramid_request, nipsa_service
+    ):
+        annotations = [
+            factories.Annotation.build(userid="acct:flagged@example.com"),
+            factories.Annotation.build(userid="acct:other@example.com"),
+        ]
+        nipsa_service.flagged_userids.return_value = {"acct:flagged@example.com"}
+
+        results = AnnotationSearchIndexPresenter.present_batch(
+            annotations, pyramid_request
+        )
+
+        nipsa_service.flagged_userids.assert_called_once()
+        assert set(nipsa_service.flagged_userids.call_args[0][0]) == {
+            "acct:flagged@example.com",
+            "acct:other@example.com",
+        }
+        assert [result.get("nipsa") for result in results] == [True, None]
+        nipsa_service.is_flagged.assert_not_called()
+
     @pytest.fixture(autouse=True)
     def DocumentSearchIndexPresenter(self, patch):
         class_ = patch(
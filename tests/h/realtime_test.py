@@ -111,6 +111,20 @@ class TestPublisher:
             retry_policy=RETRY_POLICY_VERY_QUICK,
         )
 
+    def test_publish_document(self, producer, publisher, exchange):
+        payload = {"uris": ["httpx://example.com"]}
+
+        publisher.publish_document(payload)
+
+        producer.publish.assert_called_once_with(
+            payload,
+            exchange=exchange,
+            declare=[exchange],
+            routing_key="document",
+            retry=True,
+            retry_policy=RETRY_POLICY_VERY_QUICK,
+        )
+
     @pytest.mark.parametrize("exception", (OperationalError, LimitExceeded))
     def test_it_raises_RealtimeMessageQueueError_on_errors(
         self, publisher, producer, exception
@@ -12,7 +12,7 @@ from h.schemas.annotation import (
     URLMigrationSchema,
 )
 from h.schemas.util import validate_query_params
-from h.search.query import LIMIT_DEFAULT, LIMIT_MAX, OFFSET_MAX
+from h.search.query import LIMIT_DEFAULT, LIMIT_MAX, OFFSET_MAX, Sorter
 
 
 def create_annotation_schema_validate(request, data):
@@ -686,6 +686,20 @@ class TestSearchParamsSchema:
         with pytest.raises(ValidationError):
             validate_query_params(schema, input_params)
 
+    def test_it_accepts_a_cursor(self, schema):
+        cursor = Sorter.encode_cursor([("updated", "desc"), ("id", "desc")], [1, "a"])
+        input_params = NestedMultiDict(MultiDict({"cursor": cursor}))
+
+        params = validate_query_params(schema, input_params)
+
+        assert params["cursor"] == cursor
+
+    def test_raises_if_invalid_cursor(self, schema):
+        input_params = NestedMultiDict(MultiDict({"cursor": "invalid"}))
+
+        with pytest.raises(ValidationError):
+            validate_query_params(schema, input_params)
+
     def test_raises_if_invalid_search_after_date(self, schema):
         input_params = NestedMultiDict(MultiDict({"search_after": "invalid_date"}))
 
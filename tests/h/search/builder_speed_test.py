@@ -0,0 +1,35 @@
+from datetime import datetime
+
+import elasticsearch_dsl
+import pytest
+from webob.multidict import MultiDict
+
+from h.search import Search, query
+from h.search.builder import SearchBuilder
+
+
+@pytest.mark.skip("Only of use during development")
+@pytest.mark.usefixtures("group_service", "nipsa_service")
+class TestSearchBuilderSpeed:  # pragma: no cover
+    @pytest.mark.parametrize("builder", ("elasticsearch_dsl", "SearchBuilder"))
+    def test_speed(self, pyramid_request, builder):
+        search_ = Search(pyramid_request)
+        # pylint:disable=protected-access
+        modifiers = [query.TopLevelAnnotationsFilter()] + search_._modifiers
+
+        reps = 1000
+        start = datetime.utcnow()
+        for _ in range(reps):
+            params = MultiDict({"group": "__world__", "user": "acct:a@example.com"})
+            if builder == "SearchBuilder":
+                search = SearchBuilder(using=None, index="annotations")
+            else:
+                search = elasticsearch_dsl.Search(using=None, index="annotations")
+
+            for modifier in modifiers:
+                search = modifier(search, params)
+            search.to_dict()
+        diff = datetime.utcnow() - start
+
+        millis = diff.seconds * 1000 + diff.microseconds / 1000
+        print(f"{builder}: {millis/reps} ms/search")
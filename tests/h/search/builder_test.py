@@ -0,0 +1,84 @@
+from unittest import mock
+
+import pytest
+from elasticsearch_dsl import Q
+
+from h.search.builder import SearchBuilder
+
+
+class TestSearchBuilder:
+    def test_it_combines_the_clauses_into_one_query(self, builder):
+        builder.query("match", text="foo")
+        builder.filter("term", shared=True)
+        builder.filter(Q("terms", group=["__world__"]))
+        builder.exclude("exists", field="references")
+
+        assert builder.to_dict() == {
+            "query": {
+                "bool": {
+                    "must": [{"match": {"text": "foo"}}],
+                    "filter": [
+                        {"term": {"shared": True}},
+                        {"terms": {"group": ["__world__"]}},
+                    ],
+                    "must_not": [{"exists": {"field": "references"}}],
+                }
+            }
+        }
+
+    def test_it_returns_itself(self, builder):
+        assert builder.query("match_all") is builder
+        assert builder.filter("match_all") is builder
+        assert builder.exclude("match_all") is builder
+        assert builder.sort("updated") is builder
+        assert builder.source(False) is builder
+        assert builder.extra(search_after=[1]) is builder
+        assert builder[0:10] is builder
+
+    def test_it_sets_the_rest_of_the_body(self, builder):
+        builder.source(False)
+        builder.sort({"updated": {"order": "asc"}}, "id")
+        builder.extra(search_after=[1, "a"])
+        builder[20:30]  # pylint:disable=pointless-statement
+
+        assert builder.to_dict() == {
+            "_source": False,
+            "sort": [{"updated": {"order": "asc"}}, "id"],
+            "search_after": [1, "a"],
+            "from": 20,
+            "size": 10,
+        }
+
+    def test_sort_replaces_the_previous_sort(self, builder):
+        builder.sort("created")
+        builder.sort("updated")
+
+        assert builder.to_dict() == {"sort": ["updated"]}
+
+    def test_it_keeps_aggregations(self, builder):
+        builder.aggs.bucket("tags", "terms", field="tags_raw")
+
+        assert builder.to_dict() == {"aggs": {"tags": {"terms": {"field": "tags_raw"}}}}
+
+    def test_compile(self, builder):
+        search = builder.filter("term", shared=True).compile()
+
+        assert search.to_dict() == builder.to_dict()
+        assert search._index == ["annotations"]  # pylint:disable=protected-access
+
+    def test_execute(self, builder, es):
+        es.search.return_value = {"hits": {"total": 0, "hits": []}}
+
+        response = builder.execute()
+
+        es.search.assert_called_once()
+        assert es.search.call_args[1]["body"] == {}
+        assert not response.hits
+
+    @pytest.fixture
+    def es(self):
+        return mock.Mock(spec_set=["search"])
+
+    @pytest.fixture
+    def builder(self, es):
+        return SearchBuilder(using=es, index="annotations")
@@ -0,0 +1,33 @@
+from datetime import datetime
+
+import pytest
+from webob.multidict import MultiDict
+
+from h import search
+
+
+@pytest.mark.skip("Only of use during development")
+@pytest.mark.usefixtures("group_service", "nipsa_service")
+class TestSearchSpeed:  # pragma: no cover
+    @pytest.mark.parametrize("annotations", (0, 20))
+    @pytest.mark.parametrize("separate_replies", (False, True))
+    def test_speed(self, pyramid_request, Annotation, annotations, separate_replies):
+        for _ in range(annotations):
+            annotation = Annotation(shared=True, target_uri="http://example.com")
+            Annotation(
+                shared=True, target_uri="http://example.com", references=[annotation.id]
+            )
+
+        reps = 100
+        search_ = search.Search(pyramid_request, separate_replies=separate_replies)
+
+        start = datetime.utcnow()
+        for _ in range(reps):
+            search_.run(MultiDict({"uri": "http://example.com"}))
+        diff = datetime.utcnow() - start
+
+        millis = diff.seconds * 1000 + diff.microseconds / 1000
+        print(
+            f"{annotations} annotations, separate_replies={separate_replies}: "
+            f"{millis/reps} ms/search"
+        )
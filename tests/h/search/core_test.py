@@ -6,7 +6,9 @@ Tests for filtering/matching/aggregating on specific annotation fields are in
 """
 
 import datetime
+from unittest import mock
 
+import elasticsearch_dsl
 import pytest
 from h_matchers import Any
 from webob.multidict import MultiDict
@@ -161,6 +163,16 @@ class TestSearch:
 
         assert result.reply_ids == []
 
+    def test_prepare_aggregations(self, pyramid_request, Annotation):
+        Annotation(shared=True, tags=["tag_a"])
+        Annotation(shared=True, tags=["tag_b"])
+        search_ = search.Search(pyramid_request)
+        search_.append_aggregation(search.TagsAggregation())
+
+        run = search_.prepare_aggregations(MultiDict({"tag": "tag_a"}))
+
+        assert run() == {"tags": [{"tag": "tag_a", "count": 1}]}
+
     @pytest.fixture
     def UriCombinedWildcardFilter(self, patch):
         return patch("h.search.core.query.UriCombinedWildcardFilter")
@@ -278,6 +290,33 @@ class TestSearchWithSeparateReplies:
         # separate_replies=True.
         assert result.reply_ids == [reply.id]
 
+    def test_it_doesnt_search_for_replies_without_annotations(self, pyramid_request):
+        search_ = search.Search(pyramid_request, separate_replies=True)
+
+        with mock.patch.object(search_, "_search") as _search:
+            result = search_.run(MultiDict({}))
+
+        _search.assert_not_called()
+        assert result.reply_ids == []
+
+    def test_the_replies_search_only_fetches_ids(self, pyramid_request):
+        search_ = search.Search(pyramid_request, separate_replies=True)
+
+        with mock.patch.object(
+            elasticsearch_dsl.Search,
+            "execute",
+            autospec=True,
+            return_value={"hits": {"total": 0, "hits": []}},
+        ) as execute:
+            search_._search_replies(["annotation_id"])
+
+        body = execute.call_args[0][0].to_dict()
+        assert not body["_source"]
+        assert body["query"]["bool"]["filter"] == Any.list.containing(
+            [{"terms": {"references": ["annotation_id"]}}]
+        )
+        assert "must" not in body["query"]["bool"]
+
     def test_only_200_replies_are_included(self, pyramid_request, Annotation):
         """
         No more than 200 replies can be included in reply_ids.
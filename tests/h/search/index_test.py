@@ -1,3 +1,4 @@
+import datetime
 import logging
 from unittest import mock
 from unittest.mock import sentinel
@@ -5,7 +6,8 @@ from unittest.mock import sentinel
 import elasticsearch
 import pytest
 
-from h.search.index import BatchIndexer
+from h.db.types import URLSafeUUID
+from h.search.index import BatchIndexer, annotation_count_estimate, annotation_windows
 
 
 @pytest.mark.usefixtures("nipsa_service")
@@ -53,6 +55,18 @@ class TestBatchIndexer:
             with pytest.raises(elasticsearch.exceptions.NotFoundError):
                 get_indexed_ann(_id)
 
+    def test_it_indexes_a_window_of_annotations(
+        self, batch_indexer, db_session, annotations, get_indexed_ann
+    ):
+        window = next(annotation_windows(db_session, windowsize=2))
+
+        batch_indexer.index(window=window)
+
+        for annotation in annotations[:2]:
+            assert get_indexed_ann(annotation.id) is not None
+        with pytest.raises(elasticsearch.exceptions.NotFoundError):
+            get_indexed_ann(annotations[2].id)
+
     def test_it_does_not_index_deleted_annotations(
         self, batch_indexer, factories, get_indexed_ann
     ):
@@ -97,6 +111,29 @@ class TestBatchIndexer:
             assert result.get("user") == ann.userid
             assert result.get("uri") == ann.target_uri
 
+    def test_it_presents_annotations_a_chunk_at_a_time(
+        self, batch_indexer, factories, monkeypatch, patch, pyramid_request
+    ):
+        annotations = factories.Annotation.create_batch(3)
+        monkeypatch.setattr("h.search.index.ES_CHUNK_SIZE", 2)
+        present_batch = patch(
+            "h.search.index.presenters.AnnotationSearchIndexPresenter.present_batch"
+        )
+        present_batch.side_effect = lambda chunk, _request: [
+            {"id": annotation.id} for annotation in chunk
+        ]
+        streaming_bulk = patch("h.search.index.es_helpers.streaming_bulk")
+        streaming_bulk.side_effect = lambda _conn, actions, **_kwargs: [
+            (True, action) for action in actions
+        ]
+
+        batch_indexer.index([annotation.id for annotation in annotations])
+
+        assert present_batch.call_args_list == [
+            mock.call([mock.ANY, mock.ANY], pyramid_request),
+            mock.call([mock.ANY], pyramid_request),
+        ]
+
     def test_it_returns_errored_annotation_ids(self, batch_indexer, factories):
         annotations = factories.Annotation.create_batch(3)
         expected_errored_ids = {annotations[0].id, annotations[2].id}
@@ -140,6 +177,81 @@ class TestBatchIndexer:
         assert errored == expected_errored_ids
 
 
+class TestAnnotationWindows:
+    def test_it(self, db_session, annotations):
+        windows = annotation_windows(db_session, windowsize=2)
+
+        assert list(windows) == [
+            (
+                (annotations[0].updated, annotations[0].id),
+                (annotations[2].updated, annotations[2].id),
+            ),
+            ((annotations[2].updated, annotations[2].id), None),
+        ]
+
+    def test_it_splits_annotations_updated_at_the_same_time(
+        self, db_session, factories
+    ):
+        updated = datetime.datetime(2023, 1, 1)
+        # Postgres orders UUIDs by their bytes, not their URL-safe encoding
+        ids = sorted(
+            (a.id for a in factories.Annotation.create_batch(3, updated=updated)),
+            key=URLSafeUUID.url_safe_to_hex,
+        )
+
+        windows = annotation_windows(db_session, windowsize=2)
+
+        assert list(windows) == [
+            ((updated, ids[0]), (updated, ids[2])),
+            ((updated, ids[2]), None),
+        ]
+
+    def test_it_starts_from_start(self, db_session, annotations):
+        start = (annotations[1].updated, annotations[1].id)
+
+        windows = annotation_windows(db_session, windowsize=2, start=start)
+
+        assert list(windows) == [(start, None)]
+
+    def test_it_starts_part_way_through_annotations_updated_at_the_same_time(
+        self, db_session, factories
+    ):
+        updated = datetime.datetime(2023, 1, 1)
+        ids = sorted(
+            (a.id for a in factories.Annotation.create_batch(3, updated=updated)),
+            key=URLSafeUUID.url_safe_to_hex,
+        )
+
+        windows = annotation_windows(db_session, windowsize=2, start=(updated, ids[1]))
+
+        assert list(windows) == [((updated, ids[1]), None)]
+
+    def test_it_skips_deleted_annotations(self, db_session, annotations):
+        annotations[0].deleted = True
+
+        windows = annotation_windows(db_session, windowsize=2)
+
+        assert list(windows) == [((annotations[1].updated, annotations[1].id), None)]
+
+
+class TestAnnotationCountEstimate:
+    def test_it(self, db_session, annotations):  # pylint:disable=unused-argument
+        db_session.flush()
+        db_session.execute("ANALYZE annotation")
+
+        assert annotation_count_estimate(db_session) == 3
+
+
+@pytest.fixture
+def annotations(factories):
+    start = datetime.datetime(2023, 1, 1)
+
+    return [
+        factories.Annotation(updated=start + datetime.timedelta(days=day))
+        for day in range(3)
+    ]
+
+
 @pytest.fixture
 def batch_indexer(  # pylint:disable=unused-argument
     db_session, es_client, pyramid_request, moderation_service
@@ -0,0 +1,39 @@
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+from h.search import parser
+from tests.h.search.parser_test import pyparsing_parse
+
+QUERY = "user:luke group:__world__ tag:\"foo bar\" tag:'news' hello world"
+
+
+@pytest.mark.skip("Only of use during development")
+class TestParserSpeed:  # pragma: no cover
+    @pytest.mark.parametrize("parse", (parser.parse, pyparsing_parse))
+    def test_parse_speed(self, parse):
+        reps = 10000
+
+        start = datetime.utcnow()
+        for _ in range(reps):
+            parse(QUERY)
+        diff = datetime.utcnow() - start
+
+        millis = diff.seconds * 1000 + diff.microseconds / 1000
+        print(f"{parse.__name__}: {millis / reps * 1000:.1f} μs/parse")
+
+    def test_pyparsing_import_speed(self):
+        # This is what `h.search.parser` no longer spends importing. It's
+        # timed in a fresh interpreter, so nothing is already imported.
+        output = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import pyparsing"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stderr
+
+        # The last line is pyparsing itself, including everything it imports
+        cumulative = int(output.splitlines()[-1].split("|")[1])
+        print(f"import pyparsing: {cumulative / 1000:.1f} ms")
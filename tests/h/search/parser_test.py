@@ -1,5 +1,8 @@
+from functools import lru_cache
+
+import pyparsing as pp
 import pytest
-from hypothesis import given, settings
+from hypothesis import example, given, settings
 from hypothesis import strategies as st
 from webob.multidict import MultiDict
 
@@ -185,3 +188,61 @@ def test_unparse(query):
     # because of uncertainty in the ordering of keys. Instead, we check that
     # parsing the result gives us an object equal to the original query.
     assert parser.parse(result) == query
+
+
+# Fragments of queries, to combine into ones which exercise the corners of
+# the grammar much more often than random text would
+query_fragments = st.one_of(
+    st.sampled_from(parser.named_fields),
+    st.sampled_from(["USER", "Tag", "gRoUp", "urı", "uſer", "users", "bogus"]),
+    st.sampled_from([":", '"', "'", '""', "''", "\\", "\\x", "\\x1f", "\t"]),
+    st.sampled_from(sorted(parser.whitespace)),
+    st.text(alphabet="ab: ", max_size=3),
+    st.text(max_size=3),
+)
+queries = st.lists(query_fragments, max_size=12).map("".join)
+
+
+@given(queries)
+@settings(max_examples=1000)
+@example('tag:  "a\tb"')
+@example("user :luke\u00a0tag:foo")
+@example("\"foo\"bar'baz'")
+def test_parse_agrees_with_pyparsing(query):
+    assert parser.parse(query) == pyparsing_parse(query)
+
+
+@given(st.text())
+@settings(max_examples=200)
+def test_parse_agrees_with_pyparsing_for_any_text(query):
+    assert parser.parse(query) == pyparsing_parse(query)
+
+
+def pyparsing_parse(query):
+    """Parse `query` with the pyparsing grammar `parser.parse` replaced."""
+    return MultiDict(list(_make_pyparsing_parser().parse_string(query)))
+
+
+@lru_cache(maxsize=None)
+def _make_pyparsing_parser():
+    whitespace = "".join(parser.whitespace)
+
+    value = pp.MatchFirst(
+        [
+            pp.dbl_quoted_string.copy().set_parse_action(pp.remove_quotes),
+            pp.sgl_quoted_string.copy().set_parse_action(pp.remove_quotes),
+            pp.Empty() + pp.CharsNotIn(whitespace),
+        ]
+    )
+
+    def match(key):
+        return lambda term: [(key, term[0])]
+
+    expressions = [
+        pp.Suppress(pp.CaselessLiteral(field) + ":")
+        + value.copy().set_parse_action(match(field))
+        for field in parser.named_fields
+    ]
+    expressions.append(value.copy().set_parse_action(match("any")))
+
+    return pp.ZeroOrMore(pp.MatchFirst(expressions))
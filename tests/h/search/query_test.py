@@ -4,6 +4,7 @@ import datetime
 import elasticsearch_dsl
 import pytest
 import webob
+from h_matchers import Any
 
 from h.search import Search, query
 
@@ -258,6 +259,132 @@ class TestSorter:
 
         assert result.annotation_ids == ann_ids
 
+    def test_it_pages_through_annotations_with_the_same_sort_value(
+        self, search, Annotation
+    ):
+        updated = datetime.datetime(2017, 1, 1)
+        ann_ids = [Annotation(id=f"0{i}", updated=updated).id for i in range(5)]
+        search.append_modifier(query.Limiter())
+
+        pages = []
+        params = {"limit": 2}
+        while True:
+            result = search.run(webob.multidict.MultiDict(params))
+            pages.append(result.annotation_ids)
+            if not result.cursor:
+                break
+            params = {"limit": 2, "cursor": result.cursor}
+
+        assert pages == [ann_ids[4:2:-1], ann_ids[2:0:-1], ann_ids[0:1]]
+
+    @pytest.mark.parametrize(
+        "sort_by,order,expected",
+        (
+            (None, None, [("updated", "desc"), ("id", "desc")]),
+            ("created", "asc", [("created", "asc"), ("id", "asc")]),
+            ("user", "desc", [("user_raw", "desc"), ("id", "desc")]),
+            ("id", "asc", [("id", "asc")]),
+        ),
+    )
+    def test_it_sorts_by_id_last(self, es_dsl_search, sort_by, order, expected):
+        params = {}
+        if sort_by:
+            params["sort"] = sort_by
+        if order:
+            params["order"] = order
+
+        q = query.Sorter()(es_dsl_search, params).to_dict()
+
+        assert self.sort_fields(q) == expected
+
+    def test_it_doesnt_sort_by_id_with_search_after(self, es_dsl_search):
+        q = query.Sorter()(es_dsl_search, {"search_after": "2018"}).to_dict()
+
+        assert self.sort_fields(q) == [("updated", "desc")]
+
+    def test_it_sorts_after_a_cursor(self, es_dsl_search):
+        cursor = query.Sorter.encode_cursor(
+            [("created", "asc"), ("id", "asc")], [1514764800000, "abc"]
+        )
+        params = webob.multidict.MultiDict(
+            {
+                "cursor": cursor,
+                "sort": "updated",
+                "order": "desc",
+                "search_after": "2018",
+                "offset": 40,
+            }
+        )
+
+        q = query.Sorter()(es_dsl_search, params).to_dict()
+
+        assert q["search_after"] == [1514764800000, "abc"]
+        assert self.sort_fields(q) == [("created", "asc"), ("id", "asc")]
+        assert not params
+
+    def test_it_ignores_invalid_cursors(self, es_dsl_search):
+        params = {"cursor": "invalid", "order": "asc"}
+
+        q = query.Sorter()(es_dsl_search, params).to_dict()
+
+        assert "search_after" not in q
+        assert self.sort_fields(q) == [("updated", "asc"), ("id", "asc")]
+
+    def test_next_cursor(self, es_dsl_search):
+        search = query.Sorter()(es_dsl_search, {})[:2]
+        response = {
+            "hits": {"hits": [{"sort": [2, "b"]}, {"sort": [1, "a"]}]},
+        }
+
+        cursor = query.Sorter.next_cursor(search, response)
+
+        assert query.Sorter.decode_cursor(cursor) == (
+            [("updated", "desc"), ("id", "desc")],
+            [1, "a"],
+        )
+
+    @pytest.mark.parametrize(
+        "params,hits",
+        (
+            # The page isn't full, so it's the last one
+            ({}, [{"sort": [1, "a"]}]),
+            ({}, []),
+            # The annotations aren't ordered by id
+            ({"search_after": "2018"}, [{"sort": [2]}, {"sort": [1]}]),
+        ),
+    )
+    def test_next_cursor_returns_None(self, es_dsl_search, params, hits):
+        search = query.Sorter()(es_dsl_search, params)[:2]
+
+        assert query.Sorter.next_cursor(search, {"hits": {"hits": hits}}) is None
+
+    @pytest.mark.parametrize(
+        "cursor",
+        (
+            "not base64!",
+            "e30=",  # {}
+            query.Sorter.encode_cursor([], []),
+            query.Sorter.encode_cursor([("updated", "desc")], [1]),
+            query.Sorter.encode_cursor([("text", "desc"), ("id", "desc")], [1, "a"]),
+            query.Sorter.encode_cursor([("updated", "up"), ("id", "desc")], [1, "a"]),
+            query.Sorter.encode_cursor([("updated", "desc"), ("id", "desc")], [1]),
+            query.Sorter.encode_cursor(
+                [("updated", "desc"), ("id", "desc")], [{"a": 1}, "a"]
+            ),
+        ),
+    )
+    def test_decode_cursor_raises_for_invalid_cursors(self, cursor):
+        with pytest.raises(ValueError):
+            query.Sorter.decode_cursor(cursor)
+
+    @staticmethod
+    def sort_fields(q):
+        return [
+            (field, options["order"])
+            for key in q["sort"]
+            for field, options in key.items()
+        ]
+
 
 class TestTopLevelAnnotationsFilter:
     def test_it_filters_out_replies_but_leaves_annotations_in(self, Annotation, search):
@@ -471,12 +598,15 @@ class TestUriCombinedWildcardFilter:
     ):
         search = get_search()
         # Mark all these uri's as equivalent uri's.
-        storage.expand_uri.side_effect = lambda _, x: [
-            "urn:x-pdf:1234",
-            "file:///Users/june/article.pdf",
-            "doi:10.1.1/1234",
-            "http://reading.com/x-pdf",
-        ]
+        storage.expand_uris.side_effect = lambda _, uris: {
+            uri: [
+                "urn:x-pdf:1234",
+                "file:///Users/june/article.pdf",
+                "doi:10.1.1/1234",
+                "http://reading.com/x-pdf",
+            ]
+            for uri in uris
+        }
         Annotation(target_uri="urn:x-pdf:1235")
         _ = Annotation(target_uri="file:///Users/jane/article.pdf").id
         expected_ids = [
@@ -632,6 +762,49 @@ class TestUriCombinedWildcardFilter:
         assert "url" not in params
         assert "wildcard_uri" not in params
 
+    @pytest.mark.parametrize("separate_keys", (True, False))
+    def test_expands_all_the_uris_at_once(
+        self, es_dsl_search, pyramid_request, storage, separate_keys
+    ):
+        storage.expand_uris.side_effect = lambda _, uris: {
+            uri: [uri, "doi:10.1.1/1234"] for uri in uris
+        }
+        params = webob.multidict.MultiDict(
+            [("uri", "http://bar.com"), ("url", "http://baz.com")]
+        )
+        if separate_keys:
+            params.add("wildcard_uri", "http://foo.com/*")
+        else:
+            params.add("uri", "http://foo.com/*")
+        urifilter = query.UriCombinedWildcardFilter(pyramid_request, separate_keys)
+
+        q = urifilter(es_dsl_search, params).to_dict()
+
+        storage.expand_uris.assert_called_once_with(
+            pyramid_request.db,
+            ["http://bar.com", "http://baz.com", "http://foo.com/*"],
+        )
+        assert (
+            q["query"]["bool"]["should"]
+            == Any.list.containing(
+                [
+                    {"wildcard": {"target.scope": "httpx://foo.com*"}},
+                    {"wildcard": {"target.scope": "doi:10.1.1/1234"}},
+                    {
+                        "terms": {
+                            "target.scope": Any.list.containing(
+                                [
+                                    "httpx://bar.com",
+                                    "httpx://baz.com",
+                                    "doi:10.1.1/1234",
+                                ]
+                            ).only()
+                        }
+                    },
+                ]
+            ).only()
+        )
+
     @pytest.fixture
     def get_search(self, search, pyramid_request):
         def _get_search(separate_keys=True):
@@ -753,6 +926,56 @@ class TestHiddenFilter:
         return group_service
 
 
+class TestSharedAnnotationsFilter:
+    def test_it_only_matches_shared_annotations_even_for_their_author(
+        self, search, pyramid_config, Annotation
+    ):
+        userid = "acct:bar@auth2"
+        pyramid_config.testing_securitypolicy(userid)
+        shared_id = Annotation(userid=userid, shared=True).id
+        Annotation(userid=userid)
+
+        result = search.run(webob.multidict.MultiDict({}))
+
+        assert result.annotation_ids == [shared_id]
+
+    @pytest.mark.parametrize(
+        "is_nipsaed,is_hidden", ((True, False), (False, True), (False, False))
+    )
+    def test_it_excludes_hidden_and_nipsaed_annotations_even_for_their_author(
+        self,
+        search,
+        pyramid_request,
+        factories,
+        index_annotations,
+        nipsa_service,
+        moderation_service,
+        is_nipsaed,
+        is_hidden,
+    ):
+        pyramid_request.user = factories.User()
+        annotation = factories.Annotation.build(
+            userid=pyramid_request.user.userid, shared=True
+        )
+        nipsa_service.is_flagged.return_value = is_nipsaed
+        moderation_service.all_hidden.return_value = (
+            [annotation.id] if is_hidden else []
+        )
+        index_annotations(annotation)
+
+        result = search.run(webob.multidict.MultiDict({}))
+
+        if is_nipsaed or is_hidden:
+            assert not result.annotation_ids
+        else:
+            assert result.annotation_ids == [annotation.id]
+
+    @pytest.fixture
+    def search(self, search):
+        search.append_modifier(query.SharedAnnotationsFilter())
+        return search
+
+
 class TestAnyMatcher:
     def test_matches_uriparts(self, search, Annotation):
         Annotation(target_uri="http://bar.com")
@@ -3,33 +3,16 @@ from unittest.mock import sentinel
 import pytest
 from h_matchers import Any
 
-from h.security.identity import (
-    Identity,
-    LongLivedAuthClient,
-    LongLivedGroup,
-    LongLivedUser,
-)
-
-
-class TestLongLivedGroup:
-    def test_from_models(self, factories):
-        group = factories.Group.build()
-
-        model = LongLivedGroup.from_model(group)
-
-        assert model == Any.instance_of(LongLivedGroup).with_attrs(
-            {"id": group.id, "pubid": group.pubid}
-        )
+from h.security.identity import Identity, LongLivedAuthClient, LongLivedUser
 
 
 class TestLongLivedUser:
-    def test_from_models(self, factories, LongLivedGroup):
-        group = factories.Group.build()
-        user = factories.User.build(groups=[group])
+    def test_from_models(self, factories):
+        groups = factories.Group.build_batch(2)
+        user = factories.User.build(groups=groups)
 
         model = LongLivedUser.from_model(user)
 
-        LongLivedGroup.from_model.assert_called_once_with(group)
         assert model == Any.instance_of(LongLivedUser).with_attrs(
             {
                 "id": user.id,
@@ -37,14 +20,10 @@ class TestLongLivedUser:
                 "authority": user.authority,
                 "admin": user.admin,
                 "staff": user.staff,
-                "groups": [LongLivedGroup.from_model.return_value],
+                "group_ids": frozenset(group.id for group in groups),
             }
         )
 
-    @pytest.fixture(autouse=True)
-    def LongLivedGroup(self, patch):
-        return patch("h.security.identity.LongLivedGroup")
-
 
 class TestLongLivedAuthClient:
     def test_from_models(self, factories):
@@ -179,10 +179,7 @@ class TestGroupPredicates:
     def test_group_has_user_as_member(
         self, group_context, identity, factories, matching
     ):
-        # Note we don't use the same literal objects here. It's important
-        # that we test based on the values not Python equality as the objects
-        # are detached in the WS and don't evaluate as equal
-        identity.user.groups = [factories.Group.build(id=i) for i in range(3)]
+        identity.user.group_ids = frozenset(range(3))
         group_context.group = factories.Group.build(id=1 if matching else 100)
 
         assert predicates.group_has_user_as_member(identity, group_context) == matching
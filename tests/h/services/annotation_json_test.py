@@ -1,5 +1,5 @@
 from datetime import datetime
-from unittest.mock import sentinel
+from unittest.mock import Mock, sentinel
 
 import pytest
 from h_matchers import Any
@@ -7,7 +7,11 @@ from pyramid.authorization import Everyone
 from sqlalchemy import event
 
 from h.security.permissions import Permission
-from h.services.annotation_json import AnnotationJSONService, factory
+from h.services.annotation_json import (
+    AnnotationJSONService,
+    factory,
+    presented_annotations,
+)
 from h.traversal import AnnotationContext
 
 
@@ -189,6 +193,78 @@ class TestAnnotationJSONService:
             Any.dict.containing({"id": Any(), "hidden": False})
         ]
 
+    def test_present_all_for_user_only_counts_flags_for_moderators(
+        self, service, factories, user, flag_service, identity_permits
+    ):
+        annotations = factories.Annotation.create_batch(3)
+        moderated = annotations[1]
+        identity_permits.side_effect = (
+            lambda context, **_: context.annotation == moderated
+        )
+
+        result = service.present_all_for_user(
+            [annotation.id for annotation in annotations], user
+        )
+
+        flag_service.flag_counts.assert_called_once_with([moderated.id])
+        assert ["moderation" in model for model in result] == [False, True, False]
+
+    def test_present_all_for_user_doesnt_count_flags_without_moderation(
+        self, service, annotation, user, flag_service, identity_permits
+    ):
+        identity_permits.return_value = False
+
+        service.present_all_for_user([annotation.id], user)
+
+        flag_service.flag_counts.assert_not_called()
+
+    def test_present_all_for_user_gets_the_identity_once(
+        self, service, factories, user, Identity
+    ):
+        annotations = factories.Annotation.create_batch(3)
+
+        service.present_all_for_user(
+            [annotation.id for annotation in annotations], user
+        )
+
+        Identity.from_models.assert_called_once_with(user=user)
+
+    def test_present_all_for_user_shares_presented_json_between_users(
+        self, service, annotation, factories, DocumentJSONPresenter, user_service
+    ):
+        service.present_all_for_user([annotation.id], factories.User())
+        DocumentJSONPresenter.reset_mock()
+        user_service.reset_mock()
+
+        result = service.present_all_for_user([annotation.id], factories.User())
+
+        DocumentJSONPresenter.assert_not_called()
+        user_service.fetch_all.assert_not_called()
+        assert result == [Any.dict.containing({"id": annotation.id})]
+
+    @pytest.mark.usefixtures("with_hidden_annotation")
+    def test_present_all_for_user_doesnt_share_user_specific_parts(
+        self, service, annotation, user, factories, identity_permits
+    ):
+        service.present_all_for_user([annotation.id], user)
+        identity_permits.return_value = False
+
+        result = service.present_all_for_user([annotation.id], factories.User())
+
+        assert result[0]["text"] == ""
+        _, model = presented_annotations.get(annotation.id)
+        assert model["text"] == annotation.text
+
+    def test_present_all_for_user_presents_updated_annotations_again(
+        self, service, annotation, user, DocumentJSONPresenter
+    ):
+        service.present_all_for_user([annotation.id], user)
+        annotation.updated = datetime(2030, 1, 1)
+
+        service.present_all_for_user([annotation.id], user)
+
+        assert DocumentJSONPresenter.call_count == 2
+
     @pytest.mark.parametrize("attribute", ("document", "moderation", "group"))
     @pytest.mark.parametrize("with_preload", (True, False))
     def test_present_all_for_userpreloading_is_effective(
@@ -255,6 +331,11 @@ class TestAnnotationJSONService:
     def Identity(self, patch):
         return patch("h.services.annotation_json.Identity")
 
+    @pytest.fixture(autouse=True)
+    def clear_presented_annotations(self):
+        yield
+        presented_annotations.clear()
+
     @pytest.fixture(autouse=True)
     def identity_permits(self, patch):
         return patch("h.services.annotation_json.identity_permits")
@@ -26,6 +26,18 @@ class TestDeleteGroupService:
 
         assert group in db_session.deleted
 
+    def test_it_invalidates_the_world_readable_groups_cache(
+        self, svc, factories, patch
+    ):
+        world_readable_groups = patch("h.services.delete_group.world_readable_groups")
+        group = factories.Group()
+
+        svc.delete(group)
+
+        world_readable_groups.invalidate_after_commit.assert_called_once_with(
+            svc.request.db
+        )
+
     def test_it_deletes_annotations(self, svc, factories, annotation_delete_service):
         group = factories.Group()
         annotations = [
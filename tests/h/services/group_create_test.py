@@ -211,6 +211,13 @@ class TestCreateOpenGroup:
 
         assert group in db_session
 
+    def test_it_invalidates_the_world_readable_groups_cache(
+        self, creator, svc, origins, world_readable_groups
+    ):
+        svc.create_open_group("Anteater fans", creator.userid, scopes=origins)
+
+        world_readable_groups.invalidate_after_commit.assert_called_once_with(svc.db)
+
     def test_it_does_not_publish_join_event(self, svc, creator, publish, origins):
         svc.create_open_group(
             "Dishwasher disassemblers", creator.userid, scopes=origins
@@ -468,6 +475,11 @@ def svc(db_session, usr_svc, publish):
     return GroupCreateService(db_session, usr_svc, publish=publish)
 
 
+@pytest.fixture
+def world_readable_groups(patch):
+    return patch("h.services.group_create.world_readable_groups")
+
+
 @pytest.fixture
 def creator(factories):
     return factories.User(username="group_creator")
@@ -3,9 +3,15 @@ from unittest import mock
 
 import pytest
 
+from h.db import Session
 from h.models import Group, GroupScope, User
 from h.models.group import ReadableBy
-from h.services.group import GroupService, groups_factory
+from h.services.group import (
+    GroupService,
+    WorldReadableGroupCache,
+    groups_factory,
+    world_readable_groups,
+)
 from tests.common.matchers import Matcher
 
 
@@ -157,6 +163,50 @@ class TestGroupServiceGroupIds:
         pubids = [group.pubid, "doesnotexist"]
         assert svc.groupids_readable_by(user, group_ids=pubids) == [group.pubid]
 
+    def test_readable_by_keeps_the_order_of_the_filter(self, svc, factories):
+        groups = factories.Group.create_batch(3, readable_by=ReadableBy.world)
+        pubids = [groups[2].pubid, "__world__", groups[0].pubid]
+
+        assert svc.groupids_readable_by(None, group_ids=pubids) == pubids
+
+    def test_readable_by_caches_world_readable_groups_between_requests(
+        self, db_session, factories
+    ):
+        GroupService(db_session, mock.sentinel.user_fetcher).groupids_readable_by(None)
+        group = factories.Group(readable_by=ReadableBy.world)
+
+        svc = GroupService(db_session, mock.sentinel.user_fetcher)
+        assert group.pubid not in svc.groupids_readable_by(None)
+
+        world_readable_groups.invalidate()
+        svc = GroupService(db_session, mock.sentinel.user_fetcher)
+        assert group.pubid in svc.groupids_readable_by(None)
+
+    def test_readable_by_doesnt_cache_memberships_between_requests(
+        self, db_session, factories
+    ):
+        user = factories.User()
+        GroupService(db_session, mock.sentinel.user_fetcher).groupids_readable_by(user)
+        group = factories.Group(readable_by=ReadableBy.members)
+        group.members.append(user)
+        db_session.flush()
+
+        svc = GroupService(db_session, mock.sentinel.user_fetcher)
+        assert group.pubid in svc.groupids_readable_by(user)
+
+    def test_readable_by_remembers_answers_for_the_request(
+        self, svc, db_session, factories
+    ):
+        user = factories.User()
+        db_session.flush()
+        svc.groupids_readable_by(user, ["__world__"])
+
+        with mock.patch.object(db_session, "query") as query:
+            result = svc.groupids_readable_by(user, ["__world__"])
+
+        query.assert_not_called()
+        assert result == ["__world__"]
+
     def test_created_by_includes_created_groups(self, svc, factories):
         user = factories.User()
         group = factories.Group(creator=user)
@@ -176,6 +226,95 @@ class TestGroupServiceGroupIds:
         assert svc.groupids_created_by(None) == []
 
 
+class TestWorldReadableGroupCache:
+    def test_it_gets_world_readable_groups(self, cache, db_session, factories):
+        group = factories.Group(readable_by=ReadableBy.world)
+        factories.Group(readable_by=ReadableBy.members)
+        db_session.flush()
+
+        assert cache.get(db_session) == {"__world__", group.pubid}
+
+    def test_it_caches_the_groups(self, cache, db_session):
+        pubids = cache.get(db_session)
+
+        with mock.patch.object(db_session, "query") as query:
+            assert cache.get(db_session) == pubids
+
+        query.assert_not_called()
+
+    def test_it_expires_the_groups(self, cache, db_session, factories, monotonic):
+        cache.get(db_session)
+        group = factories.Group(readable_by=ReadableBy.world)
+        db_session.flush()
+
+        monotonic.return_value += 61
+
+        assert group.pubid in cache.get(db_session)
+
+    def test_invalidate(self, cache, db_session, factories):
+        cache.get(db_session)
+        group = factories.Group(readable_by=ReadableBy.world)
+        db_session.flush()
+
+        cache.invalidate()
+
+        assert group.pubid in cache.get(db_session)
+
+    def test_it_doesnt_keep_groups_read_before_an_invalidation(self, cache, db_session):
+        query = db_session.query
+
+        def invalidate_while_querying(*args):
+            cache.invalidate()
+            return query(*args)
+
+        with mock.patch.object(db_session, "query", invalidate_while_querying):
+            cache.get(db_session)
+
+        with mock.patch.object(db_session, "query", wraps=query) as query_spy:
+            cache.get(db_session)
+
+        query_spy.assert_called_once()
+
+    def test_invalidate_after_commit_leaves_the_cache_alone_until_the_commit(
+        self, cache, session
+    ):
+        pubids = cache.get(session)
+
+        cache.invalidate_after_commit(session)
+
+        assert cache.get(session) is pubids
+        session.commit()
+        assert cache.get(session) is not pubids
+
+    def test_invalidate_after_commit_does_nothing_on_rollback(self, cache, session):
+        pubids = cache.get(session)
+
+        cache.invalidate_after_commit(session)
+        session.rollback()
+        # A later transaction's commit doesn't invalidate the cache either
+        session.execute("SELECT 1")
+        session.commit()
+
+        assert cache.get(session) is pubids
+
+    @pytest.fixture
+    def cache(self):
+        return WorldReadableGroupCache(ttl=60)
+
+    @pytest.fixture
+    def session(self, db_engine):
+        # A session which really commits, unlike `db_session`
+        session = Session(bind=db_engine)
+        yield session
+        session.close()
+
+    @pytest.fixture(autouse=True)
+    def monotonic(self, patch):
+        monotonic = patch("h.services.group.monotonic")
+        monotonic.return_value = 1000
+        return monotonic
+
+
 @pytest.mark.usefixtures("user_service")
 class TestGroupsFactory:
     def test_returns_groups_service(self, pyramid_request):
@@ -25,6 +25,18 @@ class TestGroupUpdate:
 
         assert updated_group == group
 
+    def test_it_invalidates_the_world_readable_groups_cache(
+        self, factories, svc, patch
+    ):
+        world_readable_groups = patch("h.services.group_update.world_readable_groups")
+        group = factories.Group()
+
+        svc.update(group, name="whatnot")
+
+        world_readable_groups.invalidate_after_commit.assert_called_once_with(
+            svc.session
+        )
+
     def test_it_accepts_scope_relations(self, factories, svc):
         group = factories.Group()
         scopes = [factories.GroupScope(), factories.GroupScope()]
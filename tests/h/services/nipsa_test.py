@@ -19,6 +19,27 @@ class TestNipsaService:
     def test_is_flagged_returns_false_for_unknown_users(self, svc):
         assert not svc.is_flagged("acct:not_in_the_db@example.com")
 
+    def test_flagged_userids_returns_the_flagged_userids(self, svc):
+        assert svc.flagged_userids(
+            [
+                "acct:flagged_user@example.com",
+                "acct:unflagged_user@example.com",
+                "acct:not_in_the_db@example.com",
+            ]
+        ) == {"acct:flagged_user@example.com"}
+
+    def test_flagged_userids_with_no_userids(self, svc):
+        assert svc.flagged_userids([]) == set()
+
+    def test_flagged_userids_uses_the_cache(self, svc, users):
+        svc.fetch_all_flagged_userids()
+        users["unflagged_user"].nipsa = True
+
+        # Only the cached users are flagged.
+        assert svc.flagged_userids(
+            ["acct:flagged_user@example.com", "acct:unflagged_user@example.com"]
+        ) == {"acct:flagged_user@example.com"}
+
     def test_flag_sets_nipsa_true(self, svc, users):
         svc.flag(users["unflagged_user"])
 
@@ -261,6 +261,56 @@ class TestSync:
         }
         batch_indexer.index.assert_called_once_with([self.url_safe_id(job)])
 
+    def test_if_the_synced_annotation_is_in_Elastic_it_removes_the_job_from_the_queue(
+        self, batch_indexer, db_session, factories, index, queue
+    ):
+        annotation = factories.Annotation()
+        job = factories.SyncAnnotationJob(annotation=annotation)
+        batch_indexer.index.side_effect = lambda _ids: index(annotation)
+
+        counts = queue.sync(1)
+
+        assert counts == {
+            Queue.Result.SYNCED_MISSING.format(tag="test_tag"): 1,
+            Queue.Result.SYNCED_TAG_TOTAL.format(tag="test_tag"): 1,
+            Queue.Result.SYNCED_TOTAL: 1,
+            Queue.Result.COMPLETED_SYNCED.format(tag="test_tag"): 1,
+            Queue.Result.COMPLETED_TAG_TOTAL.format(tag="test_tag"): 1,
+            Queue.Result.COMPLETED_TOTAL: 1,
+        }
+        assert job not in db_session.query(Job)
+
+    def test_if_the_synced_annotation_isnt_in_Elastic_it_leaves_the_job_on_the_queue(
+        self, db_session, factories, queue
+    ):
+        job = factories.SyncAnnotationJob()
+
+        queue.sync(1)
+
+        assert job in db_session.query(Job)
+
+    def test_jobs_for_new_annotations_are_checked_in_Elastic_too(
+        self, batch_indexer, db_session, factories, index, queue
+    ):
+        # New annotations are usually indexed when they're created, so by the
+        # time their job runs they're up to date in Elastic
+        annotation = factories.Annotation()
+        index(annotation)
+        job = factories.SyncAnnotationJob(
+            annotation=annotation, tag="storage.create_annotation"
+        )
+
+        counts = queue.sync(1)
+
+        tag = "storage.create_annotation"
+        assert counts == {
+            Queue.Result.COMPLETED_UP_TO_DATE.format(tag=tag): 1,
+            Queue.Result.COMPLETED_TAG_TOTAL.format(tag=tag): 1,
+            Queue.Result.COMPLETED_TOTAL: 1,
+        }
+        batch_indexer.index.assert_not_called()
+        assert job not in db_session.query(Job)
+
     def test_if_the_annotation_is_already_in_Elastic_it_removes_the_job_from_the_queue(
         self, batch_indexer, db_session, factories, index, queue
     ):
@@ -7,8 +7,9 @@ import sqlalchemy as sa
 from h_matchers import Any
 
 from h import storage
+from h.events import DocumentURIsChangedEvent
 from h.models.annotation import Annotation
-from h.models.document import Document, DocumentURI
+from h.models.document import Document, DocumentURI, changed_documents
 from h.schemas import ValidationError
 from h.security import Permission
 from h.traversal.group import GroupContext
@@ -130,6 +131,99 @@ class TestExpandURI:
         assert uris == expected_uris
 
 
+class TestExpandURIs:
+    @pytest.mark.parametrize(
+        "normalized,expected_uris",
+        (
+            (
+                False,
+                {
+                    "http://example.com/": [
+                        "http://example.com/",
+                        "http://alt.example.com/",
+                    ],
+                    "http://canonical.example.com/": ["http://canonical.example.com/"],
+                    "http://unknown.example.com/": ["http://unknown.example.com/"],
+                },
+            ),
+            (
+                True,
+                {
+                    "http://example.com/": [
+                        "httpx://example.com",
+                        "httpx://alt.example.com",
+                    ],
+                    "http://canonical.example.com/": ["httpx://canonical.example.com"],
+                    "http://unknown.example.com/": ["httpx://unknown.example.com"],
+                },
+            ),
+        ),
+    )
+    def test_it(self, db_session, normalized, expected_uris):
+        db_session.add_all(
+            [
+                Document(
+                    document_uris=[
+                        DocumentURI(
+                            uri="http://example.com/", claimant="http://example.com"
+                        ),
+                        DocumentURI(
+                            uri="http://alt.example.com/",
+                            claimant="http://example.com",
+                        ),
+                    ]
+                ),
+                Document(
+                    document_uris=[
+                        DocumentURI(
+                            uri="http://canonical.example.com/",
+                            type="rel-canonical",
+                            claimant="http://canonical.example.com",
+                        ),
+                        DocumentURI(
+                            uri="http://noise.example.com/",
+                            claimant="http://canonical.example.com",
+                        ),
+                    ]
+                ),
+            ]
+        )
+        db_session.flush()
+
+        uris = storage.expand_uris(
+            db_session, list(expected_uris.keys()), normalized=normalized
+        )
+
+        assert uris == expected_uris
+
+    def test_it_matches_expand_uri(self, db_session):
+        document = Document(
+            document_uris=[
+                DocumentURI(uri="http://example.com/", claimant="http://example.com"),
+                DocumentURI(
+                    uri="http://example.com/",
+                    type="rel-alternate",
+                    claimant="http://other.example.com",
+                ),
+                DocumentURI(
+                    uri="http://alt.example.com/", claimant="http://example.com"
+                ),
+            ]
+        )
+        db_session.add(document)
+        db_session.flush()
+
+        uris = storage.expand_uris(
+            db_session, ["http://example.com/", "http://alt.example.com/"]
+        )
+
+        for uri, expanded_uris in uris.items():
+            assert sorted(expanded_uris) == sorted(storage.expand_uri(db_session, uri))
+
+    def test_it_with_no_uris(self, db_session):
+        assert storage.expand_uris(db_session, []) == {}
+
+
 class TestCreateAnnotation:
     def test_it(self, pyramid_request, annotation_data, datetime):
         annotation = storage.create_annotation(pyramid_request, annotation_data)
@@ -171,6 +265,26 @@ class TestCreateAnnotation:
         )
         assert annotation.document == update_document_metadata.return_value
 
+    @pytest.mark.usefixtures("changed_document")
+    def test_it_notifies_about_changed_document_uris(
+        self, pyramid_request, annotation_data
+    ):
+        storage.create_annotation(pyramid_request, annotation_data)
+
+        pyramid_request.notify_after_commit.assert_called_once_with(
+            Any.instance_of(DocumentURIsChangedEvent).with_attrs(
+                {"uris": {"httpx://example.com/a", "httpx://example.com/b"}}
+            )
+        )
+        assert not changed_documents(pyramid_request.db)
+
+    def test_it_doesnt_notify_if_no_document_uris_changed(
+        self, pyramid_request, annotation_data
+    ):
+        storage.create_annotation(pyramid_request, annotation_data)
+
+        pyramid_request.notify_after_commit.assert_not_called()
+
     def test_it_queues_the_search_index(
         self, pyramid_request, annotation_data, search_index
     ):
@@ -338,6 +452,21 @@ class TestUpdateAnnotation:
         )
         assert result.document == update_document_metadata.return_value
 
+    @pytest.mark.usefixtures("changed_document")
+    def test_it_notifies_about_changed_document_uris(self, pyramid_request, annotation):
+        # Creating the annotation with the factory records its document too
+        changed_documents(pyramid_request.db).clear()
+
+        storage.update_annotation(
+            pyramid_request, annotation.id, {"target_uri": "https://new-url.com"}
+        )
+
+        pyramid_request.notify_after_commit.assert_called_once_with(
+            Any.instance_of(DocumentURIsChangedEvent).with_attrs(
+                {"uris": {"httpx://example.com/a", "httpx://example.com/b"}}
+            )
+        )
+
     def test_it_does_not_update_document_if_no_document_or_uri_change(
         self, pyramid_request, annotation, update_document_metadata
     ):
@@ -486,6 +615,31 @@ def _validate_group_scope(patch):
     return patch("h.storage._validate_group_scope")
 
 
+@pytest.fixture
+def pyramid_request(pyramid_request):
+    pyramid_request.notify_after_commit = create_autospec(
+        lambda event: None  # pragma: no cover
+    )
+    return pyramid_request
+
+
+@pytest.fixture
+def changed_document(update_document_metadata, factories):
+    document = factories.Document(
+        document_uris=[
+            factories.DocumentURI(uri="http://example.com/a"),
+            factories.DocumentURI(uri="http://example.com/b"),
+        ]
+    )
+
+    def update_document_metadata_(session, *_args, **_kwargs):
+        changed_documents(session).add(document)
+        return document
+
+    update_document_metadata.side_effect = update_document_metadata_
+    return document
+
+
 @pytest.fixture
 def update_document_metadata(patch, factories):
     update_document_metadata = patch("h.storage.update_document_metadata")
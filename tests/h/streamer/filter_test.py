@@ -1,3 +1,4 @@
+import tracemalloc
 from datetime import datetime
 from random import random
 
@@ -56,9 +57,11 @@ class TestFilterHandler:
         ],
     )
     def test_it_matches_equivalent_uri(
-        self, annotation, filter_matches, equivalent_uris, storage, db_session
+        self, annotation, filter_matches, equivalent_uris, uri_cache, db_session
     ):
-        storage.expand_uri.return_value = equivalent_uris
+        uri_cache.expand_uris.side_effect = lambda _session, uris: {
+            uri: equivalent_uris for uri in uris
+        }
         filter_ = {
             "match_policy": "include_any",
             "actions": {},
@@ -79,10 +82,34 @@ class TestFilterHandler:
         result = filter_matches(filter_, annotation)
 
         assert result  # It matches!
-        storage.expand_uri.assert_called_once_with(
-            db_session, annotation.target_uri, normalized=True
+        uri_cache.expand_uris.assert_called_once_with(
+            db_session, [annotation.target_uri]
+        )
+
+    def test_it_uses_already_expanded_uris(self, annotation, uri_cache, db_session):
+        socket = FakeSocket()
+        SocketFilter.set_filter(
+            socket,
+            {
+                "match_policy": "include_any",
+                "actions": {},
+                "clauses": [
+                    {
+                        "field": "/uri",
+                        "operator": "one_of",
+                        "value": ["https://othersite.com/foo.pdf"],
+                    }
+                ],
+            },
+        )
+
+        result = SocketFilter.matching(
+            annotation, db_session, expanded_uris=["httpx://othersite.com/foo.pdf"]
         )
 
+        assert socket in tuple(result)
+        uri_cache.expand_uris.assert_not_called()
+
     def test_it_matches_id(self, factories, filter_matches, annotation):
         other_annotation = factories.Annotation()
 
@@ -113,20 +140,60 @@ class TestFilterHandler:
         assert filter_matches(filter_, annotation)
         assert not filter_matches(filter_, other_annotation)
 
-    def test_it_does_not_crash_without_filter_rows(self, annotation, db_session):
-        socket_no_rows = FakeSocket()
+    def test_it_does_not_match_sockets_without_a_filter(self, annotation, db_session):
+        socket = FakeSocket()
+        socket.filter_rows = (  # pylint:disable=attribute-defined-outside-init
+            ("/id", annotation.id),
+        )
 
-        result = tuple(SocketFilter.matching([socket_no_rows], annotation, db_session))
+        result = tuple(SocketFilter.matching(annotation, db_session))
         assert not result
 
     def test_it_does_not_crash_with_unexpected_fields(self, annotation, db_session):
+        SocketFilter.index.add(FakeSocket(), (("/not_a_thing", "value"),))
+
+        result = tuple(SocketFilter.matching(annotation, db_session))
+        assert not result
+
+    def test_set_filter_replaces_an_existing_filter(self, annotation, db_session):
         socket = FakeSocket()
-        socket.filter_rows = (  # pylint:disable=attribute-defined-outside-init
-            ("/not_a_thing", "value"),
+        SocketFilter.set_filter(socket, self.get_id_filter(annotation.id))
+
+        SocketFilter.set_filter(socket, self.get_id_filter("other"))
+
+        assert not tuple(SocketFilter.matching(annotation, db_session))
+
+    def test_remove_filter(self, annotation, db_session):
+        socket = FakeSocket()
+        SocketFilter.set_filter(socket, self.get_id_filter(annotation.id))
+
+        SocketFilter.remove_filter(socket)
+
+        assert not tuple(SocketFilter.matching(annotation, db_session))
+        assert not socket.filter_rows
+        assert not SocketFilter.index
+
+    def test_remove_filter_with_no_filter(self):
+        SocketFilter.remove_filter(FakeSocket())
+
+    def test_it_keeps_sockets_until_their_filter_is_removed(
+        self, annotation, db_session
+    ):
+        SocketFilter.set_filter(FakeSocket(), self.get_id_filter(annotation.id))
+
+        assert tuple(SocketFilter.matching(annotation, db_session)) == (
+            Any.instance_of(FakeSocket),
         )
 
-        result = tuple(SocketFilter.matching([socket], annotation, db_session))
-        assert not result
+    def test_it_returns_each_socket_once(self, annotation, db_session):
+        socket = FakeSocket()
+        filter_ = self.get_id_filter(annotation.id)
+        filter_["clauses"].append(
+            {"field": "/group", "operator": "equals", "value": annotation.groupid}
+        )
+        SocketFilter.set_filter(socket, filter_)
+
+        assert tuple(SocketFilter.matching(annotation, db_session)) == (socket,)
 
     @pytest.mark.parametrize(
         "field,value,expected",
@@ -149,6 +216,8 @@ class TestFilterHandler:
             ("/uri", ["same", "same"], [("/uri", "same")]),
             ("/group", ["v1", "v2"], [("/group", "v1"), ("/group", "v2")]),
             ("/group", ["same", "same"], [("/group", "same")]),
+            # Unhashable values
+            ("/id", {"an": "object"}, []),
             # Mapping
             ("/uri", "http://example.com", [("/uri", "httpx://example.com")]),
             # Ignored
@@ -169,6 +238,15 @@ class TestFilterHandler:
 
         assert socket.filter_rows == Any.iterable.containing(expected).only()
 
+    def test_set_filter_shares_values_between_sockets(self):
+        sockets = [FakeSocket(), FakeSocket()]
+
+        for socket in sockets:
+            # Build the value afresh each time, as a client's would be
+            SocketFilter.set_filter(socket, self.get_id_filter("".join(["id_", "1"])))
+
+        assert sockets[0].filter_rows[0][1] is sockets[1].filter_rows[0][1]
+
     def test_it_matches_parent_id(self, factories, filter_matches):
         parent_ann = factories.Annotation()
         other_ann = factories.Annotation()
@@ -192,24 +270,46 @@ class TestFilterHandler:
         assert not filter_matches(filter_, ann)
 
     @pytest.mark.skip(reason="For dev purposes only")
-    def test_speed(self, factories, db_session):  # pragma: no cover
-        # I think the max number connected at once is 4096
-        sockets = [FakeSocket() for _ in range(4096)]
-
+    @pytest.mark.parametrize("connections", (10_000, 50_000, 100_000))
+    @pytest.mark.parametrize("shared_uri", (True, False))
+    def test_speed(
+        self, factories, db_session, connections, shared_uri
+    ):  # pragma: no cover
+        sockets = [FakeSocket() for _ in range(connections)]
+
+        tracemalloc.start()
         for socket in sockets:
-            SocketFilter.set_filter(socket, self.get_randomized_filter())
+            SocketFilter.set_filter(socket, self.get_randomized_filter(shared_uri))
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
 
         ann = factories.Annotation(target_uri="https://example.org")
 
         start = datetime.utcnow()
         # This returns a generator, we need to force it to produce answers
-        tuple(SocketFilter.matching(sockets, ann, db_session))
+        tuple(SocketFilter.matching(ann, db_session))
 
         diff = datetime.utcnow() - start
         ms = diff.seconds * 1000 + diff.microseconds / 1000
-        print(ms, "ms")
+        print(
+            f"{connections} connections (shared_uri={shared_uri}): {ms} ms, "
+            f"{memory / connections:.0f} bytes/connection"
+        )
+
+    @staticmethod
+    def get_id_filter(id_):
+        return {
+            "match_policy": "include_any",
+            "actions": {},
+            "clauses": [{"field": "/id", "operator": "equals", "value": id_}],
+        }
+
+    def get_randomized_filter(self, shared_uri):  # pragma: no cover
+        # In production most sockets are on pages nobody else is looking at
+        uris = ["https://example.org" + str(random())]
+        if shared_uri:
+            uris.append("https://example.com")
 
-    def get_randomized_filter(self):  # pragma: no cover
         return {
             "match_policy": "include_any",
             "actions": {},
@@ -230,10 +330,7 @@ class TestFilterHandler:
                 {
                     "field": "/uri",
                     "operator": "one_of",
-                    "value": [
-                        "https://example.com",
-                        "https://example.org" + str(random()),
-                    ],
+                    "value": uris,
                 },
                 {
                     "field": "/group",
@@ -247,8 +344,8 @@ class TestFilterHandler:
         }
 
     @pytest.fixture
-    def storage(self, patch):
-        return patch("h.streamer.filter.storage")
+    def uri_cache(self, patch):
+        return patch("h.streamer.filter.SocketFilter.uri_cache")
 
     @pytest.fixture
     def annotation(self, factories):
@@ -260,6 +357,20 @@ class TestFilterHandler:
             socket = FakeSocket()
             SocketFilter.set_filter(socket, filter_)
 
-            return bool(tuple(SocketFilter.matching([socket], annotation, db_session)))
+            try:
+                return socket in tuple(SocketFilter.matching(annotation, db_session))
+            finally:
+                SocketFilter.remove_filter(socket)
 
         return filter_matches
+
+    @pytest.fixture(autouse=True)
+    def with_empty_index(self):
+        # The index is shared between all filters and can couple different
+        # tests together
+        SocketFilter.index.clear()
+
+    @pytest.fixture(autouse=True)
+    def with_empty_uri_cache(self):
+        # As is the cache of equivalent URIs
+        SocketFilter.uri_cache.clear()
@@ -5,7 +5,7 @@ from pyramid import security
 from h.security import Identity
 from h.streamer.app import create_app
 from h.streamer.contexts import request_context
-from h.streamer.messages import handle_annotation_event
+from h.streamer.messages import handle_annotation_events
 from h.streamer.websocket import WebSocket
 from tests.common.fixtures.elasticsearch import ELASTICSEARCH_INDEX, ELASTICSEARCH_URL
 
@@ -21,19 +21,18 @@ class TestHandleAnnotationEventSpeed:  # pragma: no cover
     def test_speed(  # pylint: disable=too-many-arguments
         self, db_session, pyramid_request, socket, message, action, reps
     ):
-        sockets = list(socket for _ in range(reps))
         message["action"] = action
 
         start = datetime.utcnow()
-        handle_annotation_event(
-            message=message,
-            sockets=sockets,
+        handle_annotation_events(
+            messages_=[message],
+            _sockets=None,
             request=pyramid_request,
             session=db_session,
         )
         diff = datetime.utcnow() - start
 
-        assert socket.send_json.count == reps
+        assert socket.send_prepared.count == reps
 
         millis = diff.seconds * 1000 + diff.microseconds / 1000
         print(
@@ -71,11 +70,13 @@ class TestHandleAnnotationEventSpeed:  # pragma: no cover
         return create_app(None, **settings).registry
 
     @pytest.fixture(autouse=True)
-    def SocketFilter(self, patch):
+    def SocketFilter(self, patch, socket, reps):
         # We aren't interested in the speed of the socket filter, as that has
         # it's own speed tests
         SocketFilter = patch("h.streamer.messages.SocketFilter")
-        SocketFilter.matching.side_effect = lambda sockets, annotation: iter(sockets)
+        SocketFilter.matching.side_effect = lambda annotation, session, **_: iter(
+            [socket] * reps
+        )
         return SocketFilter
 
     @pytest.mark.usefixtures("registry")
@@ -97,6 +98,6 @@ class TestHandleAnnotationEventSpeed:  # pragma: no cover
             fake_send.count += 1
 
         fake_send.count = 0
-        socket.send_json = fake_send
+        socket.send_prepared = fake_send
 
         return socket
@@ -1,13 +1,15 @@
 from unittest import mock
-from unittest.mock import Mock, sentinel
+from unittest.mock import Mock, create_autospec, sentinel
 
 import pytest
 from gevent.queue import Queue
 from h_matchers import Any
 from pyramid.request import Request
 
-from h.security import Permission
+from h.models import Annotation
+from h.security import Identity
 from h.streamer import messages
+from h.streamer.websocket import PreparedMessage, WebSocket
 
 
 class TestProcessMessages:
@@ -63,19 +65,23 @@ class TestProcessMessages:
         return Queue(maxsize=1)
 
 
-class TestHandleMessage:
-    def test_calls_handler_with_list_of_sockets(self, websocket, registry):
+class TestHandleMessages:
+    def test_calls_handler_with_payloads_and_list_of_sockets(self, websocket, registry):
         handler = Mock(return_value=None)
         session = sentinel.db_session
         message = messages.Message(topic="foo", payload={"foo": "bar"})
+        other_message = messages.Message(topic="foo", payload={"foo": "baz"})
         websocket.instances = [sentinel.socket_1, sentinel.socket_2]
 
-        messages.handle_message(
-            message, registry, session, topic_handlers={"foo": handler}
+        messages.handle_messages(
+            [message, other_message],
+            registry,
+            session,
+            topic_handlers={"foo": handler},
         )
 
         handler.assert_called_once_with(
-            message.payload,
+            [message.payload, other_message.payload],
             websocket.instances,
             Any.object.of_type(Request).with_attrs({"registry": registry}),
             session,
@@ -86,8 +92,8 @@ class TestHandleMessage:
         topic_handlers = {"known": sentinel.handler}
 
         with pytest.raises(RuntimeError):
-            messages.handle_message(
-                message,
+            messages.handle_messages(
+                [message],
                 registry,
                 session=sentinel.db_session,
                 topic_handlers=topic_handlers,
@@ -102,137 +108,226 @@ class TestHandleMessage:
         return patch("h.streamer.websocket.WebSocket")
 
 
-@pytest.mark.usefixtures("annotation_json_service", "nipsa_service")
-class TestHandleAnnotationEvent:
-    def test_it_fetches_the_annotation(
-        self, fetch_annotation, handle_annotation_event, session, message
+@pytest.mark.usefixtures("annotation_json_service", "nipsa_service", "user_service")
+class TestHandleAnnotationEvents:
+    def test_it_fetches_the_annotations(
+        self, storage, handle_annotation_events, session, message
+    ):
+        handle_annotation_events(messages_=[message, message], session=session)
+
+        storage.fetch_ordered_annotations.assert_called_once_with(
+            session, [message["annotation_id"]], query_processor=Any.function()
+        )
+
+    def test_it_eager_loads_related_items(
+        self, storage, handle_annotation_events, db_session
+    ):
+        handle_annotation_events()
+
+        query_processor = storage.fetch_ordered_annotations.call_args[1][
+            "query_processor"
+        ]
+        query = query_processor(db_session.query(Annotation))
+        assert len(query._with_options) == 3  # pylint:disable=protected-access
+
+    def test_it_fetches_the_users(
+        self, handle_annotation_events, annotation, user_service
+    ):
+        handle_annotation_events()
+
+        user_service.fetch_all.assert_called_once_with({annotation.userid})
+
+    def test_it_expands_the_uris(
+        self, SocketFilter, handle_annotation_events, annotation, session
     ):
-        handle_annotation_event(message=message, session=session)
+        handle_annotation_events()
 
-        fetch_annotation.assert_called_once_with(session, message["annotation_id"])
+        SocketFilter.uri_cache.expand_uris.assert_called_once_with(
+            session, {annotation.target_uri}
+        )
 
     def test_it_skips_notification_when_fetch_failed(
-        self, fetch_annotation, handle_annotation_event
+        self, storage, handle_annotation_events, socket
     ):
-        fetch_annotation.return_value = None
+        storage.fetch_ordered_annotations.return_value = []
 
-        result = handle_annotation_event()
+        handle_annotation_events()
 
-        assert result is None
+        socket.send_prepared.assert_not_called()
 
-    def test_it_serializes_the_annotation(
-        self, handle_annotation_event, fetch_annotation, annotation_json_service
+    def test_it_doesnt_fetch_invalid_ids(
+        self, storage, handle_annotation_events, message, socket
     ):
-        handle_annotation_event()
+        bad_message = dict(message, annotation_id="not-a-valid-id")
 
-        annotation_json_service.present.assert_called_once_with(
-            fetch_annotation.return_value
+        handle_annotation_events(messages_=[bad_message, message])
+
+        storage.fetch_ordered_annotations.assert_called_once_with(
+            Any(), [message["annotation_id"]], query_processor=Any.function()
         )
+        socket.send_prepared.assert_called_once()
+
+    def test_it_carries_on_after_an_event_fails(
+        self, handle_annotation_events, message, socket, annotation_json_service
+    ):
+        annotation_json_service.present.side_effect = [
+            RuntimeError("boom!"),
+            {"id": "annotation_id"},
+        ]
+
+        handle_annotation_events(messages_=[message, message])
+
+        socket.send_prepared.assert_called_once()
+
+    def test_it_notifies_for_each_event(
+        self, handle_annotation_events, message, socket
+    ):
+        handle_annotation_events(messages_=[message, message])
+
+        assert socket.send_prepared.call_count == 2
+
+    def test_it_serializes_the_annotation(
+        self, handle_annotation_events, annotation, annotation_json_service
+    ):
+        handle_annotation_events()
+
+        annotation_json_service.present.assert_called_once_with(annotation)
 
     @pytest.mark.parametrize("action", ["create", "update", "delete"])
     def test_notification_format(
-        self, handle_annotation_event, action, message, socket, annotation_json_service
+        self, handle_annotation_events, action, message, socket, annotation_json_service
     ):
         message["action"] = action
 
-        handle_annotation_event(sockets=[socket])
+        handle_annotation_events(sockets=[socket])
 
         if action == "delete":
             expected_payload = {"id": message["annotation_id"]}
         else:
             expected_payload = annotation_json_service.present.return_value
 
-        socket.send_json.assert_called_once_with(
-            {
-                "payload": [expected_payload],
-                "type": "annotation-notification",
-                "options": {"action": action},
-            }
+        socket.send_prepared.assert_called_once_with(
+            Any.instance_of(PreparedMessage).with_attrs(
+                {
+                    "payload": {
+                        "payload": [expected_payload],
+                        "type": "annotation-notification",
+                        "options": {"action": action},
+                    }
+                }
+            )
         )
 
+    def test_it_sends_the_same_message_to_every_socket(
+        self, handle_annotation_events, factories
+    ):
+        sockets = [self._make_socket(factories) for _ in range(3)]
+
+        handle_annotation_events(sockets=sockets)
+
+        message = sockets[0].send_prepared.call_args[0][0]
+        for socket in sockets:
+            socket.send_prepared.assert_called_once_with(message)
+
     def test_it_filters_the_sockets(
         self,
-        handle_annotation_event,
+        handle_annotation_events,
         SocketFilter,
-        fetch_annotation,
+        annotation,
         socket,
         db_session,
     ):
-        handle_annotation_event(sockets=[socket], session=db_session)
+        handle_annotation_events(sockets=[socket], session=db_session)
 
         SocketFilter.matching.assert_called_once_with(
-            [socket], fetch_annotation.return_value, db_session
+            annotation,
+            db_session,
+            expanded_uris=[sentinel.expanded_uri],
         )
 
-    def test_no_send_for_sender_socket(self, handle_annotation_event, socket, message):
+    def test_no_send_for_sender_socket(self, handle_annotation_events, socket, message):
         message["src_client_id"] = socket.client_id
 
-        handle_annotation_event(message=message, sockets=[socket])
+        handle_annotation_events(messages_=[message], sockets=[socket])
 
-        socket.send_json.assert_not_called()
+        socket.send_prepared.assert_not_called()
 
-    def test_no_send_if_filter_does_not_match(
-        self, handle_annotation_event, socket, SocketFilter
-    ):
-        SocketFilter.matching.side_effect = None
-        SocketFilter.matching.return_value = iter(())
-        handle_annotation_event(sockets=[socket])
+    def test_no_send_if_filter_does_not_match(self, handle_annotation_events, socket):
+        handle_annotation_events(sockets=[])
 
-        socket.send_json.assert_not_called()
+        socket.send_prepared.assert_not_called()
 
     @pytest.mark.parametrize("user_is_nipsaed", (True, False))
     def test_nipsaed_content_visibility(
         self,
-        handle_annotation_event,
+        handle_annotation_events,
         user_is_nipsaed,
         socket,
         nipsa_service,
-        fetch_annotation,
+        annotation,
     ):
         """Should return None if the annotation is from a NIPSA'd user."""
         nipsa_service.is_flagged.return_value = True
 
-        fetch_annotation.return_value.userid = (
+        annotation.userid = (
             socket.identity.user.userid if user_is_nipsaed else "other_user"
         )
-        handle_annotation_event(sockets=[socket])
+        handle_annotation_events(sockets=[socket])
 
-        assert bool(socket.send_json.call_count) == user_is_nipsaed
+        assert bool(socket.send_prepared.call_count) == user_is_nipsaed
 
     @pytest.mark.parametrize("can_see", (True, False))
     def test_visibility_is_based_on_identity(
         self,
-        handle_annotation_event,
+        handle_annotation_events,
         can_see,
-        AnnotationContext,
-        identity_permits,
-        fetch_annotation,
+        ReadRealtimeUpdates,
+        annotation,
         socket,
     ):
-        identity_permits.return_value = can_see
+        ReadRealtimeUpdates.return_value.permits.return_value = can_see
 
-        handle_annotation_event(sockets=[socket])
+        handle_annotation_events(sockets=[socket])
 
-        AnnotationContext.assert_called_once_with(fetch_annotation.return_value)
-        identity_permits.assert_called_once_with(
-            socket.identity,
-            AnnotationContext.return_value,
-            Permission.Annotation.READ_REALTIME_UPDATES,
+        ReadRealtimeUpdates.assert_called_once_with(annotation)
+        ReadRealtimeUpdates.return_value.permits.assert_called_once_with(
+            socket.identity
         )
+        assert bool(socket.send_prepared.call_count) == can_see
 
-        assert bool(socket.send_json.call_count) == can_see
+    @staticmethod
+    def _make_socket(factories):
+        socket = create_autospec(WebSocket, instance=True)
+        socket.identity = Identity.from_models(user=factories.User())
+        return socket
 
     @pytest.fixture
-    def handle_annotation_event(self, message, socket, pyramid_request, session):
-        def handle_annotation_event(
-            message=message, sockets=None, request=pyramid_request, session=session
+    def handle_annotation_events(
+        self, message, socket, pyramid_request, session, SocketFilter
+    ):
+        def handle_annotation_events(
+            messages_=None, sockets=None, request=pyramid_request, session=session
         ):
+            if messages_ is None:
+                messages_ = [message]
             if sockets is None:
                 sockets = [socket]
 
-            return messages.handle_annotation_event(message, sockets, request, session)
+            # The sockets we pass are the ones the filter says are interested
+            SocketFilter.matching.side_effect = (
+                lambda annotation, db_session, expanded_uris: iter(sockets)
+            )
 
-        return handle_annotation_event
+            return messages.handle_annotation_events(
+                messages_, sockets, request, session
+            )
+
+        return handle_annotation_events
+
+    @pytest.fixture
+    def annotation_json_service(self, annotation_json_service):
+        annotation_json_service.present.return_value = {"id": "annotation_id"}
+        return annotation_json_service
 
     @pytest.fixture
     def pyramid_request(self, pyramid_request):
@@ -248,53 +343,91 @@ class TestHandleAnnotationEvent:
         return sentinel.db_session
 
     @pytest.fixture
-    def message(self, fetch_annotation):
+    def message(self, annotation):
         return {
-            # This is a bit backward from how things really work, but it
-            # ensures the id we look up gives us an annotation that matches
-            "annotation_id": fetch_annotation.return_value.id,
+            "annotation_id": annotation.id,
             "action": "update",
             "src_client_id": "source_socket",
         }
 
     @pytest.fixture
-    def AnnotationContext(self, patch):
-        return patch("h.streamer.messages.AnnotationContext")
+    def annotation(self, factories):
+        return factories.Annotation()
 
     @pytest.fixture(autouse=True)
-    def fetch_annotation(self, factories, patch):
-        fetch = patch("h.streamer.messages.storage.fetch_annotation")
-        fetch.return_value = factories.Annotation()
-        return fetch
+    def storage(self, patch, annotation):
+        storage = patch("h.streamer.messages.storage")
+        storage.fetch_ordered_annotations.return_value = [annotation]
+        return storage
 
     @pytest.fixture(autouse=True)
-    def identity_permits(self, patch):
-        identity_permits = patch("h.streamer.messages.identity_permits")
-        identity_permits.return_value = True
-        return identity_permits
+    def ReadRealtimeUpdates(self, patch):
+        ReadRealtimeUpdates = patch("h.streamer.messages.ReadRealtimeUpdates")
+        ReadRealtimeUpdates.return_value.permits.return_value = True
+        return ReadRealtimeUpdates
 
     @pytest.fixture(autouse=True)
-    def SocketFilter(self, patch):
+    def SocketFilter(self, patch, annotation):
         SocketFilter = patch("h.streamer.messages.SocketFilter")
-        SocketFilter.matching.side_effect = (
-            lambda sockets, annotation, db_session: iter(sockets)
-        )
+        SocketFilter.uri_cache.expand_uris.return_value = {
+            annotation.target_uri: [sentinel.expanded_uri]
+        }
         return SocketFilter
 
 
+class TestHandleDocumentEvents:
+    def test_it_invalidates_the_uri_cache(self, SocketFilter):
+        messages.handle_document_events(
+            [{"uris": ["httpx://example.com/a"]}, {"uris": ["httpx://example.com/b"]}],
+            None,
+            None,
+            None,
+        )
+
+        SocketFilter.uri_cache.invalidate.assert_called_once_with(
+            {"httpx://example.com/a", "httpx://example.com/b"}
+        )
+
+    @pytest.fixture(autouse=True)
+    def SocketFilter(self, patch):
+        return patch("h.streamer.messages.SocketFilter")
+
+
+class TestHandleUserEvents:
+    def test_it_handles_each_event(self, socket, message):
+        message["userid"] = socket.identity.user.userid
+
+        messages.handle_user_events([message, message], [socket], None, None)
+
+        assert socket.send_prepared.call_count == 2
+
+    @pytest.fixture
+    def message(self):
+        return {
+            "type": "group-join",
+            "userid": "amy",
+            "group": "groupid",
+            "session_model": {"session": "model"},
+        }
+
+
 class TestHandleUserEvent:
     def test_sends_session_change_when_joining_or_leaving_group(self, socket, message):
         message["userid"] = socket.identity.user.userid
 
         messages.handle_user_event(message, [socket, socket], None, None)
 
-        reply = {
-            "type": "session-change",
-            "action": "group-join",
-            "model": message["session_model"],
-        }
+        reply = Any.instance_of(PreparedMessage).with_attrs(
+            {
+                "payload": {
+                    "type": "session-change",
+                    "action": "group-join",
+                    "model": message["session_model"],
+                }
+            }
+        )
 
-        assert socket.send_json.call_args_list == [
+        assert socket.send_prepared.call_args_list == [
             mock.call(reply),
             mock.call(reply),
         ]
@@ -302,11 +435,11 @@ class TestHandleUserEvent:
     def test_no_send_when_socket_is_not_event_users(self, socket, message):
         """Don't send session-change events if the event user is not the socket user."""
         message["userid"] = "amy"
-        socket.identity.user.username = "bob"
+        socket.identity.user.userid = "bob"
 
         messages.handle_user_event(message, [socket], None, None)
 
-        socket.send_json.assert_not_called()
+        socket.send_prepared.assert_not_called()
 
     @pytest.fixture
     def message(self):
@@ -314,5 +447,5 @@ class TestHandleUserEvent:
             "type": "group-join",
             "userid": "amy",
             "group": "groupid",
-            "session_model": sentinel.session_model,
+            "session_model": {"session": "model"},
         }
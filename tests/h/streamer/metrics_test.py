@@ -1,13 +1,15 @@
+from collections import Counter
 from unittest.mock import create_autospec
 
 import pytest
 from gevent.pool import Pool
-from gevent.queue import Queue
 from h_matchers import Any
 
 from h.security import Identity
 from h.streamer.metrics import websocket_metrics
+from h.streamer.uri_cache import URICacheStats
 from h.streamer.websocket import WebSocket
+from h.streamer.work_queue import WorkQueue, WorkQueueStats
 
 
 class TestWebsocketMetrics:
@@ -24,6 +26,26 @@ class TestWebsocketMetrics:
             ]
         )
 
+    def test_it_records_send_queue_metrics(self, generate_metrics, sockets, WebSocket):
+        for socket, depth in zip(sockets, (3, 0, 5)):
+            socket.send_queue_depth = depth
+        WebSocket.slow_consumer_stats.update(
+            {"dropped": 4, "coalesced": 2, "disconnected": 1}
+        )
+
+        metrics = generate_metrics()
+
+        assert list(metrics) == Any.list.containing(
+            [
+                ("Custom/WebSocket/SendQueue/MaxDepth", 5),
+                ("Custom/WebSocket/SendQueue/TotalDepth", 8),
+                ("Custom/WebSocket/SendQueue/Dropped", 4),
+                ("Custom/WebSocket/SendQueue/Coalesced", 2),
+                ("Custom/WebSocket/SendQueue/Disconnected", 1),
+            ]
+        )
+        assert not WebSocket.slow_consumer_stats
+
     @pytest.mark.parametrize("size", (1, 5))
     def test_it_records_work_queue_metric(self, generate_metrics, queue, size):
         queue.qsize.return_value = size
@@ -34,6 +56,41 @@ class TestWebsocketMetrics:
             [("Custom/WebSocket/WorkQueueSize", size)]
         )
 
+    def test_it_records_work_queue_backpressure_metrics(self, generate_metrics, queue):
+        queue.max_shard_size.return_value = 3
+        queue.shard_count = 4
+        queue.take_stats.return_value = WorkQueueStats(
+            processed=10, dropped=2, mean_wait=0.5, max_wait=1.5
+        )
+
+        metrics = generate_metrics()
+
+        assert list(metrics) == Any.list.containing(
+            [
+                ("Custom/WebSocket/WorkQueue/MaxShardSize", 3),
+                ("Custom/WebSocket/WorkQueue/Consumers", 4),
+                ("Custom/WebSocket/WorkQueue/Processed", 10),
+                ("Custom/WebSocket/WorkQueue/Dropped", 2),
+                ("Custom/WebSocket/WorkQueue/WaitTime/Mean", 500),
+                ("Custom/WebSocket/WorkQueue/WaitTime/Max", 1500),
+            ]
+        )
+
+    def test_it_records_uri_cache_metrics(self, generate_metrics, SocketFilter):
+        SocketFilter.uri_cache.take_stats.return_value = URICacheStats(
+            hits=7, misses=3, size=5
+        )
+
+        metrics = generate_metrics()
+
+        assert list(metrics) == Any.list.containing(
+            [
+                ("Custom/WebSocket/URICache/Hits", 7),
+                ("Custom/WebSocket/URICache/Misses", 3),
+                ("Custom/WebSocket/URICache/Size", 5),
+            ]
+        )
+
     def test_it_records_alive_metric(self, generate_metrics):
         metrics = generate_metrics()
 
@@ -53,19 +110,32 @@ class TestWebsocketMetrics:
             ]
         )
 
+    @pytest.fixture(autouse=True)
+    def SocketFilter(self, patch):
+        SocketFilter = patch("h.streamer.metrics.SocketFilter")
+        SocketFilter.uri_cache.take_stats.return_value = URICacheStats(
+            hits=0, misses=0, size=0
+        )
+        return SocketFilter
+
     @pytest.fixture
     def generate_metrics(self, queue):
         return lambda: websocket_metrics(queue)
 
     @pytest.fixture
     def queue(self):
-        return create_autospec(Queue, instance=True, spec_set=True)
+        queue = create_autospec(WorkQueue, instance=True)
+        queue.take_stats.return_value = WorkQueueStats(
+            processed=0, dropped=0, mean_wait=0, max_wait=0
+        )
+        return queue
 
     @pytest.fixture
     def sockets(self):
         sockets = [create_autospec(WebSocket, instance=True) for _ in range(3)]
         for socket in sockets:
             socket.identity = None
+            socket.send_queue_depth = 0
 
         return sockets
 
@@ -73,6 +143,7 @@ class TestWebsocketMetrics:
     def WebSocket(self, patch, sockets):
         WebSocket = patch("h.streamer.metrics.WebSocket")
         WebSocket.instances = sockets
+        WebSocket.slow_consumer_stats = Counter()
 
         return WebSocket
 
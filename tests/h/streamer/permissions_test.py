@@ -0,0 +1,77 @@
+import pytest
+
+from h.models.group import ReadableBy
+from h.security import Identity, Permission, identity_permits
+from h.security.identity import LongLivedAuthClient, LongLivedUser
+from h.streamer.permissions import ReadRealtimeUpdates
+from h.traversal import AnnotationContext
+
+
+class TestReadRealtimeUpdates:
+    @pytest.mark.parametrize("shared", (True, False))
+    @pytest.mark.parametrize(
+        "readable_by", (ReadableBy.world, ReadableBy.members, None)
+    )
+    @pytest.mark.parametrize(
+        "identity_name",
+        (
+            "anonymous",
+            "author",
+            "member",
+            "non_member",
+            "matching_client",
+            "other_client",
+        ),
+    )
+    def test_it_agrees_with_the_permission_map(
+        self, factories, identities, shared, readable_by, identity_name
+    ):
+        group = factories.Group.build(id=1, authority="example.com")
+        group.readable_by = readable_by
+        annotation = factories.Annotation.build(
+            userid="acct:author@example.com", shared=shared, group=group
+        )
+        identity = identities[identity_name]
+
+        result = ReadRealtimeUpdates(annotation).permits(identity)
+
+        assert result == identity_permits(
+            identity,
+            AnnotationContext(annotation),
+            Permission.Annotation.READ_REALTIME_UPDATES,
+        )
+
+    @pytest.mark.parametrize("identity_name", ("author", "matching_client"))
+    def test_it_denies_shared_annotations_without_a_group(
+        self, factories, identities, identity_name
+    ):
+        annotation = factories.Annotation.build(
+            userid="acct:author@example.com", shared=True
+        )
+        annotation.group = None
+
+        assert not ReadRealtimeUpdates(annotation).permits(identities[identity_name])
+
+    @pytest.fixture
+    def identities(self):
+        def user(username, group_ids):
+            return LongLivedUser(
+                id=username,
+                userid=f"acct:{username}@example.com",
+                authority="example.com",
+                group_ids=frozenset(group_ids),
+                staff=False,
+                admin=False,
+            )
+
+        def auth_client(authority):
+            return LongLivedAuthClient(id=authority, authority=authority)
+
+        return {
+            "anonymous": None,
+            "author": Identity(user=user("author", [2])),
+            "member": Identity(user=user("member", [1, 2])),
+            "non_member": Identity(user=user("non_member", [2])),
+            "matching_client": Identity(auth_client=auth_client("example.com")),
+            "other_client": Identity(auth_client=auth_client("example.net")),
+        }
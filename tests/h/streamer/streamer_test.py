@@ -3,17 +3,40 @@ from unittest import mock
 import pytest
 
 from h.streamer import messages, streamer, websocket
-from h.streamer.streamer import TOPIC_HANDLERS, UnknownMessageType
+from h.streamer.streamer import TOPIC_HANDLERS, UnknownMessageType, shard_key
+
+
+class TestShardKey:
+    def test_websocket_messages_are_keyed_by_socket(self):
+        message = websocket.Message(socket=mock.sentinel.socket, payload={})
+
+        assert shard_key(message) == mock.sentinel.socket
+
+    @pytest.mark.parametrize(
+        "payload,key",
+        (
+            ({"annotation_id": "ANNOTATION_ID", "action": "create"}, "ANNOTATION_ID"),
+            ({"userid": "acct:user@example.com", "type": "x"}, "acct:user@example.com"),
+            ({}, None),
+        ),
+    )
+    def test_realtime_messages_are_keyed_by_subject(self, payload, key):
+        message = messages.Message(topic="topic", payload=payload)
+
+        assert shard_key(message) == key
+
+    def test_other_messages_have_no_key(self):
+        assert shard_key("not a message") is None
 
 
 class TestProcessWorkQueue:
-    def test_it_sends_realtime_messages_to_messages_handle_message(
+    def test_it_sends_realtime_messages_to_messages_handle_messages(
         self, process_work_queue, message, session, registry
     ):
-        process_work_queue(queue=[message])
+        process_work_queue(queue=[[message, message]])
 
-        messages.handle_message.assert_called_once_with(  # pylint:disable=no-member
-            message,
+        messages.handle_messages.assert_called_once_with(  # pylint:disable=no-member
+            [message, message],
             registry,
             session,
             topic_handlers=TOPIC_HANDLERS,
@@ -22,35 +45,52 @@ class TestProcessWorkQueue:
     def test_it_sends_websocket_messages_to_websocket_handle_message(
         self, process_work_queue, ws_message, session
     ):
-        process_work_queue(queue=[ws_message])
+        process_work_queue(queue=[[ws_message]])
 
         websocket.handle_message.assert_called_once_with(  # pylint:disable=no-member
             ws_message, session
         )
 
+    def test_it_splits_batches_into_runs_of_messages(
+        self, process_work_queue, message, ws_message, session, registry
+    ):
+        other_message = messages.Message(topic="other", payload="bar")
+
+        process_work_queue(
+            queue=[[message, message, other_message, ws_message, ws_message, message]]
+        )
+
+        assert messages.handle_messages.call_args_list == [  # pylint:disable=no-member
+            mock.call([message, message], registry, session, TOPIC_HANDLERS),
+            mock.call([other_message], registry, session, TOPIC_HANDLERS),
+            mock.call([message], registry, session, TOPIC_HANDLERS),
+        ]
+        assert websocket.handle_message.call_args_list == [  # pylint:disable=no-member
+            mock.call(ws_message, session),
+            mock.call(ws_message, session),
+        ]
+
     def test_it_raises_UnknownMessageType_for_strange_messages(
         self, process_work_queue
     ):
         # Technically we don't actually raise in practice, as the transaction
         # wrapper will catch it
         with pytest.raises(UnknownMessageType):
-            process_work_queue(queue=["not a message"])
+            process_work_queue(queue=[["not a message"]])
 
-    def test_it_wraps_each_message_in_a_transaction(
-        self, process_work_queue, message, db
+    def test_it_wraps_each_run_of_messages_in_a_transaction(
+        self, process_work_queue, message, ws_message, db
     ):
-        messages = [message] * 3
-
-        process_work_queue(queue=messages)
+        process_work_queue(queue=[[message] * 3, [ws_message, message]])
 
         context_manager = db.read_only_transaction.return_value
-        assert context_manager.__enter__.call_count == len(messages)
-        assert context_manager.__exit__.call_count == len(messages)
+        assert context_manager.__enter__.call_count == 3
+        assert context_manager.__exit__.call_count == 3
 
     @pytest.fixture
     def process_work_queue(self, registry, message):
         def process_work_queue(queue=None):
-            return streamer.process_work_queue(registry, queue or [message])
+            return streamer.process_work_queue(registry, queue or [[message]])
 
         return process_work_queue
 
@@ -81,5 +121,5 @@ class TestProcessWorkQueue:
         return patch("h.streamer.websocket.handle_message")
 
     @pytest.fixture(autouse=True)
-    def messages_handle_message(self, patch):
-        return patch("h.streamer.messages.handle_message")
+    def messages_handle_messages(self, patch):
+        return patch("h.streamer.messages.handle_messages")
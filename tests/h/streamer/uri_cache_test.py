@@ -0,0 +1,98 @@
+import pytest
+
+from h.streamer.uri_cache import URICache, URICacheStats
+
+
+class TestURICache:
+    def test_it_expands_uris(self, cache, storage, db_session):
+        expanded = cache.expand_uris(db_session, ["http://example.com/a"])
+
+        storage.expand_uris.assert_called_once_with(
+            db_session, ["http://example.com/a"], normalized=True
+        )
+        assert expanded == {"http://example.com/a": ["httpx://example.com/a"]}
+
+    def test_it_only_looks_up_uris_which_arent_cached(self, cache, storage, db_session):
+        cache.expand_uris(db_session, ["http://example.com/a"])
+
+        expanded = cache.expand_uris(
+            db_session, ["http://example.com/a", "http://example.com/b"]
+        )
+
+        storage.expand_uris.assert_called_with(
+            db_session, ["http://example.com/b"], normalized=True
+        )
+        assert expanded == {
+            "http://example.com/a": ["httpx://example.com/a"],
+            "http://example.com/b": ["httpx://example.com/b"],
+        }
+
+    def test_entries_expire(self, cache, storage, db_session, monotonic):
+        cache.expand_uris(db_session, ["http://example.com/a"])
+
+        monotonic.return_value = 61
+        cache.expand_uris(db_session, ["http://example.com/a"])
+
+        assert storage.expand_uris.call_count == 2
+
+    def test_it_evicts_the_least_recently_used_uris(self, storage, db_session):
+        cache = URICache(maxsize=2, ttl=60)
+        cache.expand_uris(db_session, ["http://example.com/a"])
+        cache.expand_uris(db_session, ["http://example.com/b"])
+        cache.expand_uris(db_session, ["http://example.com/a"])
+
+        cache.expand_uris(db_session, ["http://example.com/c"])
+        storage.expand_uris.reset_mock()
+        cache.expand_uris(db_session, ["http://example.com/a", "http://example.com/b"])
+
+        assert len(cache) == 2
+        storage.expand_uris.assert_called_once_with(
+            db_session, ["http://example.com/b"], normalized=True
+        )
+
+    def test_invalidate(self, cache, storage, db_session):
+        storage.expand_uris.side_effect = lambda _session, uris, normalized: {
+            uri: ["httpx://example.com/a", "httpx://example.com/b"] for uri in uris
+        }
+        cache.expand_uris(
+            db_session, ["http://example.com/a", "http://example.com/other"]
+        )
+        storage.expand_uris.side_effect = None
+        storage.expand_uris.return_value = {
+            "http://example.com/unrelated": ["httpx://example.com/unrelated"]
+        }
+        cache.expand_uris(db_session, ["http://example.com/unrelated"])
+
+        cache.invalidate({"httpx://example.com/b"})
+
+        assert len(cache) == 1
+
+    def test_take_stats(self, cache, db_session):
+        cache.expand_uris(db_session, ["http://example.com/a"])
+        cache.expand_uris(db_session, ["http://example.com/a", "http://example.com/b"])
+
+        assert cache.take_stats() == URICacheStats(hits=1, misses=2, size=2)
+        assert cache.take_stats() == URICacheStats(hits=0, misses=0, size=2)
+
+    def test_clear(self, cache, db_session):
+        cache.expand_uris(db_session, ["http://example.com/a"])
+
+        cache.clear()
+
+        assert not len(cache)  # pylint:disable=use-implicit-booleaness-not-len
+
+    @pytest.fixture
+    def cache(self):
+        return URICache(maxsize=10, ttl=60)
+
+    @pytest.fixture(autouse=True)
+    def storage(self, patch):
+        storage = patch("h.streamer.uri_cache.storage")
+        storage.expand_uris.side_effect = lambda _session, uris, normalized: {
+            uri: [uri.replace("http://", "httpx://")] for uri in uris
+        }
+        return storage
+
+    @pytest.fixture(autouse=True)
+    def monotonic(self, patch):
+        return patch("h.util.cache.monotonic", return_value=0)
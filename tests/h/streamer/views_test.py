@@ -19,8 +19,26 @@ class TestWebsocketView:
             pyramid_request.environ["h.ws.streamer_work_queue"] == streamer.WORK_QUEUE
         )
 
+    def test_it_adds_send_queue_settings_to_environ(self, pyramid_request):
+        views.websocket_view(pyramid_request)
+
+        assert pyramid_request.environ["h.ws.send_queue_size"] == 10
+        assert pyramid_request.environ["h.ws.slow_consumer_policy"] == "coalesce"
+
+    def test_it_adds_the_coalesce_window_to_environ(self, pyramid_request):
+        views.websocket_view(pyramid_request)
+
+        assert pyramid_request.environ["h.ws.coalesce_window"] == 0.02
+
     @pytest.fixture
     def pyramid_request(self, pyramid_request):
         pyramid_request.get_response = lambda _: None
+        pyramid_request.registry.settings.update(
+            {
+                "h.streamer.send_queue_size": 10,
+                "h.streamer.slow_consumer_policy": "coalesce",
+                "h.streamer.coalesce_window_ms": 20,
+            }
+        )
 
         return pyramid_request
@@ -0,0 +1,84 @@
+from datetime import datetime
+from unittest import mock
+
+import gevent
+import pytest
+
+from h.security import Identity
+from h.streamer.websocket import PreparedMessage, WebSocket
+
+
+@pytest.mark.skip("Only of use during development")
+class TestSendNotificationSpeed:  # pragma: no cover
+    @pytest.mark.parametrize("coalesce_window", (0, 0.005, 0.05))
+    @pytest.mark.parametrize("reps", (16, 256, 4096))
+    def test_speed(self, make_client, coalesce_window, reps):
+        client = make_client(coalesce_window)
+
+        start = datetime.utcnow()
+        for i in range(reps):
+            client.send_prepared(self._notification(i))
+            # Spread the events out like a burst of activity arriving from
+            # the streamer's consumers
+            if not i % 16:
+                gevent.sleep(0.001)
+        while self._events_sent(client) < reps:
+            gevent.sleep(0.001)
+        diff = datetime.utcnow() - start
+
+        sends = client.send.call_count
+        sent_bytes = sum(len(call[0][0]) for call in client.sock.sendall.call_args_list)
+        millis = diff.seconds * 1000 + diff.microseconds / 1000
+        print(
+            f"window {coalesce_window}s x {reps}: {sends} sends, "
+            f"{sent_bytes / reps} bytes/event, {sends / millis * 1000} sends/sec, "
+            f"{reps / millis * 1000} events/sec"
+        )
+
+    @staticmethod
+    def _events_sent(client):
+        return sum(
+            len(call[0][0].payload["payload"]) for call in client.send.call_args_list
+        )
+
+    @staticmethod
+    def _notification(i):
+        return PreparedMessage(
+            {
+                "type": "annotation-notification",
+                "options": {"action": "create"},
+                "payload": [
+                    {
+                        "id": f"annotation_{i}",
+                        "uri": "http://example.com/",
+                        "text": "Some annotation text " * 5,
+                        "tags": ["tag_1", "tag_2"],
+                        "group": "__world__",
+                        "user": "acct:user@example.com",
+                    }
+                ],
+            }
+        )
+
+    @pytest.fixture
+    def make_client(self):
+        clients = []
+
+        def make_client(coalesce_window):
+            environ = {
+                "h.ws.identity": Identity(),
+                "h.ws.registry": mock.sentinel.registry,
+                "h.ws.streamer_work_queue": mock.sentinel.queue,
+                "h.ws.send_queue_size": 100000,
+                "h.ws.coalesce_window": coalesce_window,
+            }
+            client = WebSocket(mock.Mock(spec_set=["sendall"]), environ=environ)
+            # Count the sends while still framing and writing each message
+            client.send = mock.Mock(wraps=client.send)
+            clients.append(client)
+            return client
+
+        yield make_client
+
+        for client in clients:
+            client.closed(1000)
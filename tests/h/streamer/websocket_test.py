@@ -1,13 +1,20 @@
+import gc
+import json
+import tracemalloc
 from collections import namedtuple
 from unittest import mock
 
+import gevent
+import gevent.event
 import pytest
 from gevent.queue import Queue
 from h_matchers import Any
 from jsonschema import ValidationError
+from ws4py.messaging import TextMessage
 
 from h.security import Identity
 from h.streamer import websocket
+from h.util.cache import LRUCache
 
 FakeMessage = namedtuple("FakeMessage", ["data"])
 
@@ -79,6 +86,11 @@ class TestWebSocket:
         # A second closure (however unusual) should not raise
         client1.closed(1000)
 
+    def test_removes_filter_when_closed(self, client, SocketFilter):
+        client.closed(1000)
+
+        SocketFilter.remove_filter.assert_called_once_with(client)
+
     def test_enqueues_incoming_messages(self, client, queue):
         """Valid messages are pushed onto the queue."""
         message = FakeMessage('{"foo":"bar"}')
@@ -133,6 +145,7 @@ class TestWebSocket:
         payload = {"foo": "bar"}
 
         client.send_json(payload)
+        gevent.sleep(0)
 
         fake_socket_send.assert_called_once_with(client, '{"foo": "bar"}')
 
@@ -142,9 +155,281 @@ class TestWebSocket:
         fake_socket_terminated.return_value = True
 
         client.send_json({"foo": "bar"})
+        gevent.sleep(0)
+
+        assert not fake_socket_send.called
+
+    def test_socket_send_prepared(self, client, fake_socket_send):
+        message = websocket.PreparedMessage({"foo": "bar"})
+
+        client.send_prepared(message)
+        gevent.sleep(0)
+
+        fake_socket_send.assert_called_once_with(client, message)
+
+    def test_socket_send_prepared_skips_when_terminated(
+        self, client, fake_socket_send, fake_socket_terminated
+    ):
+        fake_socket_terminated.return_value = True
+
+        client.send_prepared(websocket.PreparedMessage({"foo": "bar"}))
+        gevent.sleep(0)
 
         assert not fake_socket_send.called
 
+    def test_socket_send_prepared_writes_the_prepared_frame(self, client):
+        message = websocket.PreparedMessage({"foo": "bar"})
+
+        client.send_prepared(message)
+        gevent.sleep(0)
+
+        client.sock.sendall.assert_called_once_with(message.single())
+
+    def test_it_sends_from_its_own_greenlet(self, client, fake_socket_send):
+        unblock = gevent.event.Event()
+        fake_socket_send.side_effect = lambda *_: unblock.wait()
+
+        # Sending doesn't wait for the client, even if it's slow
+        for i in range(3):
+            client.send_json({"n": i})
+
+        assert client.send_queue_depth == 3
+        gevent.sleep(0)
+        unblock.set()
+        gevent.sleep(0)
+
+        assert fake_socket_send.call_args_list == [
+            mock.call(client, json.dumps({"n": i})) for i in range(3)
+        ]
+        assert not client.send_queue_depth
+
+    def test_it_stops_sending_if_the_connection_fails(self, client, fake_socket_send):
+        fake_socket_send.side_effect = OSError
+
+        client.send_json({"n": 1})
+        gevent.sleep(0)
+        client.send_json({"n": 2})
+        gevent.sleep(0)
+
+        fake_socket_send.assert_called_once()
+
+    def test_closing_stops_the_sending_greenlet(self, client, fake_socket_send):
+        client.send_json({"n": 1})
+        gevent.sleep(0)
+
+        client.closed(1000)
+        client.send_json({"n": 2})
+        gevent.sleep(0)
+
+        fake_socket_send.assert_called_once()
+
+    def test_it_drops_the_oldest_messages_from_a_full_queue(
+        self, make_client, fake_socket_send
+    ):
+        client = make_client(send_queue_size=2, slow_consumer_policy="drop_oldest")
+
+        for i in range(3):
+            client.send_json({"n": i})
+        gevent.sleep(0)
+
+        assert fake_socket_send.call_args_list == [
+            mock.call(client, json.dumps({"n": i})) for i in (1, 2)
+        ]
+        assert client.messages_dropped == 1
+        assert websocket.WebSocket.slow_consumer_stats == {"dropped": 1}
+
+    def test_it_coalesces_queued_annotation_notifications(
+        self, make_client, fake_socket_send
+    ):
+        client = make_client(send_queue_size=2, slow_consumer_policy="coalesce")
+
+        for i in range(3):
+            client.send_prepared(self._notification("create", {"id": i}))
+        gevent.sleep(0)
+
+        assert [call[0][1].payload for call in fake_socket_send.call_args_list] == [
+            self._notification("create", {"id": 0}, {"id": 1}, {"id": 2}).payload,
+        ]
+        assert not client.messages_dropped
+        assert websocket.WebSocket.slow_consumer_stats == {"coalesced": 2}
+
+    def test_it_coalesces_on_the_sending_side(self, make_client, fake_socket_send):
+        client = make_client(slow_consumer_policy="coalesce")
+        _combine = mock.create_autospec(
+            websocket._combine, side_effect=lambda run: run[0]
+        )
+
+        notifications = [self._notification("create", {"id": i}) for i in range(2)]
+
+        with mock.patch.object(websocket, "_combine", _combine):
+            for notification in notifications:
+                client.send_prepared(notification)
+
+            # Queuing only appended to a list
+            _combine.assert_not_called()
+            gevent.sleep(0)
+
+        _combine.assert_called_once_with(notifications)
+
+    def test_sockets_share_the_combined_notifications(
+        self, make_client, fake_socket_send
+    ):
+        clients = [make_client(slow_consumer_policy="coalesce") for _ in range(2)]
+        notifications = [self._notification("create", {"id": i}) for i in range(2)]
+
+        for client in clients:
+            for notification in notifications:
+                client.send_prepared(notification)
+        gevent.sleep(0)
+
+        sent = [call[0][1] for call in fake_socket_send.call_args_list]
+        assert len(sent) == 2
+        assert sent[0] is sent[1]
+
+    def test_it_only_keeps_the_latest_combined_notifications(
+        self, make_client, fake_socket_send, monkeypatch
+    ):
+        monkeypatch.setattr(websocket, "_combined", LRUCache(maxsize=1))
+        client = make_client(slow_consumer_policy="coalesce")
+
+        for action in ("create", "update"):
+            for i in range(2):
+                client.send_prepared(self._notification(action, {"id": i}))
+            gevent.sleep(0)
+
+        [(_, (run, combined))] = websocket._combined.items()
+        assert run == (Any.instance_of(websocket.PreparedMessage),) * 2
+        assert combined.payload["options"] == {"action": "update"}
+
+    def test_it_only_coalesces_consecutive_notifications_with_the_same_action(
+        self, make_client, fake_socket_send
+    ):
+        client = make_client(send_queue_size=2, slow_consumer_policy="coalesce")
+
+        client.send_prepared(self._notification("create", {"id": 0}))
+        client.send_prepared(self._notification("delete", {"id": 0}))
+        client.send_prepared(self._notification("create", {"id": 1}))
+        gevent.sleep(0)
+
+        # Nothing could be coalesced, so we fall back to dropping
+        assert [call[0][1].payload for call in fake_socket_send.call_args_list] == [
+            self._notification("delete", {"id": 0}).payload,
+            self._notification("create", {"id": 1}).payload,
+        ]
+        assert client.messages_dropped == 1
+
+    def test_it_disconnects_slow_clients(self, make_client, fake_socket_send):
+        client = make_client(send_queue_size=2, slow_consumer_policy="disconnect")
+        # The client has stopped reading, so sending never finishes
+        fake_socket_send.side_effect = lambda *_: gevent.event.Event().wait()
+        client.send_json({"n": 0})
+        gevent.sleep(0)
+        sender = client._sender
+
+        for i in range(1, 4):
+            client.send_json({"n": i})
+        gevent.sleep(0)
+
+        assert sender.dead
+        fake_socket_send.assert_called_once()
+        assert client.server_terminated
+        assert client.sock is None
+        assert client.messages_dropped == 2
+        assert websocket.WebSocket.slow_consumer_stats == {
+            "dropped": 2,
+            "disconnected": 1,
+        }
+
+    def test_it_doesnt_report_read_errors_after_disconnecting(
+        self, make_client, fake_socket_send
+    ):
+        client = make_client(send_queue_size=1, slow_consumer_policy="disconnect")
+        for i in range(2):
+            client.send_json({"n": i})
+
+        with mock.patch.object(
+            websocket._WebSocket, "unhandled_error"
+        ) as unhandled_error:
+            client.unhandled_error(OSError())
+
+        unhandled_error.assert_not_called()
+
+    def test_it_reports_other_read_errors(self, client):
+        error = OSError()
+
+        with mock.patch.object(
+            websocket._WebSocket, "unhandled_error"
+        ) as unhandled_error:
+            client.unhandled_error(error)
+
+        unhandled_error.assert_called_once_with(error)
+
+    def test_it_coalesces_annotation_notifications_within_the_window(
+        self, make_client, fake_socket_send
+    ):
+        client = make_client(coalesce_window=0.05)
+
+        client.send_prepared(self._notification("create", {"id": 0}))
+        gevent.sleep(0)
+        gevent.spawn_later(
+            0.01, client.send_prepared, self._notification("create", {"id": 1})
+        )
+        gevent.sleep(0.1)
+
+        assert [call[0][1].payload for call in fake_socket_send.call_args_list] == [
+            self._notification("create", {"id": 0}, {"id": 1}).payload
+        ]
+
+    def test_it_doesnt_wait_to_send_other_messages(self, make_client, fake_socket_send):
+        client = make_client(coalesce_window=10)
+
+        client.send_json({"type": "pong"})
+        gevent.sleep(0)
+
+        fake_socket_send.assert_called_once_with(client, json.dumps({"type": "pong"}))
+
+    def test_it_sends_again_after_the_queue_empties(self, client, fake_socket_send):
+        client.send_json({"n": 1})
+        gevent.sleep(0)
+        client.send_json({"n": 2})
+        gevent.sleep(0)
+
+        assert fake_socket_send.call_args_list == [
+            mock.call(client, json.dumps({"n": i})) for i in (1, 2)
+        ]
+        assert not client.send_queue_depth
+
+    def test_it_doesnt_keep_the_environ(self, client):
+        assert client.environ is None
+
+    def test_it_doesnt_coalesce_without_a_window(self, client, fake_socket_send):
+        for i in range(2):
+            client.send_prepared(self._notification("create", {"id": i}))
+        gevent.sleep(0)
+
+        assert [call[0][1].payload for call in fake_socket_send.call_args_list] == [
+            self._notification("create", {"id": i}).payload for i in range(2)
+        ]
+
+    @staticmethod
+    def _notification(action, *annotations):
+        return websocket.PreparedMessage(
+            {
+                "type": "annotation-notification",
+                "options": {"action": action},
+                "payload": list(annotations),
+            }
+        )
+
+    @pytest.fixture(autouse=True)
+    def with_no_combined_notifications(self):
+        yield
+        websocket._combined.clear()
+
+    @pytest.fixture(autouse=True)
+    def with_no_slow_consumer_stats(self):
+        websocket.WebSocket.slow_consumer_stats.clear()
+
     @pytest.fixture(autouse=True)
     def with_no_socket_instances(self):
         # The instances set is automatically populated when web sockets are
@@ -152,9 +437,27 @@ class TestWebSocket:
         websocket.WebSocket.instances.clear()
 
     @pytest.fixture
-    def client(self, fake_environ):
-        sock = mock.Mock(spec_set=["sendall"])
-        return websocket.WebSocket(sock, environ=fake_environ)
+    def make_client(self, fake_environ):
+        clients = []
+
+        def make_client(**settings):
+            sock = mock.Mock(spec_set=["sendall"])
+            environ = dict(
+                fake_environ,
+                **{f"h.ws.{key}": value for key, value in settings.items()},
+            )
+            clients.append(websocket.WebSocket(sock, environ=environ))
+            return clients[-1]
+
+        yield make_client
+
+        # Stop any greenlets sending to the clients
+        for client in clients:
+            client.closed(1000)
+
+    @pytest.fixture
+    def client(self, make_client):
+        return make_client()
 
     @pytest.fixture
     def queue(self):
@@ -168,6 +471,10 @@ class TestWebSocket:
             "h.ws.streamer_work_queue": queue,
         }
 
+    @pytest.fixture
+    def SocketFilter(self, patch):
+        return patch("h.streamer.websocket.SocketFilter")
+
     @pytest.fixture
     def fake_socket_close(self, patch):
         return patch("h.streamer.websocket.WebSocket.close")
@@ -181,6 +488,101 @@ class TestWebSocket:
         return patch("h.streamer.websocket.WebSocket.terminated")
 
 
+class TestWebSocketMemory:
+    # Each streamer process holds tens of thousands of connections, so the
+    # memory each one takes limits how many we can have. An idle connection
+    # for a user in a few groups, with a filter set, takes about 1.2 KiB here.
+    # That doesn't include ws4py's heartbeat, or the server's handler for the
+    # connection.
+    MAX_BYTES_PER_CONNECTION = 2 * 1024
+
+    def test_idle_connections_are_small(self, environs):
+        message = websocket.PreparedMessage({"type": "annotation-notification"})
+        socks = [_FakeSock() for _ in environs]
+        sockets = []
+
+        tracemalloc.start()
+        try:
+            gc.collect()
+            before = tracemalloc.get_traced_memory()[0]
+
+            for sock, environ in zip(socks, environs):
+                socket = websocket.WebSocket(sock, environ=environ)
+                websocket.SocketFilter.set_filter(
+                    socket, self._filter(len(sockets) % 10)
+                )
+                socket.send_prepared(message)
+                sockets.append(socket)
+            gevent.sleep(0)
+
+            gc.collect()
+            used = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+            for socket in sockets:
+                socket.closed(1000)
+
+        assert used / len(sockets) < self.MAX_BYTES_PER_CONNECTION
+
+    @staticmethod
+    def _filter(page):
+        return {
+            "match_policy": "include_any",
+            "clauses": [
+                {
+                    "field": "/uri",
+                    "operator": "one_of",
+                    "value": [f"https://example.com/{page}"],
+                }
+            ],
+            "actions": {},
+        }
+
+    @pytest.fixture
+    def environs(self, factories):
+        groups = factories.Group.build_batch(5)
+
+        return [
+            {
+                "h.ws.identity": Identity.from_models(
+                    user=factories.User.build(groups=groups)
+                ),
+                "h.ws.streamer_work_queue": Queue(),
+            }
+            for _ in range(500)
+        ]
+
+    @pytest.fixture(autouse=True)
+    def with_no_socket_instances(self):
+        websocket.WebSocket.instances.clear()
+
+
+class _FakeSock:
+    def sendall(self, data):
+        pass
+
+
+class TestPreparedMessage:
+    def test_it_serializes_the_payload(self):
+        message = websocket.PreparedMessage({"foo": "bar"})
+
+        assert message.data == b'{"foo": "bar"}'
+        assert message.payload == {"foo": "bar"}
+
+    def test_single_returns_the_same_frame_each_time(self):
+        message = websocket.PreparedMessage({"foo": "bar"})
+
+        frame = message.single()
+
+        assert message.single() is frame
+        assert frame == TextMessage('{"foo": "bar"}').single()
+
+    def test_single_builds_a_new_frame_when_masked(self):
+        message = websocket.PreparedMessage({"foo": "bar"})
+
+        assert message.single(mask=True) != message.single()
+
+
 @pytest.mark.usefixtures("handlers")
 class TestHandleMessage:
     def test_uses_unknown_handler_for_missing_type(self, unknown_handler):
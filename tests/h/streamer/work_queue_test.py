@@ -0,0 +1,127 @@
+import gevent
+import pytest
+from gevent.queue import Full
+
+from h.streamer.work_queue import WorkQueue, WorkQueueStats
+
+
+class TestWorkQueue:
+    def test_it_puts_messages_on_the_shard_for_their_key(self):
+        # Small ints hash to themselves, so these keys pick the shard directly
+        queue = WorkQueue(maxsize=100, key=lambda message: message[0], shards=4)
+        for message in ((1, "a"), (2, "b"), (1, "c"), (1, "d")):
+            queue.put(message)
+
+        consumer = queue.consume(1)
+        assert [next(consumer) for _ in range(3)] == [
+            [(1, "a")],
+            [(1, "c")],
+            [(1, "d")],
+        ]
+        assert next(queue.consume(2)) == [(2, "b")]
+        assert not queue.qsize()
+
+    def test_it_consumes_queued_messages_in_batches(self):
+        queue = WorkQueue(maxsize=100)
+        for message in range(5):
+            queue.put(message)
+
+        consumer = queue.consume(0, max_batch_size=3)
+
+        assert next(consumer) == [0, 1, 2]
+        assert next(consumer) == [3, 4]
+
+    def test_it_waits_for_messages_to_fill_a_batch(self):
+        queue = WorkQueue(maxsize=100)
+        queue.put("message_1")
+        gevent.spawn_later(0.01, queue.put, "message_2")
+
+        batch = next(queue.consume(0, max_batch_size=3, max_batch_wait=0.05))
+
+        assert batch == ["message_1", "message_2"]
+
+    def test_it_doesnt_wait_for_messages_by_default(self):
+        queue = WorkQueue(maxsize=100)
+        queue.put("message_1")
+        gevent.spawn_later(0.01, queue.put, "message_2")
+
+        batch = next(queue.consume(0, max_batch_size=3))
+
+        assert batch == ["message_1"]
+
+    def test_it_splits_maxsize_between_shards(self):
+        queue = WorkQueue(maxsize=4, key=lambda _: "same", shards=2)
+        queue.put("message_1")
+        queue.put("message_2")
+
+        with pytest.raises(Full):
+            queue.put("message_3", timeout=0.01)
+
+    def test_it_counts_dropped_messages(self):
+        queue = WorkQueue(maxsize=1)
+        queue.put("message_1")
+
+        for _ in range(2):
+            with pytest.raises(Full):
+                queue.put("message", timeout=0.01)
+
+        assert queue.take_stats().dropped == 2
+
+    def test_qsize(self):
+        queue = WorkQueue(maxsize=100, key=lambda message: message, shards=4)
+
+        for message in range(10):
+            queue.put(message)
+
+        assert queue.qsize() == 10
+
+    def test_max_shard_size(self):
+        queue = WorkQueue(maxsize=100, key=lambda _: "same", shards=4)
+
+        for message in range(3):
+            queue.put(message)
+
+        assert queue.max_shard_size() == 3
+
+    def test_set_shard_count(self):
+        queue = WorkQueue(maxsize=100)
+
+        queue.set_shard_count(3)
+
+        assert queue.shard_count == 3
+
+    def test_set_shard_count_requires_a_shard(self):
+        queue = WorkQueue(maxsize=100)
+
+        with pytest.raises(ValueError):
+            queue.set_shard_count(0)
+
+    def test_take_stats(self, monotonic):
+        queue = WorkQueue(maxsize=100)
+        monotonic.return_value = 10
+        queue.put("message_1")
+        queue.put("message_2")
+        consumer = queue.consume(0)
+
+        monotonic.return_value = 11
+        next(consumer)
+        monotonic.return_value = 13
+        next(consumer)
+
+        assert queue.take_stats() == WorkQueueStats(
+            processed=2, dropped=0, mean_wait=2, max_wait=3
+        )
+
+    def test_take_stats_resets_the_stats(self):
+        queue = WorkQueue(maxsize=100)
+        queue.put("message")
+        next(queue.consume(0))
+        queue.take_stats()
+
+        assert queue.take_stats() == WorkQueueStats(
+            processed=0, dropped=0, mean_wait=0, max_wait=0
+        )
+
+    @pytest.fixture
+    def monotonic(self, patch):
+        return patch("h.streamer.work_queue.monotonic", return_value=0)
@@ -5,7 +5,7 @@ from kombu.exceptions import OperationalError
 from transaction import TransactionManager
 
 from h import subscribers
-from h.events import AnnotationEvent
+from h.events import AnnotationEvent, DocumentURIsChangedEvent
 from h.exceptions import RealtimeMessageQueueError
 
 
@@ -99,6 +99,42 @@ class TestPublishAnnotationEvent:
         return event
 
 
+class TestForgetPresentedAnnotation:
+    def test_it_invalidates_the_presented_annotation(
+        self, pyramid_request, presented_annotations
+    ):
+        event = AnnotationEvent(pyramid_request, "test_annotation_id", "update")
+
+        subscribers.forget_presented_annotation(event)
+
+        presented_annotations.invalidate.assert_called_once_with("test_annotation_id")
+
+    @pytest.fixture
+    def presented_annotations(self, patch):
+        return patch("h.subscribers.presented_annotations")
+
+
+class TestPublishDocumentURIsChangedEvent:
+    def test_it_publishes_the_realtime_event(self, event):
+        subscribers.publish_document_uris_changed_event(event)
+
+        event.request.realtime.publish_document.assert_called_once_with(
+            {"uris": ["httpx://example.com/a", "httpx://example.com/b"]}
+        )
+
+    def test_it_exits_cleanly_when_RealtimeMessageQueueError_is_raised(self, event):
+        event.request.realtime.publish_document.side_effect = RealtimeMessageQueueError
+
+        subscribers.publish_document_uris_changed_event(event)
+
+    @pytest.fixture
+    def event(self, pyramid_request):
+        pyramid_request.realtime = mock.Mock()
+        return DocumentURIsChangedEvent(
+            pyramid_request, {"httpx://example.com/b", "httpx://example.com/a"}
+        )
+
+
 class TestSendReplyNotifications:
     def test_it_sends_emails(
         self,
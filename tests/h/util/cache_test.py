@@ -0,0 +1,80 @@
+import pytest
+
+from h.util.cache import LRUCache
+
+
+class TestLRUCache:
+    def test_it_returns_the_default_for_missing_keys(self, cache):
+        assert cache.get("missing") is None
+        assert cache.get("missing", "default") == "default"
+
+    def test_it_returns_cached_values(self, cache):
+        cache.set("key", "value")
+
+        assert cache.get("key") == "value"
+
+    def test_it_expires_entries(self, cache, monotonic):
+        cache.set("key", "value")
+        monotonic.return_value += cache.ttl
+
+        assert cache.get("key") is None
+        assert not cache
+
+    def test_it_keeps_entries_without_a_ttl(self, monotonic):
+        cache = LRUCache(maxsize=2)
+        cache.set("key", "value")
+        monotonic.return_value += 1000000
+
+        assert cache.get("key") == "value"
+
+    def test_it_evicts_the_least_recently_used_keys(self, cache):
+        cache.set("1", 1)
+        cache.set("2", 2)
+        cache.get("1")
+        cache.set("3", 3)
+
+        assert cache.get("1") == 1
+        assert cache.get("2") is None
+        assert cache.get("3") == 3
+        assert len(cache) == 2
+
+    def test_setting_a_key_again_replaces_its_value(self, cache, monotonic):
+        cache.set("key", "old")
+        monotonic.return_value += cache.ttl - 1
+        cache.set("key", "new")
+        monotonic.return_value += 1
+
+        assert cache.get("key") == "new"
+
+    def test_invalidate(self, cache):
+        cache.set("key", "value")
+
+        cache.invalidate("key")
+        cache.invalidate("missing")
+
+        assert cache.get("key") is None
+
+    def test_items_skips_expired_entries(self, cache, monotonic):
+        cache.set("old", 1)
+        monotonic.return_value += 1
+        cache.set("new", 2)
+        monotonic.return_value += cache.ttl - 1
+
+        assert cache.items() == [("new", 2)]
+
+    def test_clear(self, cache):
+        cache.set("key", "value")
+
+        cache.clear()
+
+        assert not cache
+
+    @pytest.fixture
+    def cache(self):
+        return LRUCache(maxsize=2, ttl=60)
+
+    @pytest.fixture(autouse=True)
+    def monotonic(self, patch):
+        monotonic = patch("h.util.cache.monotonic")
+        monotonic.return_value = 1000
+        return monotonic
@@ -3,7 +3,7 @@ import string
 import pytest
 import sqlalchemy as sa
 
-from h.util.query import column_windows
+from h.util.query import column_window_bounds, column_windows
 
 ASCII_LOWERCASE = string.ascii_lowercase
 
@@ -67,6 +67,37 @@ class TestColumnWindows:
         assert window_query_results(db_session, windows, filter_) == expected
 
 
+@pytest.mark.usefixtures("cw_table")
+class TestColumnWindowBounds:
+    def test_it(self, db_session):
+        testdata = [{"name": char, "enabled": True} for char in ASCII_LOWERCASE]
+        db_session.execute(test_cw.insert().values(testdata))
+
+        bounds = column_window_bounds(db_session, test_cw.c.name, windowsize=10)
+
+        assert list(bounds) == [("a", "k"), ("k", "u"), ("u", None)]
+
+    def test_it_returns_no_windows_for_no_rows(self, db_session):
+        assert not list(column_window_bounds(db_session, test_cw.c.name))
+
+    def test_it_keeps_rows_with_the_same_value_in_one_window(self, db_session):
+        testdata = [{"name": char, "enabled": True} for char in "aaaaabbc"]
+        db_session.execute(test_cw.insert().values(testdata))
+
+        bounds = column_window_bounds(db_session, test_cw.c.name, windowsize=2)
+
+        assert list(bounds) == [("a", "b"), ("b", "c"), ("c", None)]
+
+    def test_it_splits_rows_with_the_same_value_by_another_column(self, db_session):
+        testdata = [{"name": char, "enabled": True} for char in "aaaaabbc"]
+        db_session.execute(test_cw.insert().values(testdata))
+        columns = (test_cw.c.name, test_cw.c.id)
+
+        windows = column_windows(db_session, columns, windowsize=3)
+
+        assert window_query_results(db_session, windows) == ["aaa", "aab", "bc"]
+
+
 def window_query_results(session, windows, filter_=None):
     """
     Fetch results using the passed windows and optional filter.
@@ -46,6 +46,19 @@ class TestSearch:
 
         assert views.search(pyramid_request) == expected
 
+    def test_it_returns_the_next_cursor(
+        self, pyramid_request, search_run, annotation_json_service
+    ):
+        search_run.return_value = SearchResult(2, ["row-1", "row-2"], [], {}, "abc")
+
+        expected = {
+            "total": 2,
+            "rows": annotation_json_service.present_all_for_user.return_value,
+            "next": "abc",
+        }
+
+        assert views.search(pyramid_request) == expected
+
     def test_it_presents_replies(
         self, pyramid_request, search_run, annotation_json_service
     ):
@@ -5,7 +5,7 @@ import pytest
 from pyramid import httpexceptions
 from webob.multidict import MultiDict
 
-from h.views.badge import Blocklist, badge
+from h.views.badge import Blocklist, badge, public_counts
 
 
 class TestBlocklist:
@@ -99,6 +99,46 @@ class TestBadge:
         )
         assert result == {"total": search_run.return_value.total}
 
+    def test_it_sets_short_private_cache_headers(self, badge_request, pyramid_request):
+        badge_request("http://example.com", annotated=True, blocked=False)
+
+        cache_control = pyramid_request.response.cache_control
+
+        assert cache_control.prevent_auto
+        assert cache_control.private
+        assert 0 < cache_control.max_age <= 60
+
+    @pytest.mark.parametrize("annotated", (True, False))
+    def test_it_shares_counts_between_logged_out_users(
+        self, badge_request, search_run, annotated
+    ):
+        first = badge_request("http://example.com", annotated=annotated)
+        search_run.return_value.total = 30
+        second = badge_request("http://example.com", annotated=annotated)
+
+        assert second == first
+        assert search_run.call_count <= 1
+
+    def test_it_shares_counts_between_equivalent_uris(self, badge_request, search_run):
+        badge_request("http://example.com/")
+        search_run.return_value.total = 30
+        result = badge_request("https://example.com")
+
+        assert search_run.call_count == 1
+        assert result == {"total": 29}
+
+    def test_it_doesnt_share_counts_between_logged_in_users(
+        self, badge_request, search_run, pyramid_config
+    ):
+        pyramid_config.testing_securitypolicy("acct:user@example.com")
+
+        badge_request("http://example.com")
+        search_run.return_value.total = 30
+        result = badge_request("http://example.com")
+
+        assert search_run.call_count == 2
+        assert result == {"total": 30}
+
     def test_it_raises_if_no_uri(self):
         with pytest.raises(httpexceptions.HTTPBadRequest):
             badge(mock.Mock(params={}))
@@ -117,6 +157,12 @@ class TestBadge:
 
         return caller
 
+    @pytest.fixture(autouse=True)
+    def with_no_cached_counts(self):
+        public_counts.clear()
+        yield
+        public_counts.clear()
+
     @pytest.fixture(autouse=True)
     def Blocklist(self, patch):
         return patch("h.views.badge.Blocklist")